@@ -0,0 +1,116 @@
+"""Maintenance commands: ``python -m app.cli <command>``."""
+from __future__ import annotations
+
+import argparse
+import json
+from dataclasses import replace
+from datetime import date, datetime
+
+from app.config import Settings
+from app.database import create_db_engine, init_db
+from app.services import aging, archive, customer_import, export, ledger
+
+
+def _ledger_rebuild(engine, args) -> int:
+    print(f"Rebuilt {ledger.rebuild_balances(engine)} customer balances.")
+    return 0
+
+
+def _ledger_check(engine, args) -> int:
+    mismatches = ledger.check_balances(engine, tolerance=args.tolerance)
+    for row in mismatches:
+        print(json.dumps(row, default=str))
+    print(f"{len(mismatches)} customer balances out of step.")
+    return 1 if mismatches else 0
+
+
+def _aging_snapshot(engine, args) -> int:
+    as_of = args.date or datetime.utcnow().date()
+    snapshot = aging.compute_snapshot(engine, as_of)
+    print(f"Aging snapshot for {snapshot.snapshot_date.isoformat()} taken at {snapshot.computed_at:%H:%M:%S}.")
+    return 0
+
+
+def _export(engine, args) -> int:
+    results = export.export_snapshot(engine, args.output, args.table, args.format, args.chunk_rows, full=args.full)
+    if not results:
+        print(f"Another export to {args.output} is running.")
+        return 1
+    for result in results:
+        print(f"{result.table}: {result.rows} rows{f' -> {result.path}' if result.path else ''}")
+    return 0
+
+
+def _archive_invoices(engine, args) -> int:
+    moved = archive.archive_paid_invoices(engine, args.older_than_days, args.batch_size, args.max_batches)
+    print(f"Archived {moved} invoices paid more than {args.older_than_days} days ago.")
+    return 0
+
+
+def _import_customers(engine, args) -> int:
+    fmt = args.format or customer_import.format_for("", args.file)
+    with open(args.file, encoding="utf-8-sig", newline="") as lines:
+        report = customer_import.import_customers(engine, lines, fmt, args.chunk_size)
+    for error in report.errors:
+        print(json.dumps(error))
+    print(
+        f"Imported {report.imported} customers ({report.accounts} portal accounts, {report.routers} routers); "
+        f"{report.failed} rows failed."
+    )
+    return 1 if report.failed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="", help="default: DATABASE_URL / DB_* settings")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("ledger-rebuild", help="recompute every customer balance from invoices and payments")
+    check = commands.add_parser("ledger-check", help="compare the ledger with a full recomputation")
+    check.add_argument("--tolerance", type=float, default=ledger.TOLERANCE)
+    snapshot = commands.add_parser("aging-snapshot", help="take the receivables aging snapshot for a day")
+    snapshot.add_argument("--date", type=date.fromisoformat, default=None, help="YYYY-MM-DD; default: today")
+    dump = commands.add_parser("export", help="write new rows of the analytics tables to columnar files")
+    dump.add_argument("--output", default="", help="default: EXPORT_DIR")
+    dump.add_argument("--table", action="append", choices=list(export.EXPORT_TABLES), help="repeatable; default: all")
+    dump.add_argument("--format", choices=export.FORMATS, default="", help="default: parquet when pyarrow is installed")
+    dump.add_argument("--chunk-rows", type=int, default=0, help="default: EXPORT_CHUNK_ROWS")
+    dump.add_argument("--full", action="store_true", help="ignore the watermarks and export every row")
+    load = commands.add_parser("import-customers", help="bulk import customers from a CSV or NDJSON file")
+    load.add_argument("file")
+    load.add_argument("--format", choices=customer_import.FORMATS, default="", help="default: from the file extension")
+    load.add_argument("--chunk-size", type=int, default=customer_import.CHUNK_SIZE, help="rows per transaction")
+    move = commands.add_parser("archive-invoices", help="move old paid invoices into invoice_archive")
+    move.add_argument("--older-than-days", type=int, default=0, help="default: INVOICE_ARCHIVE_AFTER_DAYS")
+    move.add_argument("--batch-size", type=int, default=0, help="default: INVOICE_ARCHIVE_BATCH_SIZE")
+    move.add_argument("--max-batches", type=int, default=None, help="default: until nothing is due")
+    args = parser.parse_args(argv)
+
+    settings = Settings.from_env()
+    if args.database_url:
+        settings = replace(settings, database_url=args.database_url)
+    if args.command == "export":
+        args.output = args.output or settings.export_dir
+        args.format = args.format or settings.export_format
+        args.chunk_rows = args.chunk_rows or settings.export_chunk_rows
+        if not args.output:
+            parser.error("export needs --output or EXPORT_DIR")
+    if args.command == "archive-invoices":
+        args.older_than_days = args.older_than_days or settings.invoice_archive_after_days
+        args.batch_size = args.batch_size or settings.invoice_archive_batch_size
+        if args.older_than_days <= 0:
+            parser.error("archive-invoices needs --older-than-days or INVOICE_ARCHIVE_AFTER_DAYS")
+    engine = create_db_engine(settings)
+    init_db(engine)
+    handler = {
+        "ledger-rebuild": _ledger_rebuild,
+        "ledger-check": _ledger_check,
+        "aging-snapshot": _aging_snapshot,
+        "export": _export,
+        "import-customers": _import_customers,
+        "archive-invoices": _archive_invoices,
+    }[args.command]
+    return handler(engine, args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,7 +8,6 @@ from urllib.parse import quote_plus
 @dataclass(frozen=True)
 class Settings:
     app_name: str = "NET NOVA ISP BILLING"
-    app_name: str = "NetNova Billing + EVIL MARIA"
     environment: str = "development"
     debug: bool = False
     host: str = "0.0.0.0"
@@ -16,6 +15,68 @@ class Settings:
     database_url: str = "sqlite:///./netnova.db"
     allowed_origins: str = "*"
     public_base_url: str = "http://127.0.0.1:8000"
+    portal_cache_ttl_seconds: float = 30.0
+    portal_history_limit: int = 20
+    template_cache_dir: str = ""
+    fragment_cache_size: int = 512
+    cache_sync_seconds: float = 1.0
+    asset_build_dir: str = ""
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_recycle_seconds: int = 1800
+    legacy_sqlite_path: str = "./netnova.db"
+    monitor_scheduler_enabled: bool = True
+    monitor_interval_seconds: float = 30.0
+    monitor_jitter_seconds: float = 3.0
+    monitor_overlap_policy: str = "coalesce"
+    monitor_shard_index: int = -1
+    monitor_shard_count: int = 1
+    monitor_lock_dir: str = ""
+    probe_concurrency: int = 500
+    probe_timeout_seconds: float = 2.0
+    metrics_dir: str = ""
+    metrics_publish_seconds: float = 5.0
+    query_profile_sample_rate: float = 0.0
+    compression_min_size: int = 1024
+    # gzip/brotli level per content type; see app/services/compression.py.
+    compression_levels: str = (
+        "text/html=6/5,application/json=5/4,text/plain=6/5,text/css=6/5,application/javascript=6/5,"
+        "image/svg+xml=6/5,text/event-stream=1/1"
+    )
+    rate_limit_scale: float = 1.0
+    admission_max_concurrency: int = 64
+    admission_reserved_slots: int = 8
+    admission_queue_seconds: float = 2.0
+    alert_recipients: str = ""
+    smtp_host: str = ""
+    smtp_port: int = 587
+    smtp_username: str = ""
+    smtp_password: str = ""
+    smtp_starttls: bool = True
+    smtp_sender: str = "noreply@netnova.local"
+    sms_gateway_url: str = ""
+    sms_gateway_token: str = ""
+    outbox_batch_size: int = 200
+    outbox_concurrency: int = 20
+    outbox_poll_seconds: float = 2.0
+    outbox_max_attempts: int = 8
+    email_rate_per_second: float = 20.0
+    sms_rate_per_second: float = 50.0
+    mpesa_callback_token: str = ""
+    stripe_webhook_secret: str = ""
+    kopokopo_webhook_secret: str = ""
+    custom_webhook_secret: str = ""
+    payment_batch_size: int = 500
+    payment_batch_linger_seconds: float = 0.05
+    payment_queue_size: int = 50000
+    payment_dedupe_window: int = 100000
+    export_dir: str = ""
+    export_interval_hours: float = 24.0
+    export_format: str = ""
+    export_chunk_rows: int = 50000
+    invoice_archive_after_days: int = 0
+    invoice_archive_batch_size: int = 1000
+    invoice_archive_interval_hours: float = 6.0
 
     @property
     def is_production(self) -> bool:
@@ -41,8 +102,6 @@ class Settings:
     @classmethod
     def from_env(cls) -> "Settings":
         database_url = os.getenv("DATABASE_URL") or cls._database_url_from_parts() or cls.database_url
-    @classmethod
-    def from_env(cls) -> "Settings":
         return cls(
             app_name=os.getenv("APP_NAME", cls.app_name),
             environment=os.getenv("ENVIRONMENT", cls.environment),
@@ -52,6 +111,69 @@ class Settings:
             database_url=database_url,
             allowed_origins=os.getenv("ALLOWED_ORIGINS", cls.allowed_origins),
             public_base_url=os.getenv("PUBLIC_BASE_URL", cls.public_base_url),
-            database_url=os.getenv("DATABASE_URL", cls.database_url),
-            allowed_origins=os.getenv("ALLOWED_ORIGINS", cls.allowed_origins),
+            portal_cache_ttl_seconds=float(os.getenv("PORTAL_CACHE_TTL_SECONDS", str(cls.portal_cache_ttl_seconds))),
+            portal_history_limit=int(os.getenv("PORTAL_HISTORY_LIMIT", str(cls.portal_history_limit))),
+            template_cache_dir=os.getenv("TEMPLATE_CACHE_DIR", cls.template_cache_dir),
+            fragment_cache_size=int(os.getenv("FRAGMENT_CACHE_SIZE", str(cls.fragment_cache_size))),
+            cache_sync_seconds=float(os.getenv("CACHE_SYNC_SECONDS", str(cls.cache_sync_seconds))),
+            asset_build_dir=os.getenv("ASSET_BUILD_DIR", cls.asset_build_dir),
+            db_pool_size=int(os.getenv("DB_POOL_SIZE", str(cls.db_pool_size))),
+            db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", str(cls.db_max_overflow))),
+            db_pool_recycle_seconds=int(os.getenv("DB_POOL_RECYCLE_SECONDS", str(cls.db_pool_recycle_seconds))),
+            legacy_sqlite_path=os.getenv("LEGACY_SQLITE_PATH", cls.legacy_sqlite_path),
+            monitor_scheduler_enabled=os.getenv("MONITOR_SCHEDULER", "true").lower() == "true",
+            monitor_interval_seconds=float(os.getenv("MONITOR_INTERVAL_SECONDS", str(cls.monitor_interval_seconds))),
+            monitor_jitter_seconds=float(os.getenv("MONITOR_JITTER_SECONDS", str(cls.monitor_jitter_seconds))),
+            monitor_overlap_policy=os.getenv("MONITOR_OVERLAP_POLICY", cls.monitor_overlap_policy),
+            monitor_shard_index=int(os.getenv("MONITOR_SHARD_INDEX", str(cls.monitor_shard_index))),
+            monitor_shard_count=int(os.getenv("MONITOR_SHARD_COUNT", str(cls.monitor_shard_count))),
+            monitor_lock_dir=os.getenv("MONITOR_LOCK_DIR", cls.monitor_lock_dir),
+            probe_concurrency=int(os.getenv("PROBE_CONCURRENCY", str(cls.probe_concurrency))),
+            probe_timeout_seconds=float(os.getenv("PROBE_TIMEOUT_SECONDS", str(cls.probe_timeout_seconds))),
+            # Same variable prometheus_client uses for its multiprocess mode.
+            metrics_dir=os.getenv("PROMETHEUS_MULTIPROC_DIR", cls.metrics_dir),
+            metrics_publish_seconds=float(os.getenv("METRICS_PUBLISH_SECONDS", str(cls.metrics_publish_seconds))),
+            query_profile_sample_rate=float(
+                os.getenv("QUERY_PROFILE_SAMPLE_RATE", str(cls.query_profile_sample_rate))
+            ),
+            compression_min_size=int(os.getenv("COMPRESSION_MIN_SIZE", str(cls.compression_min_size))),
+            compression_levels=os.getenv("COMPRESSION_LEVELS", cls.compression_levels),
+            rate_limit_scale=float(os.getenv("RATE_LIMIT_SCALE", str(cls.rate_limit_scale))),
+            admission_max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", str(cls.admission_max_concurrency))),
+            admission_reserved_slots=int(os.getenv("ADMISSION_RESERVED_SLOTS", str(cls.admission_reserved_slots))),
+            admission_queue_seconds=float(os.getenv("ADMISSION_QUEUE_SECONDS", str(cls.admission_queue_seconds))),
+            alert_recipients=os.getenv("ALERT_RECIPIENTS", cls.alert_recipients),
+            smtp_host=os.getenv("SMTP_HOST", cls.smtp_host),
+            smtp_port=int(os.getenv("SMTP_PORT", str(cls.smtp_port))),
+            smtp_username=os.getenv("SMTP_USERNAME", cls.smtp_username),
+            smtp_password=os.getenv("SMTP_PASSWORD", cls.smtp_password),
+            smtp_starttls=os.getenv("SMTP_STARTTLS", "true").lower() == "true",
+            smtp_sender=os.getenv("SMTP_SENDER", cls.smtp_sender),
+            sms_gateway_url=os.getenv("SMS_GATEWAY_URL", cls.sms_gateway_url),
+            sms_gateway_token=os.getenv("SMS_GATEWAY_TOKEN", cls.sms_gateway_token),
+            outbox_batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", str(cls.outbox_batch_size))),
+            outbox_concurrency=int(os.getenv("OUTBOX_CONCURRENCY", str(cls.outbox_concurrency))),
+            outbox_poll_seconds=float(os.getenv("OUTBOX_POLL_SECONDS", str(cls.outbox_poll_seconds))),
+            outbox_max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", str(cls.outbox_max_attempts))),
+            email_rate_per_second=float(os.getenv("EMAIL_RATE_PER_SECOND", str(cls.email_rate_per_second))),
+            sms_rate_per_second=float(os.getenv("SMS_RATE_PER_SECOND", str(cls.sms_rate_per_second))),
+            mpesa_callback_token=os.getenv("MPESA_CALLBACK_TOKEN", cls.mpesa_callback_token),
+            stripe_webhook_secret=os.getenv("STRIPE_WEBHOOK_SECRET", cls.stripe_webhook_secret),
+            kopokopo_webhook_secret=os.getenv("KOPOKOPO_WEBHOOK_SECRET", cls.kopokopo_webhook_secret),
+            custom_webhook_secret=os.getenv("CUSTOM_WEBHOOK_SECRET", cls.custom_webhook_secret),
+            payment_batch_size=int(os.getenv("PAYMENT_BATCH_SIZE", str(cls.payment_batch_size))),
+            payment_batch_linger_seconds=float(
+                os.getenv("PAYMENT_BATCH_LINGER_SECONDS", str(cls.payment_batch_linger_seconds))
+            ),
+            payment_queue_size=int(os.getenv("PAYMENT_QUEUE_SIZE", str(cls.payment_queue_size))),
+            payment_dedupe_window=int(os.getenv("PAYMENT_DEDUPE_WINDOW", str(cls.payment_dedupe_window))),
+            export_dir=os.getenv("EXPORT_DIR", cls.export_dir),
+            export_interval_hours=float(os.getenv("EXPORT_INTERVAL_HOURS", str(cls.export_interval_hours))),
+            export_format=os.getenv("EXPORT_FORMAT", cls.export_format),
+            export_chunk_rows=int(os.getenv("EXPORT_CHUNK_ROWS", str(cls.export_chunk_rows))),
+            invoice_archive_after_days=int(os.getenv("INVOICE_ARCHIVE_AFTER_DAYS", str(cls.invoice_archive_after_days))),
+            invoice_archive_batch_size=int(os.getenv("INVOICE_ARCHIVE_BATCH_SIZE", str(cls.invoice_archive_batch_size))),
+            invoice_archive_interval_hours=float(
+                os.getenv("INVOICE_ARCHIVE_INTERVAL_HOURS", str(cls.invoice_archive_interval_hours))
+            ),
         )
@@ -2,18 +2,84 @@ from __future__ import annotations
 
 from collections.abc import Generator
 
+from sqlalchemy import event, inspect, text
 from sqlmodel import Session, SQLModel, create_engine
 
 from app.config import Settings
+from app.services.changes import ensure_change_streams
+from app.services.ledger import ensure_ledger
+from app.services.legacy_import import import_legacy_monitoring
+from app.services.search import ensure_search_schema
+
+
+def _enable_sqlite_wal(dbapi_connection, _connection_record) -> None:
+    # WAL lets the monitor cycle write while web requests keep reading, and
+    # busy_timeout makes concurrent writers wait instead of failing at once.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
 
 
 def create_db_engine(settings: Settings):
-    connect_args = {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
-    return create_engine(settings.database_url, echo=False, connect_args=connect_args)
+    if settings.database_url.startswith("sqlite"):
+        engine = create_engine(
+            settings.database_url,
+            echo=False,
+            connect_args={"check_same_thread": False},
+        )
+        event.listen(engine, "connect", _enable_sqlite_wal)
+        return engine
+
+    return create_engine(
+        settings.database_url,
+        echo=False,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_pre_ping=True,
+    )
+
+
+def _add_missing_columns(engine) -> None:
+    # create_all() never alters existing tables; columns added to a model
+    # after its table was first created are added here.
+    columns = {column["name"] for column in inspect(engine).get_columns("monitoringevent")}
+    if "node_id" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE monitoringevent ADD COLUMN node_id INTEGER REFERENCES monitornode (id)"))
+            conn.execute(text("CREATE INDEX ix_monitoringevent_node_id ON monitoringevent (node_id)"))
+    if "version" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE monitoringevent ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+            conn.execute(text("CREATE INDEX ix_monitoringevent_version ON monitoringevent (version)"))
+
+    # "transaction" is a reserved word and has to be quoted.
+    table = engine.dialect.identifier_preparer.quote("transaction")
+    if "provider_txn_id" not in {column["name"] for column in inspect(engine).get_columns("transaction")}:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN provider VARCHAR(20)"))
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN provider_txn_id VARCHAR(120)"))
+            conn.execute(text(f"CREATE UNIQUE INDEX ux_transaction_provider_txn ON {table} (provider, provider_txn_id)"))
+
+    if "archive_seq" not in {column["name"] for column in inspect(engine).get_columns("invoice_archive")}:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE invoice_archive ADD COLUMN archive_seq INTEGER NOT NULL DEFAULT 0"))
+            # Rows archived so far were exported by id; keep that order.
+            conn.execute(text("UPDATE invoice_archive SET archive_seq = id"))
+            conn.execute(text("CREATE UNIQUE INDEX ix_invoice_archive_archive_seq ON invoice_archive (archive_seq)"))
 
 
-def init_db(engine) -> None:
+def init_db(engine, legacy_sqlite_path: str = "") -> None:
+    new_ledger = not inspect(engine).has_table("customerbalance")
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns(engine)
+    ensure_search_schema(engine)
+    ensure_change_streams(engine)
+    ensure_ledger(engine, rebuild=new_ledger)
+    if legacy_sqlite_path:
+        import_legacy_monitoring(engine, legacy_sqlite_path)
 
 
 def get_session_factory(engine):
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from pathlib import Path
@@ -7,14 +8,29 @@ from uuid import uuid4
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
+from sqlmodel import Session
 
 from app.config import Settings
 from app.database import create_db_engine, get_session_factory, init_db
 from app.routers.api import build_api_router
+from app.routers.monitor import build_monitor_router
+from app.routers.payments import build_payments_router
 from app.routers.web import build_web_router
+from app.services.admission import DEFAULT_RATE_RULES, Admission, AdmissionController, AdmissionMiddleware, scale_rules
+from app.services.archive import archive_forever
+from app.services.assets import FingerprintedStaticFiles, build_asset_manifest
+from app.services.cache import CacheRegistry, DatabaseInvalidationBus
+from app.services.compression import CompressionMiddleware, parse_levels
+from app.services.export import export_forever
+from app.services.fragments import configure_template_environment
+from app.services.instrumentation import CONTENT_TYPE, RequestMetrics, RequestMetricsMiddleware
+from app.services.monitoring import MonitorService, reset_unprobed_health, seed_monitor_nodes
+from app.services.outbox import HttpGatewaySender, OutboxDispatcher, SmtpSender, parse_recipients
+from app.services.payments import PaymentBatcher, RecentIds
+from app.services.profiling import QueryProfilerMiddleware, install_query_profiler
+from app.services.scheduler import MonitorScheduler, claim_shard
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
@@ -22,17 +38,170 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(mess
 BASE_DIR = Path(__file__).resolve().parent
 
 
+def build_outbox_dispatcher(settings: Settings, engine) -> OutboxDispatcher | None:
+    senders = []
+    if settings.smtp_host:
+        senders.append(
+            SmtpSender(
+                settings.smtp_host,
+                settings.smtp_port,
+                sender=settings.smtp_sender,
+                username=settings.smtp_username,
+                password=settings.smtp_password,
+                starttls=settings.smtp_starttls,
+            )
+        )
+    if settings.sms_gateway_url:
+        senders.append(
+            HttpGatewaySender(
+                settings.sms_gateway_url, settings.sms_gateway_token, pool_size=settings.outbox_concurrency
+            )
+        )
+    if not senders:
+        logger.info("No SMTP host or SMS gateway configured; outbox messages stay queued")
+        return None
+    return OutboxDispatcher(
+        engine,
+        senders,
+        batch_size=settings.outbox_batch_size,
+        concurrency=settings.outbox_concurrency,
+        rate_per_second={
+            "email": settings.email_rate_per_second,
+            "sms": settings.sms_rate_per_second,
+            "voice": settings.sms_rate_per_second,
+        },
+        max_attempts=settings.outbox_max_attempts,
+    )
+
+
 def create_app(settings: Settings | None = None) -> FastAPI:
     settings = settings or Settings.from_env()
     engine = create_db_engine(settings)
+    install_query_profiler(engine)
     get_session = get_session_factory(engine)
     templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+    configure_template_environment(
+        templates.env,
+        bytecode_cache_dir=settings.template_cache_dir,
+        fragment_cache_size=settings.fragment_cache_size,
+        auto_reload=not settings.is_production,
+    )
+    assets = build_asset_manifest(BASE_DIR / "static", settings.asset_build_dir)
+    templates.env.globals["asset_url"] = assets.url
+    # Every worker keeps its own caches; invalidations from other workers
+    # arrive through the cacheinvalidation table within CACHE_SYNC_SECONDS.
+    caches = CacheRegistry(DatabaseInvalidationBus(engine), sync_seconds=settings.cache_sync_seconds)
+    caches.register(templates.env.fragment_cache, shared=False)
+    portal_cache = caches.namespace(
+        "portal",
+        max_entries=50_000 if settings.portal_cache_ttl_seconds > 0 else 0,
+        ttl_seconds=settings.portal_cache_ttl_seconds,
+    )
+    monitor = MonitorService(
+        engine,
+        probe_concurrency=settings.probe_concurrency,
+        probe_timeout=settings.probe_timeout_seconds,
+        rollup_grace_seconds=2 * settings.monitor_interval_seconds,
+        alert_recipients=parse_recipients(settings.alert_recipients),
+    )
+    request_metrics = RequestMetrics(settings.metrics_dir)
+    admission = Admission(
+        scale_rules(DEFAULT_RATE_RULES, settings.rate_limit_scale) if settings.rate_limit_scale > 0 else (),
+        AdmissionController(
+            settings.admission_max_concurrency,
+            reserved=settings.admission_reserved_slots,
+            queue_seconds=settings.admission_queue_seconds,
+        ),
+    )
+
+    def invalidate_portals(customer_ids) -> None:
+        # One invalidation transaction per written batch, not one per customer.
+        portal_cache.invalidate_many(list(customer_ids))
+
+    payment_batcher = PaymentBatcher(
+        engine,
+        batch_size=settings.payment_batch_size,
+        linger_seconds=settings.payment_batch_linger_seconds,
+        max_queue=settings.payment_queue_size,
+        on_written=invalidate_portals,
+    )
+    scheduler = MonitorScheduler(
+        monitor.run_cycle,
+        interval=settings.monitor_interval_seconds,
+        jitter=settings.monitor_jitter_seconds,
+        overlap=settings.monitor_overlap_policy,
+    )
 
     @asynccontextmanager
     async def lifespan(_: FastAPI):
-        init_db(engine)
+        init_db(engine, settings.legacy_sqlite_path)
+        with Session(engine) as session:
+            seed_monitor_nodes(session)
+            reset_unprobed_health(session)
         logger.info("Database initialized")
+
+        claim = None
+        if settings.monitor_scheduler_enabled:
+            claim = claim_shard(settings.monitor_shard_count, settings.monitor_shard_index, settings.monitor_lock_dir)
+            if claim is None:
+                monitor.owner = False
+                logger.info("Monitor scheduler is owned by another worker")
+            else:
+                monitor.shard = claim[0]
+                scheduler.start()
+
+        dispatcher = build_outbox_dispatcher(settings, engine)
+        stop_background = asyncio.Event()
+        outbox_task = None
+        if dispatcher is not None:
+            outbox_task = asyncio.create_task(dispatcher.run_forever(stop_background, settings.outbox_poll_seconds))
+        payment_task = asyncio.create_task(payment_batcher.run_forever(stop_background))
+        cache_task = asyncio.create_task(caches.sync_forever(stop_background))
+        metrics_task = None
+        if settings.metrics_dir:
+            metrics_task = asyncio.create_task(
+                request_metrics.publish_forever(stop_background, settings.metrics_publish_seconds)
+            )
+        export_task = None
+        if settings.export_dir:
+            export_task = asyncio.create_task(
+                export_forever(
+                    engine,
+                    settings.export_dir,
+                    settings.export_interval_hours * 3600,
+                    stop_background,
+                    settings.export_format,
+                    settings.export_chunk_rows,
+                )
+            )
+        archive_task = None
+        if settings.invoice_archive_after_days > 0:
+            archive_task = asyncio.create_task(
+                archive_forever(
+                    engine,
+                    settings.invoice_archive_after_days,
+                    settings.invoice_archive_interval_hours * 3600,
+                    stop_background,
+                    settings.invoice_archive_batch_size,
+                )
+            )
         yield
+        stop_background.set()
+        if outbox_task is not None:
+            await outbox_task
+            await dispatcher.aclose()
+        # Drains whatever callbacks were acknowledged but not yet written.
+        await payment_task
+        await cache_task
+        if metrics_task is not None:
+            await metrics_task
+        if export_task is not None:
+            await export_task
+        if archive_task is not None:
+            await archive_task
+        scheduler.stop(timeout=settings.probe_timeout_seconds + 1)
+        if claim is not None and claim[1] is not None:
+            claim[1].close()
 
     app = FastAPI(
         title=settings.app_name,
@@ -43,8 +212,16 @@ def create_app(settings: Settings | None = None) -> FastAPI:
 
     app.state.settings = settings
     app.state.engine = engine
+    app.state.caches = caches
+    app.state.admission = admission
+    app.state.portal_cache = portal_cache
+    app.state.monitor = monitor
+    app.state.scheduler = scheduler
+    app.state.request_metrics = request_metrics
+    app.state.payment_batcher = payment_batcher
+    app.state.templates = templates
 
-    app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
+    app.mount("/static", FingerprintedStaticFiles(directory=BASE_DIR / "static", manifest=assets), name="static")
 
     allowed_origins = [origin.strip() for origin in settings.allowed_origins.split(",") if origin.strip()]
     app.add_middleware(
@@ -55,6 +232,14 @@ def create_app(settings: Settings | None = None) -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Inside add_headers, which re-streams every body: here a complete body
+    # still arrives in one message, so the size threshold and Content-Length hold.
+    app.add_middleware(
+        CompressionMiddleware,
+        levels=parse_levels(settings.compression_levels),
+        minimum_size=settings.compression_min_size,
+    )
+
     @app.middleware("http")
     async def add_headers(request: Request, call_next):
         request_id = str(uuid4())
@@ -67,13 +252,54 @@ def create_app(settings: Settings | None = None) -> FastAPI:
             response.headers["Strict-Transport-Security"] = "max-age=63072000; includeSubDomains; preload"
         return response
 
+    # The X-Debug-Queries header is only honoured outside production, where
+    # query shapes in logs and headers are not a concern.
+    app.add_middleware(
+        QueryProfilerMiddleware,
+        sample_rate=settings.query_profile_sample_rate,
+        allow_header=settings.debug or not settings.is_production,
+    )
+    # Outside everything but the metrics, so rejected and shed requests cost
+    # no session, query or template work but still show up in latencies.
+    app.add_middleware(AdmissionMiddleware, admission=admission)
+    # Added last so it wraps every other middleware and times the full request.
+    app.add_middleware(RequestMetricsMiddleware, metrics=request_metrics)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        # Snapshot on the event loop, where requests update the histograms;
+        # reading sibling workers' files happens off the loop.
+        body = await asyncio.to_thread(request_metrics.render, request_metrics.snapshot())
+        return PlainTextResponse(body, media_type=CONTENT_TYPE)
+
+    @app.get("/metrics/admission", include_in_schema=False)
+    async def admission_stats():
+        return admission.snapshot()
+
+    @app.get("/metrics/cache", include_in_schema=False)
+    def cache_stats():
+        return caches.stats()
+
     @app.exception_handler(Exception)
     async def unhandled_exception_handler(request: Request, exc: Exception):
         logger.exception("Unhandled exception at %s", request.url.path)
         return JSONResponse(status_code=500, content={"detail": "Internal server error"})
 
-    app.include_router(build_web_router(get_session, templates))
-    app.include_router(build_api_router(get_session))
+    app.include_router(build_web_router(get_session, templates, portal_cache, history_limit=settings.portal_history_limit))
+    app.include_router(build_api_router(get_session, portal_cache))
+    app.include_router(build_monitor_router(get_session, monitor, scheduler))
+    app.include_router(
+        build_payments_router(
+            payment_batcher,
+            secrets={
+                "mpesa": settings.mpesa_callback_token,
+                "stripe": settings.stripe_webhook_secret,
+                "kopokopo": settings.kopokopo_webhook_secret,
+                "custom": settings.custom_webhook_secret,
+            },
+            recent=RecentIds(settings.payment_dedupe_window),
+        )
+    )
 
     return app
 
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
+from sqlalchemy import Column, Index, LargeBinary
 from sqlmodel import Field, SQLModel
 
 
@@ -54,12 +55,53 @@ class PaymentGateway(SQLModel, table=True):
 
 
 class Transaction(SQLModel, table=True):
+    # Gateway callbacks are retried and replayed; the unique pair makes a
+    # duplicate delivery a no-op. Manual entries leave both columns NULL.
+    __table_args__ = (Index("ux_transaction_provider_txn", "provider", "provider_txn_id", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     customer_id: int = Field(foreign_key="customer.id", index=True)
     amount: float = Field(ge=0)
     method: str = Field(max_length=80)
     reference: str = Field(max_length=120)
     status: str = Field(default="completed", regex=r"^(completed|failed|pending)$")
+    provider: Optional[str] = Field(default=None, max_length=20)
+    provider_txn_id: Optional[str] = Field(default=None, max_length=120)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class PaymentInbox(SQLModel, table=True):
+    # Callbacks stored before the gateway is told they were received; the
+    # payment batcher deletes each row once it is booked or suspended, and
+    # picks up rows a crashed worker left behind.
+    __table_args__ = (Index("ux_paymentinbox_provider_txn", "provider", "provider_txn_id", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    provider: str = Field(max_length=20)
+    provider_txn_id: str = Field(max_length=120)
+    customer_ref: str = Field(default="", max_length=120)
+    amount: float
+    method: str = Field(max_length=80)
+    received_at: datetime = Field(index=True)
+
+
+class PaymentSuspense(SQLModel, table=True):
+    # Gateway payments acknowledged but not booked as a Transaction: the
+    # account reference matched no customer, or the database refused the
+    # row. Kept for staff to reconcile by hand.
+    __table_args__ = (Index("ux_paymentsuspense_provider_txn", "provider", "provider_txn_id", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    provider: str = Field(max_length=20)
+    provider_txn_id: str = Field(max_length=120)
+    customer_ref: str = Field(default="", max_length=120)
+    # NULL when the amount itself was what the database refused.
+    amount: Optional[float] = None
+    method: str = Field(max_length=80)
+    reason: str = Field(regex=r"^(unmatched|rejected)$", index=True)
+    detail: str = Field(default="", max_length=500)
+    received_at: datetime
+    resolved_at: Optional[datetime] = Field(default=None, index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -73,11 +115,148 @@ class Invoice(SQLModel, table=True):
     paid_at: Optional[datetime] = None
 
 
+class InvoiceArchive(SQLModel, table=True):
+    # Paid invoices past the archive horizon, moved out of Invoice by
+    # app.services.archive with their ids; history reads union the two.
+    # Rows arrive out of id order, so archive_seq numbers them in the order
+    # they were archived for the analytics export watermark.
+    __tablename__ = "invoice_archive"
+
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    customer_id: int = Field(foreign_key="customer.id", index=True)
+    billing_month: str = Field(regex=r"^\d{4}-\d{2}$")
+    amount: float = Field(ge=0)
+    status: str = Field(default="paid", max_length=20)
+    created_at: datetime
+    paid_at: Optional[datetime] = Field(default=None, index=True)
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
+    archive_seq: int = Field(unique=True, index=True)
+
+
+class CustomerBalance(SQLModel, table=True):
+    # Running totals kept in step with Invoice and Transaction writes by
+    # app.services.ledger; balance = invoiced - paid.
+    customer_id: int = Field(foreign_key="customer.id", primary_key=True)
+    invoiced: float = 0.0
+    outstanding: float = 0.0
+    paid: float = 0.0
+    balance: float = Field(default=0.0, index=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class MonitorNode(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str = Field(min_length=2, max_length=120)
+    region: str = Field(max_length=120)
+    expected_latency_ms: int = Field(ge=0)
+    host: Optional[str] = Field(default=None, max_length=255)
+    probe_method: str = Field(default="tcp", regex=r"^(icmp|tcp|http|https)$")
+    probe_port: Optional[int] = Field(default=None, ge=1, le=65535)
+    last_latency_ms: Optional[int] = None
+    last_seen: Optional[datetime] = None
+    health: str = Field(default="unknown", max_length=20)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class MonitoringEvent(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
+    node_id: Optional[int] = Field(default=None, foreign_key="monitornode.id", index=True)
     service_name: str = Field(min_length=2, max_length=120, index=True)
     severity: str = Field(regex=r"^(info|warning|critical)$")
     message: str = Field(min_length=2, max_length=500)
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     acknowledged: bool = Field(default=False, index=True)
     acknowledged_at: Optional[datetime] = None
+    version: int = Field(default=0, index=True)
+
+
+class AgingSnapshot(SQLModel, table=True):
+    # One per day; billing_version is the "billing" change stream the rows
+    # were computed at, so today's snapshot is recomputed only after writes.
+    snapshot_date: date = Field(primary_key=True)
+    billing_version: int = 0
+    computed_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class AgingBucket(SQLModel, table=True):
+    snapshot_date: date = Field(foreign_key="agingsnapshot.snapshot_date", primary_key=True)
+    customer_id: int = Field(foreign_key="customer.id", primary_key=True)
+    plan_name: str = Field(max_length=80, index=True)
+    days_0_30: float = 0.0
+    days_31_60: float = 0.0
+    days_61_90: float = 0.0
+    days_over_90: float = 0.0
+    total: float = 0.0
+
+
+class ChangeVersion(SQLModel, table=True):
+    stream: str = Field(primary_key=True, max_length=40)
+    version: int = 0
+
+
+class CacheInvalidation(SQLModel, table=True):
+    # Broadcast log read by every worker's app.services.cache registry; key
+    # is JSON, NULL drops the whole namespace.
+    id: Optional[int] = Field(default=None, primary_key=True)
+    origin: str = Field(max_length=32)
+    namespace: str = Field(max_length=80)
+    key: Optional[str] = Field(default=None, max_length=255)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class Notification(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    channel: str = Field(regex=r"^(email|sms|voice)$")
+    target: str = Field(min_length=2, max_length=255)
+    message: str = Field(min_length=2, max_length=1000)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class LatencySegment(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    start_ts: float
+    end_ts: float = Field(index=True)
+    sample_count: int
+    payload: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+
+
+class LatencyRollup(SQLModel, table=True):
+    __table_args__ = (Index("ix_latencyrollup_resolution_bucket", "resolution", "bucket_start"),)
+
+    node_id: int = Field(primary_key=True)
+    resolution: int = Field(primary_key=True)
+    bucket_start: int = Field(primary_key=True)
+    sample_count: int
+    min_ms: float
+    avg_ms: float
+    max_ms: float
+    p95_ms: float
+
+
+class LatencyRollupState(SQLModel, table=True):
+    resolution: int = Field(primary_key=True)
+    rolled_until: int
+
+
+class SchemaMigration(SQLModel, table=True):
+    name: str = Field(primary_key=True, max_length=120)
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class OutboxMessage(SQLModel, table=True):
+    __table_args__ = (Index("ix_outboxmessage_status_due", "status", "next_attempt_at"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    notification_id: Optional[int] = Field(default=None, foreign_key="notification.id", index=True)
+    channel: str = Field(regex=r"^(email|sms|voice)$")
+    recipient: str = Field(max_length=255)
+    subject: str = Field(default="", max_length=255)
+    body: str = Field(max_length=4000)
+    status: str = Field(default="pending", regex=r"^(pending|sending|sent|failed)$")
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    claimed_by: Optional[str] = Field(default=None, max_length=80)
+    claimed_at: Optional[datetime] = None
+    last_error: Optional[str] = Field(default=None, max_length=500)
+    sent_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,13 +1,24 @@
 from __future__ import annotations
 
-from datetime import datetime
+import asyncio
+import io
+import tempfile
+from datetime import date, datetime
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlmodel import Session, select
 
-from app.models import Customer, Invoice, MonitoringEvent, RouterProvision
-from app.models import Customer, Invoice, MonitoringEvent
+from app.models import (
+    Customer,
+    CustomerBalance,
+    Invoice,
+    InvoiceArchive,
+    MonitoringEvent,
+    PaymentSuspense,
+    RouterProvision,
+)
 from app.schemas import (
+    CustomerBalanceOut,
     CustomerCreate,
     CustomerOut,
     CustomerUpdate,
@@ -16,10 +27,18 @@ from app.schemas import (
     InvoiceUpdate,
     MonitoringEventCreate,
     MonitoringEventOut,
+    PaymentSuspenseOut,
     RouterProvisionOut,
 )
+from app.services import aging, archive, changes, customer_import
+from app.services.cache import CacheNamespace
 from app.services.metrics import collect_dashboard_metrics
 from app.services.mikrotik import assign_point_to_point_block, build_mikrotik_script
+from app.services.search import search_customers
+from app.services.serialization import FastJSONResponse, json_rows, select_fields
+
+# Clients echo this back as ``?since=`` to receive only what changed.
+CHANGE_VERSION_HEADER = "X-Change-Version"
 
 
 def _ensure_router_provision(session: Session, customer: Customer) -> RouterProvision:
@@ -49,28 +68,49 @@ def _ensure_router_provision(session: Session, customer: Customer) -> RouterProv
     session.commit()
     session.refresh(provision)
     return provision
-)
-from app.schemas import CustomerCreate, InvoiceCreate, MonitoringEventCreate, MonitoringEventOut
-from app.services.metrics import collect_dashboard_metrics
 
 
-def build_api_router(get_session) -> APIRouter:
-    router = APIRouter(prefix="/api", tags=["api"])
+def _import_upload(upload, tail: bytes, engine, fmt: str) -> customer_import.ImportReport:
+    upload.write(tail)
+    upload.seek(0)
+    # A real file object: TextIOWrapper needs readable(), which
+    # SpooledTemporaryFile only has from Python 3.11.
+    with io.TextIOWrapper(upload, encoding="utf-8-sig", newline="") as lines:
+        return customer_import.import_customers(engine, lines, fmt)
+
+
+def build_api_router(get_session, portal_cache: CacheNamespace) -> APIRouter:
+    router = APIRouter(prefix="/api", tags=["api"], default_response_class=FastJSONResponse)
 
     @router.get("/health")
     def healthcheck() -> dict[str, str]:
         return {"status": "ok"}
 
     @router.get("/metrics")
-    def metrics(session: Session = Depends(get_session)):
+    def metrics(
+        response: Response,
+        since: int | None = Query(default=None, ge=0),
+        session: Session = Depends(get_session),
+    ):
+        version = changes.current_version(session.connection(), changes.METRICS)
+        if since is not None and since >= version:
+            return Response(status_code=304, headers={CHANGE_VERSION_HEADER: str(version)})
+        response.headers[CHANGE_VERSION_HEADER] = str(version)
         return collect_dashboard_metrics(session)
 
     @router.get("/customers", response_model=list[CustomerOut])
     def list_customers(session: Session = Depends(get_session)):
-        return session.exec(select(Customer).order_by(Customer.created_at.desc())).all()
+        return json_rows(session, select_fields(Customer, CustomerOut).order_by(Customer.created_at.desc()))
+
+    @router.get("/customers/search", response_model=list[CustomerOut])
+    def search_customer_index(
+        q: str = Query(min_length=1, max_length=120),
+        limit: int = Query(default=20, ge=1, le=100),
+        session: Session = Depends(get_session),
+    ):
+        return search_customers(session, q, limit=limit)
 
     @router.post("/customers", response_model=CustomerOut, status_code=201)
-    @router.post("/customers", status_code=201)
     def create_customer(payload: CustomerCreate, session: Session = Depends(get_session)):
         customer = Customer(**payload.model_dump())
         session.add(customer)
@@ -80,6 +120,28 @@ def build_api_router(get_session) -> APIRouter:
             _ensure_router_provision(session, customer)
         return customer
 
+    @router.post("/customers/import")
+    async def import_customers(
+        request: Request,
+        format: str | None = Query(default=None, pattern="^(csv|ndjson)$"),
+    ):
+        # Buffered to a temporary file in 1 MiB writes, then parsed row by
+        # row, so a large file never sits in memory at once; all disk I/O
+        # happens in worker threads.
+        fmt = format or customer_import.format_for(request.headers.get("content-type", ""))
+        upload = await asyncio.to_thread(tempfile.TemporaryFile)
+        try:
+            pending = bytearray()
+            async for chunk in request.stream():
+                pending += chunk
+                if len(pending) >= 1 << 20:
+                    await asyncio.to_thread(upload.write, pending)
+                    pending.clear()
+            report = await asyncio.to_thread(_import_upload, upload, bytes(pending), request.app.state.engine, fmt)
+        finally:
+            upload.close()
+        return report.as_dict()
+
     @router.patch("/customers/{customer_id}", response_model=CustomerOut)
     def update_customer(customer_id: int, payload: CustomerUpdate, session: Session = Depends(get_session)):
         customer = session.get(Customer, customer_id)
@@ -93,6 +155,49 @@ def build_api_router(get_session) -> APIRouter:
         session.refresh(customer)
         return customer
 
+    @router.get("/customers/{customer_id}/balance", response_model=CustomerBalanceOut)
+    def get_customer_balance(customer_id: int, session: Session = Depends(get_session)):
+        balance = session.get(CustomerBalance, customer_id)
+        if balance:
+            return balance
+        if not session.get(Customer, customer_id):
+            raise HTTPException(status_code=404, detail="Customer not found")
+        # No invoices or payments booked yet.
+        return CustomerBalance(customer_id=customer_id)
+
+    @router.get("/payments/suspense", response_model=list[PaymentSuspenseOut])
+    def list_payment_suspense(session: Session = Depends(get_session)):
+        # Unmatched and refused gateway payments still waiting for staff.
+        statement = (
+            select_fields(PaymentSuspense, PaymentSuspenseOut)
+            .where(PaymentSuspense.resolved_at.is_(None))
+            .order_by(PaymentSuspense.received_at.desc())
+        )
+        return json_rows(session, statement)
+
+    @router.get("/reports/top-debtors", response_model=list[CustomerBalanceOut])
+    def top_debtors(limit: int = Query(default=20, ge=1, le=100), session: Session = Depends(get_session)):
+        statement = (
+            select(CustomerBalance)
+            .where(CustomerBalance.balance > 0)
+            .order_by(CustomerBalance.balance.desc())
+            .limit(limit)
+        )
+        return session.exec(statement).all()
+
+    @router.get("/reports/aging")
+    def aging_report(
+        as_of: date | None = None,
+        group_by: str = Query(default="customer", pattern="^(customer|plan)$"),
+        limit: int = Query(default=100, ge=1, le=1000),
+        offset: int = Query(default=0, ge=0),
+        session: Session = Depends(get_session),
+    ):
+        today = datetime.utcnow().date()
+        if as_of and as_of > today:
+            raise HTTPException(status_code=400, detail="as_of cannot be in the future")
+        return aging.aging_report(session.get_bind(), as_of or today, group_by, limit=limit, offset=offset)
+
     @router.get("/customers/{customer_id}/router-config", response_model=RouterProvisionOut)
     def get_router_config(customer_id: int, session: Session = Depends(get_session)):
         customer = session.get(Customer, customer_id)
@@ -104,13 +209,17 @@ def build_api_router(get_session) -> APIRouter:
 
     @router.get("/invoices", response_model=list[InvoiceOut])
     def list_invoices(status: str | None = None, session: Session = Depends(get_session)):
-        statement = select(Invoice).order_by(Invoice.created_at.desc())
-        if status:
-            statement = statement.where(Invoice.status == status)
-        return session.exec(statement).all()
+        if status in archive.HOT_ONLY_STATUSES:
+            statement = select_fields(Invoice, InvoiceOut).where(Invoice.status == status).order_by(Invoice.created_at.desc())
+        else:
+            statement = archive.invoice_history(
+                list(InvoiceOut.model_fields),
+                where=(lambda table: [table.c.status == status]) if status else None,
+                order_by="created_at",
+            )
+        return json_rows(session, statement)
 
     @router.post("/invoices", response_model=InvoiceOut, status_code=201)
-    @router.post("/invoices", status_code=201)
     def create_invoice(payload: InvoiceCreate, session: Session = Depends(get_session)):
         customer = session.get(Customer, payload.customer_id)
         if not customer:
@@ -120,12 +229,15 @@ def build_api_router(get_session) -> APIRouter:
         session.add(invoice)
         session.commit()
         session.refresh(invoice)
+        portal_cache.invalidate(invoice.customer_id)
         return invoice
 
     @router.patch("/invoices/{invoice_id}", response_model=InvoiceOut)
     def update_invoice(invoice_id: int, payload: InvoiceUpdate, session: Session = Depends(get_session)):
         invoice = session.get(Invoice, invoice_id)
         if not invoice:
+            if session.get(InvoiceArchive, invoice_id):
+                raise HTTPException(status_code=409, detail="Archived invoices cannot be changed")
             raise HTTPException(status_code=404, detail="Invoice not found")
 
         invoice.status = payload.status
@@ -133,6 +245,7 @@ def build_api_router(get_session) -> APIRouter:
         session.add(invoice)
         session.commit()
         session.refresh(invoice)
+        portal_cache.invalidate(invoice.customer_id)
         return invoice
 
     @router.post("/events", response_model=MonitoringEventOut, status_code=201)
@@ -144,11 +257,26 @@ def build_api_router(get_session) -> APIRouter:
         return event
 
     @router.get("/events", response_model=list[MonitoringEventOut])
-    def list_events(unacknowledged_only: bool = False, session: Session = Depends(get_session)):
-        statement = select(MonitoringEvent).order_by(MonitoringEvent.created_at.desc())
-        if unacknowledged_only:
-            statement = statement.where(MonitoringEvent.acknowledged.is_(False))
-        return session.exec(statement).all()
+    def list_events(
+        unacknowledged_only: bool = False,
+        since: int | None = Query(default=None, ge=0),
+        session: Session = Depends(get_session),
+    ):
+        version = changes.current_version(session.connection(), changes.EVENTS)
+        if since is None:
+            statement = select_fields(MonitoringEvent, MonitoringEventOut).order_by(MonitoringEvent.created_at.desc())
+            if unacknowledged_only:
+                statement = statement.where(MonitoringEvent.acknowledged.is_(False))
+        elif since >= version:
+            return Response(status_code=304, headers={CHANGE_VERSION_HEADER: str(version)})
+        else:
+            # A delta carries acknowledged events too, so pollers can drop them.
+            statement = (
+                select_fields(MonitoringEvent, MonitoringEventOut)
+                .where(MonitoringEvent.version > since, MonitoringEvent.version <= version)
+                .order_by(MonitoringEvent.version, MonitoringEvent.id)
+            )
+        return json_rows(session, statement, headers={CHANGE_VERSION_HEADER: str(version)})
 
     @router.post("/events/{event_id}/ack", response_model=MonitoringEventOut)
     def ack_event(event_id: int, session: Session = Depends(get_session)):
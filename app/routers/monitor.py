@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlmodel import Session, select
+
+from app.models import MonitorNode, Notification
+from app.schemas import MonitorNodeCreate, MonitorNodeOut, MonitorNodeUpdate, NotificationCreate, NotificationOut
+from app.services import timeseries
+from app.services.monitoring import MonitorService, set_probe_target
+from app.services.outbox import outbox_summary, record_notification
+from app.services.scheduler import MonitorScheduler
+
+LATENCY_RESOLUTIONS = {"1m": timeseries.MINUTE, "1h": timeseries.HOUR}
+
+
+def build_monitor_router(get_session, monitor: MonitorService, scheduler: MonitorScheduler) -> APIRouter:
+    router = APIRouter(prefix="/api", tags=["monitoring"])
+
+    @router.get("/monitor/nodes", response_model=list[MonitorNodeOut])
+    def list_nodes(session: Session = Depends(get_session)):
+        return session.exec(select(MonitorNode).order_by(MonitorNode.id)).all()
+
+    @router.post("/monitor/nodes", response_model=MonitorNodeOut, status_code=201)
+    def create_node(payload: MonitorNodeCreate, session: Session = Depends(get_session)):
+        node = MonitorNode(**payload.model_dump())
+        session.add(node)
+        session.commit()
+        session.refresh(node)
+        return node
+
+    @router.patch("/monitor/nodes/{node_id}", response_model=MonitorNodeOut)
+    def update_node(node_id: int, payload: MonitorNodeUpdate, session: Session = Depends(get_session)):
+        node = session.get(MonitorNode, node_id)
+        if not node:
+            raise HTTPException(status_code=404, detail="Node not found")
+        fields = payload.model_dump(exclude_unset=True)
+        set_probe_target(
+            node,
+            fields.get("host", node.host),
+            fields.get("probe_method") or node.probe_method,
+            fields.get("probe_port", node.probe_port),
+        )
+        session.add(node)
+        session.commit()
+        session.refresh(node)
+        return node
+
+    @router.post("/monitor/run")
+    def run_monitor_cycle():
+        if not monitor.owner:
+            # This worker's shard is the whole fleet; a cycle here would
+            # duplicate the owners' probes and alerts.
+            raise HTTPException(status_code=409, detail="Monitor cycles run in the worker that owns the scheduler")
+        result = scheduler.run_once()
+        if result is None:
+            # A cycle is already in flight; this request was skipped or folded
+            # into the follow-up cycle instead of contending for the write lock.
+            return JSONResponse({"status": scheduler.overlap, "scheduler": scheduler.snapshot()}, status_code=202)
+        return result
+
+    @router.get("/monitor/scheduler")
+    def scheduler_stats():
+        shard = f"{monitor.shard.index}/{monitor.shard.count}" if monitor.owner else None
+        return {**scheduler.snapshot(), "shard": shard}
+
+    @router.get("/monitor/nodes/{node_id}/latency")
+    def node_latency(
+        node_id: int,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        resolution: str = Query(default="auto", pattern=r"^(raw|1m|1h|auto)$"),
+        session: Session = Depends(get_session),
+    ):
+        if not session.get(MonitorNode, node_id):
+            raise HTTPException(status_code=404, detail="Node not found")
+        end = end or time.time()
+        start = start or end - 24 * timeseries.HOUR
+
+        if resolution == "raw":
+            if not monitor.owner or not monitor.shard.owns(node_id):
+                raise HTTPException(status_code=409, detail="Raw samples are kept only by the worker that probes this node")
+            points = [{"t": t, "latency": value} for t, value in monitor.series.recent(node_id, since=start) if t < end]
+            return {"node_id": node_id, "resolution": "raw", "points": points}
+
+        seconds = LATENCY_RESOLUTIONS.get(resolution) or timeseries.pick_resolution(start, end)
+        label = next(name for name, value in LATENCY_RESOLUTIONS.items() if value == seconds)
+        points = timeseries.query_range(session, node_id, start, end, seconds)
+        return {"node_id": node_id, "resolution": label, "points": points}
+
+    @router.get("/notifications", response_model=list[NotificationOut])
+    def list_notifications(
+        limit: int = Query(default=50, ge=1, le=500),
+        session: Session = Depends(get_session),
+    ):
+        return session.exec(select(Notification).order_by(Notification.created_at.desc()).limit(limit)).all()
+
+    @router.post("/notifications", response_model=NotificationOut, status_code=201)
+    def create_notification(payload: NotificationCreate, session: Session = Depends(get_session)):
+        notification = record_notification(session, payload.channel, payload.target, payload.message)
+        session.commit()
+        session.refresh(notification)
+        return notification
+
+    @router.get("/outbox/summary")
+    def outbox_status(session: Session = Depends(get_session)):
+        return outbox_summary(session)
+
+    return router
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from app.services import payments
+from app.services.payments import PaymentBatcher, RecentIds, SignatureError
+
+logger = logging.getLogger(__name__)
+
+# Daraja treats anything but ResultCode 0 as a rejection and retries.
+MPESA_ACCEPTED = {"ResultCode": 0, "ResultDesc": "Accepted"}
+
+
+def _verify(provider: str, request: Request, body: bytes, secret: str) -> None:
+    if provider == "mpesa":
+        payments.verify_token(request.query_params.get("token", ""), secret)
+    elif provider == "stripe":
+        payments.verify_stripe(body, request.headers.get("Stripe-Signature", ""), secret)
+    elif provider == "kopokopo":
+        payments.verify_hmac(body, request.headers.get("X-KopoKopo-Signature", ""), secret)
+    else:
+        payments.verify_hmac(body, request.headers.get("X-Signature", ""), secret)
+
+
+def _accepted(provider: str, **extra) -> JSONResponse:
+    content = MPESA_ACCEPTED if provider == "mpesa" else {"received": True, **extra}
+    return JSONResponse(content)
+
+
+def build_payments_router(batcher: PaymentBatcher, secrets: dict[str, str], recent: RecentIds) -> APIRouter:
+    router = APIRouter(prefix="/payments", tags=["payments"])
+
+    # Async on purpose: verification and enqueueing never block, so callbacks
+    # are answered on the event loop; only the one-row inbox insert that makes
+    # the acknowledgement durable runs in a thread.
+    @router.post("/{provider}/callback")
+    async def payment_callback(provider: str, request: Request):
+        if provider not in payments.PROVIDERS:
+            raise HTTPException(status_code=404, detail="Unknown payment provider")
+        secret = secrets.get(provider, "")
+        if not secret:
+            raise HTTPException(status_code=503, detail=f"{provider} callbacks are not configured")
+
+        body = await request.body()
+        try:
+            _verify(provider, request, body, secret)
+        except SignatureError as exc:
+            logger.warning("Rejected %s callback: %s", provider, exc)
+            raise HTTPException(status_code=401, detail="Invalid signature") from None
+        try:
+            notice = payments.PARSERS[provider](json.loads(body))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise HTTPException(status_code=400, detail="Malformed callback") from None
+
+        if notice is None:
+            # Event types we do not book (refunds, failed attempts, ...).
+            return _accepted(provider, ignored=True)
+        if not recent.add(notice.key):
+            return _accepted(provider, duplicate=True)
+        try:
+            stored = await asyncio.to_thread(batcher.persist, notice)
+        except Exception:
+            # Let the gateway retry later rather than accept what we cannot store.
+            recent.discard(notice.key)
+            logger.exception("Could not store %s payment %s", provider, notice.txn_id)
+            raise HTTPException(status_code=503, detail="Payment inbox is unavailable") from None
+        if stored is None:
+            return _accepted(provider, duplicate=True)
+        # A full queue only delays the payment: the inbox sweep writes it.
+        batcher.submit(stored)
+        return _accepted(provider)
+
+    @router.get("/queue")
+    def queue_status():
+        return {"queued": batcher.queue.qsize(), "written": batcher.written, "unmatched": batcher.unmatched}
+
+    return router
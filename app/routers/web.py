@@ -11,13 +11,19 @@ from app.models import (
     Customer,
     Invoice,
     MonitoringEvent,
+    MonitorNode,
     PaymentGateway,
     RouterProvision,
     Transaction,
     UserAccount,
 )
+from app.services.cache import CacheNamespace
+from app.services.dashboard import DASHBOARD_SECTIONS, DEFAULT_PAGE_SIZE, SectionQuery
 from app.services.metrics import collect_dashboard_metrics
 from app.services.mikrotik import assign_point_to_point_block, build_mikrotik_script
+from app.services.monitoring import set_probe_target
+from app.services.outbox import record_notification
+from app.services.portal import load_portal_data
 
 
 SESSION_COOKIE = "portal_user"
@@ -103,15 +109,14 @@ def _bootstrap_admin(session: Session) -> None:
     seed = UserAccount(username="admin", password="admin123", role="admin", active=True)
     session.add(seed)
     session.commit()
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlmodel import Session, select
 
-from app.models import Customer, Invoice, MonitoringEvent
-from app.services.metrics import collect_dashboard_metrics
 
-
-def build_web_router(get_session, templates: Jinja2Templates) -> APIRouter:
+def build_web_router(
+    get_session,
+    templates: Jinja2Templates,
+    portal_cache: CacheNamespace,
+    history_limit: int = 20,
+) -> APIRouter:
     router = APIRouter()
 
     @router.get("/", response_class=HTMLResponse)
@@ -154,39 +159,35 @@ def build_web_router(get_session, templates: Jinja2Templates) -> APIRouter:
     @router.get("/admin/dashboard", response_class=HTMLResponse)
     def admin_dashboard(request: Request, session: Session = Depends(get_session)):
         admin = _ensure_admin(request, session)
-        customers = session.exec(select(Customer).order_by(Customer.created_at.desc())).all()
-        accounts = session.exec(select(UserAccount).where(UserAccount.role == "client").order_by(UserAccount.created_at.desc())).all()
-        invoices = session.exec(select(Invoice).order_by(Invoice.created_at.desc())).all()
-        events = session.exec(select(MonitoringEvent).order_by(MonitoringEvent.created_at.desc())).all()
-        router_configs = session.exec(select(RouterProvision).order_by(RouterProvision.created_at.desc())).all()
         return templates.TemplateResponse(
             "admin_dashboard.html",
             {
                 "request": request,
                 "admin": admin,
-                "customers": customers,
-                "accounts": accounts,
-                "invoices": invoices,
-                "events": events,
-                "router_configs": router_configs,
-    def dashboard(request: Request, session: Session = Depends(get_session)):
-        customers = session.exec(select(Customer).order_by(Customer.created_at.desc())).all()
-        invoices = session.exec(select(Invoice).order_by(Invoice.created_at.desc())).all()
-        events = session.exec(select(MonitoringEvent).order_by(MonitoringEvent.created_at.desc())).all()
-
-        return templates.TemplateResponse(
-            "dashboard.html",
-            {
-                "request": request,
-                "customers": customers,
-                "invoices": invoices,
-                "events": events,
                 "stats": collect_dashboard_metrics(session),
             },
         )
 
+    @router.get("/admin/dashboard/sections/{section}", response_class=HTMLResponse)
+    def admin_dashboard_section(
+        section: str,
+        request: Request,
+        page: int = 1,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        q: str = "",
+        status: str = "",
+        session: Session = Depends(get_session),
+    ):
+        _ensure_admin(request, session)
+        loader = DASHBOARD_SECTIONS.get(section)
+        if not loader:
+            raise HTTPException(status_code=404, detail="Dashboard section not found")
+        result = loader(session, SectionQuery.build(page=page, page_size=page_size, q=q, status=status))
+        return templates.TemplateResponse(f"partials/{section}.html", {"request": request, "section": result})
+
     @router.post("/admin/accounts")
     def create_client_account(
+        request: Request,
         name: str = Form(...),
         email: str = Form(...),
         username: str = Form(...),
@@ -199,22 +200,12 @@ def build_web_router(get_session, templates: Jinja2Templates) -> APIRouter:
         wan_interface: str = Form("ether1"),
         lan_interface: str = Form("ether2"),
         session: Session = Depends(get_session),
-        request: Request = None,
     ):
         _ensure_admin(request, session)
         existing = session.exec(select(UserAccount).where(UserAccount.username == username)).first()
         if existing:
             raise HTTPException(status_code=400, detail="Username already exists")
 
-    @router.post("/customers")
-    def add_customer(
-        name: str = Form(...),
-        plan_name: str = Form(...),
-        monthly_rate: float = Form(...),
-        due_day: int = Form(...),
-        email: str = Form(...),
-        session: Session = Depends(get_session),
-    ):
         customer = Customer(
             name=name,
             plan_name=plan_name,
@@ -260,27 +251,21 @@ def build_web_router(get_session, templates: Jinja2Templates) -> APIRouter:
 
     @router.get("/client/portal", response_class=HTMLResponse)
     def client_portal(request: Request, session: Session = Depends(get_session)):
-        user, customer = _ensure_client(request, session)
-        invoices = session.exec(select(Invoice).where(Invoice.customer_id == customer.id).order_by(Invoice.created_at.desc())).all()
-        transactions = session.exec(
-            select(Transaction).where(Transaction.customer_id == customer.id).order_by(Transaction.created_at.desc())
-        ).all()
-        gateways = session.exec(
-            select(PaymentGateway).where(PaymentGateway.customer_id == customer.id).order_by(PaymentGateway.created_at.desc())
-        ).all()
-        router = session.exec(select(RouterProvision).where(RouterProvision.customer_id == customer.id)).first()
-        active_gateway_methods = [gateway.gateway_name for gateway in gateways if gateway.active]
+        username = request.cookies.get(SESSION_COOKIE)
+        data = load_portal_data(session, username, portal_cache, limit=history_limit) if username else None
+        if not data:
+            raise HTTPException(status_code=403, detail="Client access required")
         return templates.TemplateResponse(
             "client_portal.html",
             {
                 "request": request,
-                "user": user,
-                "customer": customer,
-                "invoices": invoices,
-                "transactions": transactions,
-                "gateways": gateways,
-                "router": router,
-                "active_gateway_methods": active_gateway_methods,
+                "user": data.user,
+                "customer": data.customer,
+                "invoices": data.history.invoices,
+                "transactions": data.history.transactions,
+                "gateways": data.history.gateways,
+                "router": data.router,
+                "active_gateway_methods": data.history.active_gateway_methods,
             },
         )
 
@@ -323,6 +308,7 @@ def build_web_router(get_session, templates: Jinja2Templates) -> APIRouter:
         )
         session.add(gateway)
         session.commit()
+        portal_cache.invalidate(customer.id)
         return RedirectResponse(url="/client/portal", status_code=303)
 
     @router.post("/client/payment-gateways/quick-add")
@@ -342,6 +328,7 @@ def build_web_router(get_session, templates: Jinja2Templates) -> APIRouter:
         )
         session.add(gateway)
         session.commit()
+        portal_cache.invalidate(customer.id)
         return RedirectResponse(url="/client/portal", status_code=303)
 
     @router.post("/client/payment-gateways/{gateway_id}/toggle")
@@ -357,6 +344,7 @@ def build_web_router(get_session, templates: Jinja2Templates) -> APIRouter:
         gateway.active = not gateway.active
         session.add(gateway)
         session.commit()
+        portal_cache.invalidate(customer.id)
         return RedirectResponse(url="/client/portal", status_code=303)
 
     @router.post("/client/routers")
@@ -397,6 +385,7 @@ def build_web_router(get_session, templates: Jinja2Templates) -> APIRouter:
         tx = Transaction(customer_id=customer.id, amount=amount, method=method, reference=reference)
         session.add(tx)
         session.commit()
+        portal_cache.invalidate(customer.id)
         return RedirectResponse(url="/client/portal", status_code=303)
 
     @router.get("/customers/{customer_id}/router-config", response_class=PlainTextResponse)
@@ -410,31 +399,59 @@ def build_web_router(get_session, templates: Jinja2Templates) -> APIRouter:
         provision = _ensure_router_provision(session, customer)
         return provision.script
 
-    @router.post("/events/{event_id}/ack")
-    def ack_event(event_id: int, request: Request, session: Session = Depends(get_session)):
+    @router.post("/customers")
+    def add_customer(
+        request: Request,
+        name: str = Form(...),
+        plan_name: str = Form(...),
+        monthly_rate: float = Form(...),
+        due_day: int = Form(...),
+        email: str = Form(...),
+        has_router: bool = Form(False),
+        router_identity: str = Form(""),
+        wan_interface: str = Form("ether1"),
+        lan_interface: str = Form("ether2"),
+        session: Session = Depends(get_session),
+    ):
         _ensure_admin(request, session)
+        customer = Customer(
+            name=name,
+            plan_name=plan_name,
+            monthly_rate=monthly_rate,
+            due_day=due_day,
+            email=email,
+            has_router=has_router,
+            router_identity=router_identity or None,
+            wan_interface=wan_interface,
+            lan_interface=lan_interface,
         )
         session.add(customer)
         session.commit()
-        return RedirectResponse(url="/", status_code=303)
+        session.refresh(customer)
+        if has_router:
+            _ensure_router_provision(session, customer)
+        return RedirectResponse(url="/admin/dashboard", status_code=303)
 
     @router.post("/customers/{customer_id}/toggle")
-    def toggle_customer_status(customer_id: int, session: Session = Depends(get_session)):
+    def toggle_customer_status(customer_id: int, request: Request, session: Session = Depends(get_session)):
+        _ensure_admin(request, session)
         customer = session.get(Customer, customer_id)
         if not customer:
             raise HTTPException(status_code=404, detail="Customer not found")
         customer.active = not customer.active
         session.add(customer)
         session.commit()
-        return RedirectResponse(url="/", status_code=303)
+        return RedirectResponse(url="/admin/dashboard", status_code=303)
 
     @router.post("/invoices")
     def create_invoice(
+        request: Request,
         customer_id: int = Form(...),
         billing_month: str = Form(...),
         amount: float = Form(...),
         session: Session = Depends(get_session),
     ):
+        _ensure_admin(request, session)
         customer = session.get(Customer, customer_id)
         if not customer:
             raise HTTPException(status_code=404, detail="Customer not found")
@@ -442,10 +459,12 @@ def build_web_router(get_session, templates: Jinja2Templates) -> APIRouter:
         invoice = Invoice(customer_id=customer_id, billing_month=billing_month, amount=amount)
         session.add(invoice)
         session.commit()
-        return RedirectResponse(url="/", status_code=303)
+        portal_cache.invalidate(customer_id)
+        return RedirectResponse(url="/admin/dashboard", status_code=303)
 
     @router.post("/invoices/{invoice_id}/mark-paid")
-    def mark_invoice_paid(invoice_id: int, session: Session = Depends(get_session)):
+    def mark_invoice_paid(invoice_id: int, request: Request, session: Session = Depends(get_session)):
+        _ensure_admin(request, session)
         invoice = session.get(Invoice, invoice_id)
         if not invoice:
             raise HTTPException(status_code=404, detail="Invoice not found")
@@ -454,22 +473,26 @@ def build_web_router(get_session, templates: Jinja2Templates) -> APIRouter:
         invoice.paid_at = datetime.utcnow()
         session.add(invoice)
         session.commit()
-        return RedirectResponse(url="/", status_code=303)
+        portal_cache.invalidate(invoice.customer_id)
+        return RedirectResponse(url="/admin/dashboard", status_code=303)
 
     @router.post("/events")
     def create_event(
+        request: Request,
         service_name: str = Form(...),
         severity: str = Form(...),
         message: str = Form(...),
         session: Session = Depends(get_session),
     ):
+        _ensure_admin(request, session)
         event = MonitoringEvent(service_name=service_name, severity=severity, message=message)
         session.add(event)
         session.commit()
-        return RedirectResponse(url="/", status_code=303)
+        return RedirectResponse(url="/admin/dashboard", status_code=303)
 
     @router.post("/events/{event_id}/ack")
-    def ack_event(event_id: int, session: Session = Depends(get_session)):
+    def ack_event(event_id: int, request: Request, session: Session = Depends(get_session)):
+        _ensure_admin(request, session)
         event = session.get(MonitoringEvent, event_id)
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
@@ -479,6 +502,43 @@ def build_web_router(get_session, templates: Jinja2Templates) -> APIRouter:
         session.add(event)
         session.commit()
         return RedirectResponse(url="/admin/dashboard", status_code=303)
-        return RedirectResponse(url="/", status_code=303)
+
+    @router.post("/monitor/nodes/{node_id}")
+    def update_monitor_node(
+        node_id: int,
+        request: Request,
+        host: str = Form(""),
+        probe_method: str = Form("tcp"),
+        probe_port: str = Form(""),
+        session: Session = Depends(get_session),
+    ):
+        _ensure_admin(request, session)
+        node = session.get(MonitorNode, node_id)
+        if not node:
+            raise HTTPException(status_code=404, detail="Node not found")
+        if probe_method not in {"icmp", "tcp", "http", "https"}:
+            raise HTTPException(status_code=400, detail="Unsupported probe method")
+        # The form posts an empty port for "use the method's default".
+        port = probe_port.strip()
+        if port and not (port.isdigit() and 1 <= int(port) <= 65535):
+            raise HTTPException(status_code=400, detail="Probe port must be between 1 and 65535")
+
+        set_probe_target(node, host.strip() or None, probe_method, int(port) if port else None)
+        session.add(node)
+        session.commit()
+        return RedirectResponse(url="/admin/dashboard", status_code=303)
+
+    @router.post("/notifications")
+    def create_notification(
+        request: Request,
+        channel: str = Form(...),
+        target: str = Form(...),
+        message: str = Form(...),
+        session: Session = Depends(get_session),
+    ):
+        _ensure_admin(request, session)
+        record_notification(session, channel, target.strip(), message.strip())
+        session.commit()
+        return RedirectResponse(url="/admin/dashboard", status_code=303)
 
     return router
@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class CustomerCreate(BaseModel):
@@ -18,6 +18,18 @@ class CustomerCreate(BaseModel):
     lan_interface: str = Field(default="ether2", min_length=2, max_length=40)
 
 
+class CustomerImport(CustomerCreate):
+    # With a username the row also gets a client portal account.
+    username: Optional[str] = Field(default=None, min_length=3, max_length=80)
+    password: Optional[str] = Field(default=None, min_length=4, max_length=255)
+
+    @model_validator(mode="after")
+    def _password_with_username(self) -> "CustomerImport":
+        if self.username and not self.password:
+            raise ValueError("password is required with username")
+        return self
+
+
 class CustomerUpdate(BaseModel):
     plan_name: Optional[str] = Field(default=None, min_length=2, max_length=80)
     monthly_rate: Optional[float] = Field(default=None, ge=0)
@@ -70,6 +82,27 @@ class InvoiceOut(BaseModel):
     paid_at: Optional[datetime]
 
 
+class PaymentSuspenseOut(BaseModel):
+    id: int
+    provider: str
+    provider_txn_id: str
+    customer_ref: str
+    amount: Optional[float]
+    method: str
+    reason: str
+    detail: str
+    received_at: datetime
+
+
+class CustomerBalanceOut(BaseModel):
+    customer_id: int
+    invoiced: float
+    outstanding: float
+    paid: float
+    balance: float
+    updated_at: datetime
+
+
 class MonitoringEventCreate(BaseModel):
     service_name: str = Field(min_length=2, max_length=120)
     severity: str = Field(pattern=r"^(info|warning|critical)$")
@@ -78,9 +111,54 @@ class MonitoringEventCreate(BaseModel):
 
 class MonitoringEventOut(BaseModel):
     id: int
+    node_id: Optional[int] = None
     service_name: str
     severity: str
     message: str
     created_at: datetime
     acknowledged: bool
     acknowledged_at: Optional[datetime]
+
+
+class MonitorNodeCreate(BaseModel):
+    name: str = Field(min_length=2, max_length=120)
+    region: str = Field(min_length=2, max_length=120)
+    expected_latency_ms: int = Field(ge=0)
+    host: Optional[str] = Field(default=None, min_length=1, max_length=255)
+    probe_method: str = Field(default="tcp", pattern=r"^(icmp|tcp|http|https)$")
+    probe_port: Optional[int] = Field(default=None, ge=1, le=65535)
+
+
+class MonitorNodeUpdate(BaseModel):
+    # Fields left out keep their current value; an explicit null host stops probing.
+    host: Optional[str] = Field(default=None, min_length=1, max_length=255)
+    probe_method: Optional[str] = Field(default=None, pattern=r"^(icmp|tcp|http|https)$")
+    probe_port: Optional[int] = Field(default=None, ge=1, le=65535)
+
+
+class MonitorNodeOut(BaseModel):
+    id: int
+    name: str
+    region: str
+    expected_latency_ms: int
+    host: Optional[str]
+    probe_method: str
+    probe_port: Optional[int]
+    last_latency_ms: Optional[int]
+    last_seen: Optional[datetime]
+    health: str
+    created_at: datetime
+
+
+class NotificationCreate(BaseModel):
+    channel: str = Field(pattern=r"^(email|sms|voice)$")
+    target: str = Field(min_length=2, max_length=255)
+    message: str = Field(min_length=2, max_length=1000)
+
+
+class NotificationOut(BaseModel):
+    id: int
+    channel: str
+    target: str
+    message: str
+    created_at: datetime
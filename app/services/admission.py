@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from starlette.routing import compile_path
+
+# Lower runs first. Admin pages and the pollers behind them stay responsive
+# while ingest traffic is shed.
+HIGH, NORMAL, INGEST = 0, 1, 2
+LANE_NAMES = {HIGH: "high", NORMAL: "normal", INGEST: "ingest"}
+# Share of the queue-time budget each lane may spend waiting for a slot.
+LANE_QUEUE_SHARE = {HIGH: 1.0, NORMAL: 1.0, INGEST: 0.25}
+HIGH_PRIORITY_PREFIXES = ("/admin", "/metrics", "/api/health", "/api/metrics", "/api/reports", "/static")
+INGEST_PREFIXES = ("/payments/",)
+
+
+@dataclass(frozen=True)
+class RateRule:
+    """Token-bucket limits for one route: per client and for all clients."""
+
+    method: str
+    path: str
+    client_rate: float
+    client_burst: float
+    route_rate: float
+    route_burst: float
+
+
+DEFAULT_RATE_RULES = (
+    RateRule("POST", "/api/events", client_rate=20, client_burst=40, route_rate=400, route_burst=800),
+    RateRule("POST", "/client/transactions", client_rate=0.2, client_burst=5, route_rate=50, route_burst=100),
+    RateRule("POST", "/login", client_rate=1, client_burst=10, route_rate=50, route_burst=100),
+)
+
+
+def scale_rules(rules: tuple[RateRule, ...], factor: float) -> tuple[RateRule, ...]:
+    return tuple(
+        RateRule(
+            rule.method,
+            rule.path,
+            rule.client_rate * factor,
+            max(rule.client_burst * factor, 1),
+            rule.route_rate * factor,
+            max(rule.route_burst * factor, 1),
+        )
+        for rule in rules
+    )
+
+
+class TokenBuckets:
+    """Token buckets stored as ``key -> (tokens, updated)`` pairs in one LRU
+    dict, so a flood of distinct clients costs a bounded amount of memory."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[tuple, tuple[float, float]] = OrderedDict()
+
+    def take(self, limits: list[tuple[tuple, float, float]], now: float | None = None) -> float:
+        """Take one token from every ``(key, rate, burst)`` bucket, or none.
+
+        Returns 0 when admitted, otherwise the seconds until all of them
+        would have a token.
+        """
+        now = time.monotonic() if now is None else now
+        levels = []
+        wait = 0.0
+        for key, rate, burst in limits:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            levels.append((key, tokens))
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / rate if rate > 0 else math.inf)
+        for key, tokens in levels:
+            self._buckets[key] = (tokens if wait else tokens - 1, now)
+            self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+@dataclass
+class AdmissionStats:
+    admitted: dict[str, int] = field(default_factory=lambda: dict.fromkeys(LANE_NAMES.values(), 0))
+    queued: dict[str, int] = field(default_factory=lambda: dict.fromkeys(LANE_NAMES.values(), 0))
+    shed: dict[str, int] = field(default_factory=lambda: dict.fromkeys(LANE_NAMES.values(), 0))
+    rate_limited: dict[str, int] = field(default_factory=dict)
+
+
+class AdmissionController:
+    """Caps concurrent requests per worker, with priority lanes.
+
+    The high lane may use every slot; the others leave ``reserved`` slots
+    free for it. A request that finds no free slot waits in priority order
+    for at most its lane's share of ``queue_seconds`` and is then shed. All
+    state lives on the worker's event loop, so no locks are needed.
+    """
+
+    def __init__(self, limit: int, reserved: int = 0, queue_seconds: float = 2.0):
+        self.limit = limit
+        self.reserved = min(reserved, max(limit - 1, 0))
+        self.queue_seconds = queue_seconds
+        self.active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    def _capacity(self, lane: int) -> int:
+        return self.limit if lane == HIGH else self.limit - self.reserved
+
+    def _head(self) -> tuple[int, int, asyncio.Future] | None:
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        return self._waiters[0] if self._waiters else None
+
+    def try_acquire(self, lane: int) -> bool:
+        head = self._head()
+        if (head is None or head[0] > lane) and self.active < self._capacity(lane):
+            self.active += 1
+            return True
+        return False
+
+    async def wait(self, lane: int) -> bool:
+        """Queue for a slot; False once the lane's budget is spent."""
+        budget = self.queue_seconds * LANE_QUEUE_SHARE[lane]
+        if budget <= 0:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (lane, next(self._sequence), waiter))
+        try:
+            await asyncio.wait_for(waiter, budget)
+            return True
+        except asyncio.TimeoutError:
+            # The slot may have been handed over just as the budget ran out.
+            return waiter.done() and not waiter.cancelled()
+
+    def release(self) -> None:
+        self.active -= 1
+        while (head := self._head()) is not None and self.active < self._capacity(head[0]):
+            heapq.heappop(self._waiters)
+            self.active += 1
+            head[2].set_result(True)
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+
+def request_lane(method: str, path: str, rule: RateRule | None) -> int:
+    if path.startswith(HIGH_PRIORITY_PREFIXES) or (method == "GET" and path == "/api/events"):
+        return HIGH
+    if rule is not None or path.startswith(INGEST_PREFIXES):
+        return INGEST
+    return NORMAL
+
+
+def _client_id(scope) -> str:
+    # The address, not the session cookie: cookies are chosen by the client.
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def _reject(send, status: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class Admission:
+    """Rate-limit rules, bucket state, the concurrency controller and
+    counters for one worker; shared by the middleware and /metrics/admission."""
+
+    def __init__(
+        self,
+        rules: tuple[RateRule, ...] = DEFAULT_RATE_RULES,
+        controller: AdmissionController | None = None,
+        max_clients: int = 100_000,
+    ):
+        self.rules = [(rule, compile_path(rule.path)[0]) for rule in rules]
+        self.controller = controller
+        self.buckets = TokenBuckets(max_clients)
+        self.stats = AdmissionStats()
+
+    def rule(self, method: str, path: str) -> RateRule | None:
+        for rule, pattern in self.rules:
+            if rule.method == method and pattern.match(path):
+                return rule
+        return None
+
+    def snapshot(self) -> dict:
+        controller = self.controller
+        return {
+            "in_flight": controller.active if controller else 0,
+            "waiting": controller.waiting if controller else 0,
+            "admitted": dict(self.stats.admitted),
+            "queued": dict(self.stats.queued),
+            "shed": dict(self.stats.shed),
+            "rate_limited": dict(self.stats.rate_limited),
+            "tracked_buckets": len(self.buckets),
+        }
+
+
+class AdmissionMiddleware:
+    """Rate limits the routes with a rule (429) and sheds requests that
+    cannot get a concurrency slot in time (503), both with Retry-After."""
+
+    def __init__(self, app, admission: Admission):
+        self.app = app
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        admission = self.admission
+        method, path = scope["method"], scope["path"]
+        rule = admission.rule(method, path)
+        if rule is not None:
+            client = _client_id(scope)
+            wait = admission.buckets.take(
+                [
+                    ((rule.path, client), rule.client_rate, rule.client_burst),
+                    ((rule.path, None), rule.route_rate, rule.route_burst),
+                ]
+            )
+            if wait:
+                admission.stats.rate_limited[rule.path] = admission.stats.rate_limited.get(rule.path, 0) + 1
+                await _reject(send, 429, "Too many requests", wait)
+                return
+
+        controller = admission.controller
+        if controller is None or controller.limit <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        lane = request_lane(method, path, rule)
+        lane_name = LANE_NAMES[lane]
+        if not controller.try_acquire(lane):
+            admission.stats.queued[lane_name] += 1
+            if not await controller.wait(lane):
+                admission.stats.shed[lane_name] += 1
+                await _reject(send, 503, "Server is busy", controller.queue_seconds)
+                return
+        admission.stats.admitted[lane_name] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release()
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import case, delete, func, insert, literal, or_, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+from app.models import AgingBucket, AgingSnapshot, Customer
+from app.services import changes
+from app.services.archive import invoice_history
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ("days_0_30", "days_31_60", "days_61_90", "days_over_90")
+
+_snapshots = AgingSnapshot.__table__
+_buckets = AgingBucket.__table__
+
+# (engine, day) pairs with a background refresh in flight in this process.
+_refreshing: set[tuple[int, date]] = set()
+_refreshing_lock = threading.Lock()
+
+
+def _day_end(day: date) -> datetime:
+    return datetime.combine(day + timedelta(days=1), time.min)
+
+
+def _aging_select(as_of: date):
+    """One grouped aggregate over the invoices still unpaid at the end of
+    ``as_of``, bucketed by days since the invoice was raised."""
+    end = _day_end(as_of)
+    cutoffs = [datetime.combine(as_of - timedelta(days=days), time.min) for days in (30, 60, 90)]
+    # Paid later than as_of still counts as open on that day; paid rows
+    # without a stamp (legacy imports) are treated as settled. Archived rows
+    # are all paid, so only a past as_of reaches them, through paid_at.
+    open_invoices = invoice_history(
+        ("customer_id", "amount", "created_at"),
+        where=lambda table: [table.c.created_at < end, or_(table.c.status != "paid", table.c.paid_at >= end)],
+        order_by=None,
+    ).subquery()
+    bucket = case(
+        (open_invoices.c.created_at >= cutoffs[0], 0),
+        (open_invoices.c.created_at >= cutoffs[1], 1),
+        (open_invoices.c.created_at >= cutoffs[2], 2),
+        else_=3,
+    )
+    amount = open_invoices.c.amount
+    sums = [func.sum(case((bucket == index, amount), else_=0)).label(name) for index, name in enumerate(BUCKETS)]
+    return (
+        select(
+            literal(as_of).label("snapshot_date"),
+            open_invoices.c.customer_id.label("customer_id"),
+            Customer.plan_name.label("plan_name"),
+            *sums,
+            func.sum(amount).label("total"),
+        )
+        .join(Customer, Customer.id == open_invoices.c.customer_id)
+        .group_by(open_invoices.c.customer_id, Customer.plan_name)
+    )
+
+
+def compute_snapshot(engine: Engine, as_of: date) -> AgingSnapshot:
+    """Replace the snapshot for ``as_of`` with a fresh INSERT ... SELECT."""
+    with engine.begin() as conn:
+        version = changes.current_version(conn, changes.BILLING)
+        conn.execute(delete(_buckets).where(_buckets.c.snapshot_date == as_of))
+        conn.execute(delete(_snapshots).where(_snapshots.c.snapshot_date == as_of))
+        snapshot = {"snapshot_date": as_of, "billing_version": version, "computed_at": datetime.utcnow()}
+        conn.execute(insert(_snapshots), snapshot)
+        conn.execute(
+            insert(_buckets).from_select(
+                ["snapshot_date", "customer_id", "plan_name", *BUCKETS, "total"], _aging_select(as_of)
+            )
+        )
+    return AgingSnapshot(**snapshot)
+
+
+def _stored(conn: Connection, as_of: date) -> AgingSnapshot | None:
+    row = conn.execute(select(_snapshots).where(_snapshots.c.snapshot_date == as_of)).mappings().first()
+    return AgingSnapshot(**row) if row else None
+
+
+def _refresh(engine: Engine, as_of: date, key: tuple[int, date]) -> None:
+    try:
+        compute_snapshot(engine, as_of)
+    except IntegrityError:
+        pass  # another worker refreshed it first
+    except Exception:
+        logger.exception("Could not refresh the aging snapshot for %s", as_of)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(key)
+
+
+def refresh_in_background(engine: Engine, as_of: date) -> bool:
+    """Recompute the snapshot for ``as_of`` in a thread; False if one is
+    already running in this process."""
+    key = (id(engine), as_of)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+    threading.Thread(target=_refresh, args=(engine, as_of, key), name="aging-refresh", daemon=True).start()
+    return True
+
+
+def _current(conn: Connection, snapshot: AgingSnapshot, today: date) -> bool:
+    day_closed = snapshot.snapshot_date < today and snapshot.computed_at >= _day_end(snapshot.snapshot_date)
+    return day_closed or snapshot.billing_version == changes.current_version(conn, changes.BILLING)
+
+
+def ensure_snapshot(engine: Engine, as_of: date, today: date | None = None) -> AgingSnapshot:
+    """The stored snapshot for ``as_of``, computing it when missing.
+
+    A snapshot taken after its day ended is final. Anything newer is
+    recomputed only once an invoice or customer write has moved the billing
+    stream on, so repeated reads of today cost one indexed lookup.
+    """
+    today = today or datetime.utcnow().date()
+    with engine.connect() as conn:
+        snapshot = _stored(conn, as_of)
+        if snapshot and _current(conn, snapshot, today):
+            return snapshot
+    try:
+        return compute_snapshot(engine, as_of)
+    except IntegrityError:
+        # Another worker took the same snapshot first.
+        with engine.connect() as conn:
+            return _stored(conn, as_of)
+
+
+def aging_report(engine: Engine, as_of: date, group_by: str = "customer", limit: int = 100, offset: int = 0) -> dict:
+    # A stale snapshot is served as is and recomputed in the background
+    # afterwards, so billing writes never make a report wait for it.
+    with engine.connect() as conn:
+        snapshot = _stored(conn, as_of)
+        stale = snapshot is not None and not _current(conn, snapshot, datetime.utcnow().date())
+    if snapshot is None:
+        snapshot = ensure_snapshot(engine, as_of)
+    columns = [func.sum(_buckets.c[name]).label(name) for name in (*BUCKETS, "total")]
+    if group_by == "plan":
+        keys = [_buckets.c.plan_name]
+    else:
+        keys = [_buckets.c.customer_id, Customer.name.label("customer_name"), _buckets.c.plan_name]
+    scoped = _buckets.c.snapshot_date == as_of
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(*keys, *columns)
+            .select_from(_buckets.join(Customer, Customer.id == _buckets.c.customer_id))
+            .where(scoped)
+            .group_by(*keys)
+            .order_by(func.sum(_buckets.c.total).desc(), *keys)
+            .limit(limit)
+            .offset(offset)
+        ).mappings()
+        groups = [dict(row) for row in rows]
+        totals = dict(conn.execute(select(*columns).where(scoped)).mappings().one())
+    if stale:
+        refresh_in_background(engine, as_of)
+    return {
+        "as_of": as_of.isoformat(),
+        "computed_at": snapshot.computed_at,
+        "group_by": group_by,
+        "rows": groups,
+        "totals": {name: round(float(value or 0), 2) for name, value in totals.items()},
+    }
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+HEALTHY = 0
+WARNING = 1
+CRITICAL = 2
+
+HEALTH_LABELS = ("healthy", "degraded", "critical")
+SEVERITY_LABELS = ("info", "warning", "critical")
+
+
+@dataclass(frozen=True)
+class Assessment:
+    """Per-node verdicts of one cycle, aligned with the ``node_ids`` passed in."""
+
+    node_ids: np.ndarray
+    severity: np.ndarray
+    zscore: np.ndarray
+    breach_run: np.ndarray
+    baseline_ms: np.ndarray
+
+
+class AnomalyDetector:
+    """Adaptive latency baselines for the whole node fleet.
+
+    Every node keeps an exponentially weighted mean and variance of its own
+    latency, so a link that is naturally noisy gets a wide band and a quiet
+    one a narrow band. State lives in flat NumPy arrays indexed by node id,
+    which lets a cycle be classified and folded into the baselines in a
+    handful of vectorized operations regardless of fleet size.
+
+    Rules, in order of precedence:
+
+    * unreachable nodes are critical;
+    * a z-score of ``critical_z`` or more is critical;
+    * ``sustained_cycles`` consecutive cycles above ``warning_z`` are critical;
+    * a single cycle above ``warning_z`` is a warning.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.1,
+        warning_z: float = 3.0,
+        critical_z: float = 6.0,
+        sustained_cycles: int = 3,
+        min_std_ms: float = 2.0,
+        seed_std_ratio: float = 0.25,
+    ):
+        self.alpha = alpha
+        self.warning_z = warning_z
+        self.critical_z = critical_z
+        self.sustained_cycles = sustained_cycles
+        self.min_std_ms = min_std_ms
+        self.seed_std_ratio = seed_std_ratio
+        self.mean = np.zeros(0)
+        self.var = np.zeros(0)
+        self.breach_run = np.zeros(0, dtype=np.int32)
+        self.known = np.zeros(0, dtype=bool)
+
+    def _reserve(self, max_node_id: int) -> None:
+        size = len(self.mean)
+        if max_node_id < size:
+            return
+        grown = max(max_node_id + 1, 2 * size, 1024)
+        extra = grown - size
+        self.mean = np.concatenate([self.mean, np.zeros(extra)])
+        self.var = np.concatenate([self.var, np.zeros(extra)])
+        self.breach_run = np.concatenate([self.breach_run, np.zeros(extra, dtype=np.int32)])
+        self.known = np.concatenate([self.known, np.zeros(extra, dtype=bool)])
+
+    def _seed(self, slots: np.ndarray, expected_ms: np.ndarray) -> None:
+        new = ~self.known[slots]
+        if not new.any():
+            return
+        fresh = slots[new]
+        expected = expected_ms[new].astype(float)
+        self.mean[fresh] = expected
+        self.var[fresh] = np.maximum(expected * self.seed_std_ratio, self.min_std_ms) ** 2
+        self.breach_run[fresh] = 0
+        self.known[fresh] = True
+
+    def forget(self, node_ids) -> None:
+        slots = np.asarray(node_ids, dtype=np.int64)
+        slots = slots[slots < len(self.known)]
+        self.known[slots] = False
+
+    def evaluate(self, node_ids, latency_ms, expected_ms) -> Assessment:
+        """Classifies one cycle and updates the baselines.
+
+        ``latency_ms`` holds NaN for nodes that did not answer. ``expected_ms``
+        seeds the baseline of nodes seen for the first time.
+        """
+        slots = np.asarray(node_ids, dtype=np.int64)
+        latency = np.asarray(latency_ms, dtype=float)
+        if slots.size == 0:
+            empty = np.zeros(0)
+            return Assessment(slots, empty.astype(np.int8), empty, empty.astype(np.int32), empty)
+        self._reserve(int(slots.max()))
+        self._seed(slots, np.asarray(expected_ms, dtype=float))
+
+        mean = self.mean[slots]
+        std = np.maximum(np.sqrt(self.var[slots]), self.min_std_ms)
+        reachable = ~np.isnan(latency)
+        zscore = np.where(reachable, (np.nan_to_num(latency) - mean) / std, np.inf)
+
+        breached = zscore >= self.warning_z
+        breach_run = np.where(breached, self.breach_run[slots] + 1, 0).astype(np.int32)
+        self.breach_run[slots] = breach_run
+
+        severity = np.where(breached, WARNING, HEALTHY).astype(np.int8)
+        critical = ~reachable | (zscore >= self.critical_z) | (breach_run >= self.sustained_cycles)
+        severity[critical] = CRITICAL
+
+        # Spikes are clipped before they enter the baseline so a single outage
+        # does not widen the band, while a lasting level shift is still
+        # absorbed over a few dozen cycles.
+        observed = np.clip(latency[reachable], None, mean[reachable] + self.critical_z * std[reachable])
+        updated = slots[reachable]
+        diff = observed - mean[reachable]
+        increment = self.alpha * diff
+        self.mean[updated] = mean[reachable] + increment
+        self.var[updated] = (1 - self.alpha) * (self.var[updated] + diff * increment)
+
+        return Assessment(slots, severity, zscore, breach_run, mean)
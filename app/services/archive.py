@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Callable, Sequence
+from datetime import datetime, timedelta
+
+from sqlalchemy import Table, delete, func, insert, select, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import ColumnElement, CompoundSelect
+
+from app.models import Invoice, InvoiceArchive
+
+logger = logging.getLogger(__name__)
+
+INVOICE_COLUMNS = ("id", "customer_id", "billing_month", "amount", "status", "created_at", "paid_at")
+# Archived rows are always paid, so these filters never need the archive.
+HOT_ONLY_STATUSES = {"unpaid", "overdue"}
+
+_hot = Invoice.__table__
+_archive = InvoiceArchive.__table__
+
+
+def invoice_history(
+    columns: Sequence[str] = INVOICE_COLUMNS,
+    where: Callable[[Table], list[ColumnElement]] | None = None,
+    order_by: str | None = "id",
+    limit: int | None = None,
+) -> CompoundSelect:
+    """``UNION ALL`` of hot and archived invoices, newest ``order_by`` first.
+
+    ``where`` builds each branch's filters from its table, so both sides
+    can use their own indexes. With ``limit`` each branch is cut to that
+    many rows before the merge, as the portal history does. Aggregates pass
+    ``order_by=None``.
+    """
+    branches = []
+    for table in (_hot, _archive):
+        branch = select(*[table.c[name] for name in columns])
+        if where is not None:
+            branch = branch.where(*where(table))
+        if limit is not None:
+            branch = select(branch.order_by(table.c[order_by].desc()).limit(limit).subquery())
+        branches.append(branch)
+    history = union_all(*branches)
+    return history if order_by is None else history.order_by(history.selected_columns[order_by].desc())
+
+
+def _move_batch(engine: Engine, horizon: datetime, batch_size: int) -> int:
+    # SQLite hands max(id) + 1 to the next insert, so the newest row stays
+    # put and an archived id can never be issued again.
+    newest = select(func.max(_hot.c.id)).scalar_subquery()
+    with engine.begin() as conn:
+        rows = conn.execute(
+            select(*[_hot.c[name] for name in INVOICE_COLUMNS])
+            .where(_hot.c.status == "paid", _hot.c.paid_at < horizon, _hot.c.id < newest)
+            .order_by(_hot.c.id)
+            .limit(batch_size)
+        ).all()
+        if rows:
+            # archive_seq continues from the last committed batch; its unique
+            # index fails a concurrent archiver that read the same maximum.
+            last = conn.execute(select(func.coalesce(func.max(_archive.c.archive_seq), 0))).scalar_one()
+            archived_at = datetime.utcnow()
+            conn.execute(
+                insert(_archive),
+                [
+                    {**row._mapping, "archived_at": archived_at, "archive_seq": last + offset}
+                    for offset, row in enumerate(rows, start=1)
+                ],
+            )
+            conn.execute(delete(_hot).where(_hot.c.id.in_([row.id for row in rows])))
+    return len(rows)
+
+
+def archive_paid_invoices(
+    engine: Engine,
+    older_than_days: int,
+    batch_size: int = 1000,
+    max_batches: int | None = None,
+    now: datetime | None = None,
+) -> int:
+    """Move invoices paid more than ``older_than_days`` ago into the archive.
+
+    Each batch of ``batch_size`` rows is copied and deleted in its own short
+    transaction, so locks are held briefly however much is due. The deletes
+    bypass the ORM on purpose: archived invoices still count towards the
+    ledger balances. Returns how many invoices were moved.
+    """
+    horizon = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        try:
+            count = _move_batch(engine, horizon, batch_size)
+        except IntegrityError:
+            logger.info("Another worker is archiving invoices; stopping after %d", moved)
+            break
+        if not count:
+            break
+        moved += count
+        batches += 1
+    return moved
+
+
+async def archive_forever(
+    engine: Engine, older_than_days: int, interval_seconds: float, stop: asyncio.Event, batch_size: int = 1000
+) -> None:
+    while not stop.is_set():
+        try:
+            moved = await asyncio.to_thread(archive_paid_invoices, engine, older_than_days, batch_size)
+            if moved:
+                logger.info("Archived %d paid invoices older than %d days", moved, older_than_days)
+        except Exception:
+            logger.exception("Invoice archiving failed")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval_seconds)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+try:  # brotli is optional; gzip variants are always produced.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deployment image
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".json", ".svg", ".html", ".txt", ".map"}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@dataclass
+class Asset:
+    source: Path
+    fingerprinted_name: str
+    media_type: str
+    variants: dict[str, Path] = field(default_factory=dict)
+
+
+def _fingerprint(relative_path: str, digest: str) -> str:
+    stem, dot, suffix = relative_path.rpartition(".")
+    if not dot or "/" in suffix:
+        return f"{relative_path}.{digest}"
+    return f"{stem}.{digest}.{suffix}"
+
+
+def _write_atomic(target: Path, payload: bytes) -> None:
+    if target.exists():
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    handle, temp_name = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+    with os.fdopen(handle, "wb") as temp_file:
+        temp_file.write(payload)
+    # Several workers may build at once; names are content addressed so the
+    # last rename wins with identical bytes.
+    os.replace(temp_name, target)
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = params.strip()
+        if quality.startswith("q=") and quality[2:].strip() in {"0", "0.0", "0.00", "0.000"}:
+            continue
+        accepted.add(token)
+    return accepted
+
+
+class AssetManifest:
+    """Content-hashed view of a static directory with precompressed variants."""
+
+    def __init__(self, source_dir: Path, build_dir: Path, url_prefix: str = "/static"):
+        self.source_dir = Path(source_dir)
+        self.build_dir = Path(build_dir)
+        self.url_prefix = url_prefix.rstrip("/")
+        self._by_source: dict[str, Asset] = {}
+        self._by_fingerprint: dict[str, Asset] = {}
+
+    def build(self) -> "AssetManifest":
+        for source in sorted(path for path in self.source_dir.rglob("*") if path.is_file()):
+            relative = source.relative_to(self.source_dir).as_posix()
+            payload = source.read_bytes()
+            digest = hashlib.sha256(payload).hexdigest()[:12]
+            fingerprinted = _fingerprint(relative, digest)
+            media_type = mimetypes.guess_type(relative)[0] or "application/octet-stream"
+            asset = Asset(source=source, fingerprinted_name=fingerprinted, media_type=media_type)
+
+            if source.suffix in COMPRESSIBLE_SUFFIXES:
+                gzipped = gzip.compress(payload, compresslevel=9, mtime=0)
+                if len(gzipped) < len(payload):
+                    target = self.build_dir / f"{fingerprinted}.gz"
+                    _write_atomic(target, gzipped)
+                    asset.variants["gzip"] = target
+                if brotli is not None:
+                    compressed = brotli.compress(payload, quality=11)
+                    if len(compressed) < len(payload):
+                        target = self.build_dir / f"{fingerprinted}.br"
+                        _write_atomic(target, compressed)
+                        asset.variants["br"] = target
+
+            self._by_source[relative] = asset
+            self._by_fingerprint[fingerprinted] = asset
+
+        logger.info("Built %d static assets into %s", len(self._by_source), self.build_dir)
+        return self
+
+    def url(self, relative_path: str) -> str:
+        asset = self._by_source.get(relative_path.lstrip("/"))
+        name = asset.fingerprinted_name if asset else relative_path.lstrip("/")
+        return f"{self.url_prefix}/{name}"
+
+    def lookup(self, fingerprinted_name: str) -> Asset | None:
+        return self._by_fingerprint.get(fingerprinted_name)
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """Serves fingerprinted asset paths with precompressed variants and
+    immutable caching, and falls back to plain static files otherwise."""
+
+    def __init__(self, *, manifest: AssetManifest, **kwargs):
+        super().__init__(**kwargs)
+        self.manifest = manifest
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        asset = self.manifest.lookup(path)
+        if asset is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+
+        headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        for encoding in ("br", "gzip"):
+            variant = asset.variants.get(encoding)
+            if variant is not None and encoding in accepted:
+                headers["Content-Encoding"] = encoding
+                return FileResponse(variant, media_type=asset.media_type, headers=headers)
+        return FileResponse(asset.source, media_type=asset.media_type, headers=headers)
+
+
+def build_asset_manifest(source_dir: Path, build_dir: str = "") -> AssetManifest:
+    target = Path(build_dir) if build_dir else Path(tempfile.gettempdir()) / "netnova-static"
+    return AssetManifest(source_dir, target).build()
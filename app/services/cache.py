@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Any, Protocol
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Engine
+
+from app.models import CacheInvalidation
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class CacheNamespace:
+    """Thread-safe LRU cache with an optional TTL, one per named namespace.
+
+    Created through :meth:`CacheRegistry.namespace`, which publishes its
+    invalidations to the other workers and applies theirs. ``max_entries``
+    of 0 disables caching; ``ttl_seconds`` of None keeps entries until they
+    are evicted or invalidated.
+    """
+
+    def __init__(self, name: str, max_entries: int = 1024, ttl_seconds: float | None = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._entries: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so a value loaded before one is not stored after it.
+        self._epoch = 0
+        self._publish: Callable[[str, list[Hashable | None]], None] = lambda name, keys: None
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, epoch: int | None = None) -> None:
+        """Store ``value``; with ``epoch`` it is dropped if an invalidation
+        arrived since the caller read :attr:`epoch` and started loading."""
+        if self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            epoch = self._epoch
+            value = loader()
+            self.set(key, value, epoch)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop ``key`` here and in every other worker."""
+        self.drop(key)
+        self._publish(self.name, [key])
+
+    def invalidate_many(self, keys: list[Hashable]) -> None:
+        """Like :meth:`invalidate` for several keys, published as one message batch."""
+        if not keys:
+            return
+        for key in keys:
+            self.drop(key)
+        self._publish(self.name, list(keys))
+
+    def clear(self) -> None:
+        self.drop(None)
+        self._publish(self.name, [None])
+
+    def drop(self, key: Hashable | None) -> None:
+        """Local-only invalidation, applied for messages from other workers."""
+        with self._lock:
+            self._epoch += 1
+            self.stats.invalidations += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class InvalidationBus(Protocol):
+    retention_seconds: float
+
+    def publish(self, origin: str, namespace: str, key: Hashable | None) -> None: ...
+
+    def publish_many(self, origin: str, namespace: str, keys: list[Hashable | None]) -> None: ...
+
+    def latest(self) -> int: ...
+
+    def poll(self, after: int) -> tuple[int, list[tuple[str, str, Hashable | None]]]: ...
+
+
+class LocalInvalidationBus:
+    """In-memory bus for tests and single-process runs: registries sharing
+    one instance behave like workers sharing a database."""
+
+    retention_seconds = float("inf")
+
+    def __init__(self):
+        self._messages: list[tuple[str, str, Hashable | None]] = []
+        self._lock = threading.Lock()
+
+    def publish(self, origin: str, namespace: str, key: Hashable | None) -> None:
+        self.publish_many(origin, namespace, [key])
+
+    def publish_many(self, origin: str, namespace: str, keys: list[Hashable | None]) -> None:
+        with self._lock:
+            self._messages.extend((origin, namespace, key) for key in keys)
+
+    def latest(self) -> int:
+        return len(self._messages)
+
+    def poll(self, after: int) -> tuple[int, list[tuple[str, str, Hashable | None]]]:
+        with self._lock:
+            return len(self._messages), self._messages[after:]
+
+
+def _encode_key(key: Hashable | None) -> str | None:
+    return None if key is None else json.dumps(key)
+
+
+def _decode_key(raw: str | None) -> Hashable | None:
+    def hashable(value):
+        return tuple(hashable(item) for item in value) if isinstance(value, list) else value
+
+    return None if raw is None else hashable(json.loads(raw))
+
+
+class DatabaseInvalidationBus:
+    """Invalidations as rows of ``cacheinvalidation``; workers read the rows
+    past the last id they saw. Rows older than ``retention_seconds`` are
+    pruned, and a worker that fell further behind clears its caches."""
+
+    def __init__(self, engine: Engine, retention_seconds: float = 3600.0, prune_every: int = 500):
+        self.engine = engine
+        self.retention_seconds = retention_seconds
+        self.prune_every = prune_every
+        self._published = 0
+        self._table = CacheInvalidation.__table__
+
+    def publish(self, origin: str, namespace: str, key: Hashable | None) -> None:
+        self.publish_many(origin, namespace, [key])
+
+    def publish_many(self, origin: str, namespace: str, keys: list[Hashable | None]) -> None:
+        """Inserts one row per key in a single transaction and executemany."""
+        if not keys:
+            return
+        now = datetime.utcnow()
+        rows = [{"origin": origin, "namespace": namespace, "key": _encode_key(key), "created_at": now} for key in keys]
+        with self.engine.begin() as conn:
+            conn.execute(insert(self._table), rows)
+            previous, self._published = self._published, self._published + len(rows)
+            if previous // self.prune_every != self._published // self.prune_every:
+                horizon = datetime.utcnow() - timedelta(seconds=self.retention_seconds)
+                conn.execute(delete(self._table).where(self._table.c.created_at < horizon))
+
+    def latest(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.coalesce(func.max(self._table.c.id), 0))).scalar_one()
+
+    def poll(self, after: int) -> tuple[int, list[tuple[str, str, Hashable | None]]]:
+        table = self._table
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.origin, table.c.namespace, table.c.key)
+                .where(table.c.id > after)
+                .order_by(table.c.id)
+            ).all()
+        if not rows:
+            return after, []
+        return rows[-1].id, [(row.origin, row.namespace, _decode_key(row.key)) for row in rows]
+
+
+class CacheRegistry:
+    """The per-process set of cache namespaces, kept coherent through ``bus``.
+
+    :meth:`sync_forever` applies other workers' invalidations every
+    ``sync_seconds`` off the request path, which bounds how long a write
+    elsewhere can leave a stale entry here.
+    """
+
+    def __init__(self, bus: InvalidationBus | None = None, sync_seconds: float = 1.0):
+        self.bus = bus or LocalInvalidationBus()
+        self.sync_seconds = sync_seconds
+        self.origin = uuid.uuid4().hex
+        self.namespaces: dict[str, CacheNamespace] = {}
+        self._cursor: int | None = None
+        self._last_success = time.monotonic()
+        self._lock = threading.Lock()
+
+    def namespace(self, name: str, max_entries: int = 1024, ttl_seconds: float | None = None) -> CacheNamespace:
+        return self.register(CacheNamespace(name, max_entries=max_entries, ttl_seconds=ttl_seconds))
+
+    def register(self, namespace: CacheNamespace, shared: bool = True) -> CacheNamespace:
+        """Add ``namespace`` to the stats; ``shared`` also wires it to the bus.
+        Caches whose keys embed a data version need no invalidation."""
+        if namespace.name in self.namespaces:
+            raise ValueError(f"cache namespace {namespace.name!r} already exists")
+        if shared:
+            namespace._publish = self._publish
+        self.namespaces[namespace.name] = namespace
+        return namespace
+
+    def _publish(self, name: str, keys: list[Hashable | None]) -> None:
+        try:
+            self.bus.publish_many(self.origin, name, keys)
+        except Exception:
+            # Other workers catch up when their entries expire.
+            logger.exception("Could not publish cache invalidation for %s", name)
+
+    def sync(self) -> int:
+        """Apply invalidations published since the last call; returns how many."""
+        with self._lock:
+            now = time.monotonic()
+            if self._cursor is None:
+                # Nothing is cached before the first sync, so history is moot.
+                self._cursor = self.bus.latest()
+                self._last_success = now
+                return 0
+            cursor, messages = self.bus.poll(self._cursor)
+            if now - self._last_success > self.bus.retention_seconds:
+                # Invalidations we never saw may have been pruned.
+                for namespace in self.namespaces.values():
+                    namespace.drop(None)
+            applied = 0
+            for origin, name, key in messages:
+                namespace = self.namespaces.get(name)
+                if namespace is not None and origin != self.origin:
+                    namespace.drop(key)
+                    applied += 1
+            self._cursor = cursor
+            self._last_success = now
+            return applied
+
+    async def sync_forever(self, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            try:
+                await asyncio.to_thread(self.sync)
+            except Exception:
+                logger.exception("Could not read cache invalidations")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.sync_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {name: {**namespace.stats.as_dict(), "entries": len(namespace)} for name, namespace in self.namespaces.items()}
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import weakref
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session as OrmSession
+
+from app.models import ChangeVersion, Customer, Invoice, MonitoringEvent
+
+EVENTS = "events"
+METRICS = "metrics"
+BILLING = "billing"
+STREAMS = (EVENTS, METRICS, BILLING)
+
+# Which change streams a write to each model moves forward.
+TRACKED_MODELS = {
+    MonitoringEvent: (EVENTS, METRICS),
+    Customer: (METRICS, BILLING),
+    Invoice: (METRICS, BILLING),
+}
+
+_tracked_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+_versions = ChangeVersion.__table__
+
+
+def ensure_change_streams(engine: Engine) -> None:
+    """Seed a counter row per stream and start versioning writes on ``engine``."""
+    with engine.begin() as conn:
+        existing = set(conn.execute(select(_versions.c.stream)).scalars())
+        missing = [{"stream": stream, "version": 0} for stream in STREAMS if stream not in existing]
+        if missing:
+            conn.execute(insert(_versions), missing)
+    _tracked_engines.add(engine)
+
+
+def bump(conn: Connection, *streams: str) -> dict[str, int]:
+    """Advance ``streams`` by one inside the caller's transaction.
+
+    The UPDATE keeps the counter row locked until commit, so writers to the
+    same stream commit in version order and a poller holding version N never
+    misses a later commit stamped N or lower.
+    """
+    versions = {}
+    for stream in streams:
+        result = conn.execute(
+            update(_versions).where(_versions.c.stream == stream).values(version=_versions.c.version + 1)
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(_versions).values(stream=stream, version=1))
+        versions[stream] = conn.execute(select(_versions.c.version).where(_versions.c.stream == stream)).scalar_one()
+    return versions
+
+
+def current_version(conn: Connection, stream: str) -> int:
+    return conn.execute(select(_versions.c.version).where(_versions.c.stream == stream)).scalar() or 0
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _version_changes(session: OrmSession, flush_context, instances) -> None:
+    bind = session.get_bind()
+    if bind not in _tracked_engines and getattr(bind, "engine", None) not in _tracked_engines:
+        return
+
+    streams: set[str] = set()
+    changed_events = []
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        tracked = TRACKED_MODELS.get(type(instance))
+        if not tracked or (instance in session.dirty and not session.is_modified(instance)):
+            continue
+        streams.update(tracked)
+        if isinstance(instance, MonitoringEvent) and instance not in session.deleted:
+            changed_events.append(instance)
+    if not streams:
+        return
+
+    versions = bump(session.connection(), *sorted(streams))
+    for instance in changed_events:
+        instance.version = versions[EVENTS]
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+import zlib
+from dataclasses import dataclass
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.services.assets import accepted_encodings
+
+try:  # brotli is optional; gzip is always available.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deployment image
+    brotli = None
+
+# Bodies above this are compressed in a worker thread rather than on the event loop.
+OFFLOAD_BYTES = 256 * 1024
+
+
+@dataclass(frozen=True)
+class Levels:
+    gzip: int
+    brotli: int
+
+
+def parse_levels(spec: str) -> dict[str, Levels]:
+    """``type=gzip/brotli`` pairs, e.g. ``text/html=6/5,text/*=4/3``; a
+    level of 0 disables that encoding for the type. Types not listed (images,
+    archives, PDFs) are already compressed and pass through untouched."""
+    levels = {}
+    for part in spec.split(","):
+        media_type, _, pair = part.strip().partition("=")
+        if not media_type:
+            continue
+        gzip_level, _, brotli_level = pair.partition("/")
+        try:
+            levels[media_type.strip().lower()] = Levels(
+                min(max(int(gzip_level), 0), 9), min(max(int(brotli_level or 0), 0), 11)
+            )
+        except ValueError as exc:
+            raise ValueError(f"invalid compression level for {media_type!r}: {pair!r}") from exc
+    return levels
+
+
+def levels_for(levels: dict[str, Levels], content_type: str) -> Levels | None:
+    media_type = content_type.partition(";")[0].strip().lower()
+    if media_type in levels:
+        return levels[media_type]
+    return levels.get(f"{media_type.partition('/')[0]}/*")
+
+
+class _Encoder:
+    """Incremental gzip or brotli stream; each ``compress`` call returns the
+    bytes for its chunk, flushed so streamed responses are not held back."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=level)
+        else:
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool = False) -> bytes:
+        if self.encoding == "br":
+            body = self._brotli.process(data) if data else b""
+            return body + (self._brotli.finish() if final else self._brotli.flush())
+        body = self._zlib.compress(data) if data else b""
+        return body + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    return _Encoder(encoding, level).compress(data, final=True)
+
+
+def negotiate(accept_encoding: str, levels: Levels) -> tuple[str, int] | None:
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and levels.brotli and ({"br", "*"} & accepted):
+        return "br", levels.brotli
+    if levels.gzip and ({"gzip", "*"} & accepted):
+        return "gzip", levels.gzip
+    return None
+
+
+class CompressionMiddleware:
+    """Gzip or brotli for compressible responses, negotiated per request.
+
+    Complete bodies under ``minimum_size`` are sent as they are. Streamed
+    bodies are compressed chunk by chunk and flushed after each one.
+    Responses that already carry a ``Content-Encoding`` (the precompressed
+    static assets) or ``Cache-Control: no-transform`` are left alone.
+    """
+
+    def __init__(self, app, levels: dict[str, Levels], minimum_size: int = 1024):
+        self.app = app
+        self.levels = levels
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.levels:
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        if not accept_encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        encoder: _Encoder | None = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                chosen = None
+                if message["status"] not in (204, 304) and "content-encoding" not in headers:
+                    if "no-transform" not in headers.get("cache-control", ""):
+                        levels = levels_for(self.levels, headers.get("content-type", ""))
+                        chosen = negotiate(accept_encoding, levels) if levels else None
+                if chosen is None:
+                    passthrough = True
+                    await send(message)
+                    return
+                # Held until the first body chunk shows whether it is worth it.
+                start = message
+                encoder = _Encoder(*chosen)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers = MutableHeaders(scope=start)
+                headers["Content-Encoding"] = encoder.encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                    compressed = encoder.compress(body)
+                else:
+                    compressed = await self._compress_final(encoder, body)
+                    headers["Content-Length"] = str(len(compressed))
+                await send(start)
+                start = None
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+            compressed = encoder.compress(body, final=not more_body)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    async def _compress_final(encoder: _Encoder, body: bytes) -> bytes:
+        if len(body) > OFFLOAD_BYTES:
+            return await asyncio.to_thread(encoder.compress, body, True)
+        return encoder.compress(body, final=True)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import csv
+import json
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from itertools import islice
+
+from pydantic import ValidationError
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.models import Customer, RouterProvision, UserAccount
+from app.schemas import CustomerImport
+from app.services.mikrotik import assign_point_to_point_block, build_mikrotik_script
+
+FORMATS = ("csv", "ndjson")
+CHUNK_SIZE = 1000
+# Enough to fix a broken file without turning the report into a copy of it.
+MAX_REPORTED_ERRORS = 1000
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    failed: int = 0
+    accounts: int = 0
+    routers: int = 0
+    errors: list[dict] = field(default_factory=list)
+
+    def fail(self, row: int, *messages: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "errors": list(messages)})
+
+    def as_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "accounts": self.accounts,
+            "routers": self.routers,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def format_for(content_type: str, filename: str = "") -> str:
+    if "ndjson" in content_type or "jsonl" in content_type or filename.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+
+def iter_records(lines: Iterable[str], fmt: str) -> Iterator[tuple[int, dict | str]]:
+    """``(row number, record)`` pairs, or ``(row number, error)`` for rows
+    that cannot be parsed. Rows are numbered from 1, excluding a CSV header."""
+    if fmt == "csv":
+        for number, record in enumerate(csv.DictReader(lines), start=1):
+            if None in record:
+                yield number, "more values than header columns"
+                continue
+            # Empty cells fall back to the schema defaults.
+            yield number, {key.strip(): value for key, value in record.items() if key and value not in ("", None)}
+        return
+
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, f"invalid JSON: {exc}"
+            continue
+        yield number, record if isinstance(record, dict) else "expected a JSON object"
+
+
+def _messages(exc: ValidationError) -> list[str]:
+    return [f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()]
+
+
+def _write_chunk(engine: Engine, rows: list[tuple[int, CustomerImport]], report: ImportReport) -> None:
+    with Session(engine) as session:
+        usernames = [row.username for _, row in rows if row.username]
+        taken = set(session.exec(select(UserAccount.username).where(UserAccount.username.in_(usernames))).all())
+        accepted = []
+        for number, row in rows:
+            if row.username and row.username in taken:
+                report.fail(number, f"username: {row.username!r} already exists")
+                continue
+            if row.username:
+                taken.add(row.username)
+            accepted.append(row)
+        if not accepted:
+            return
+
+        customers = [Customer(**row.model_dump(exclude={"username", "password"})) for row in accepted]
+        session.add_all(customers)
+        # One multi-row INSERT for the chunk; the ids are needed for accounts
+        # and address blocks.
+        session.flush()
+
+        accounts = [
+            UserAccount(username=row.username, password=row.password, role="client", customer_id=customer.id)
+            for row, customer in zip(accepted, customers)
+            if row.username
+        ]
+        provisions = []
+        for customer in customers:
+            if not customer.has_router:
+                continue
+            assignment = assign_point_to_point_block(customer.id)
+            script = build_mikrotik_script(
+                customer_name=customer.name,
+                router_identity=customer.router_identity or f"NetNova-CPE-{customer.id}",
+                wan_interface=customer.wan_interface,
+                lan_interface=customer.lan_interface,
+                gateway_ip=assignment.gateway_ip,
+                customer_ip=assignment.customer_ip,
+            )
+            provisions.append(
+                RouterProvision(
+                    customer_id=customer.id,
+                    subnet_cidr=assignment.subnet_cidr,
+                    gateway_ip=assignment.gateway_ip,
+                    customer_ip=assignment.customer_ip,
+                    script=script,
+                )
+            )
+        session.add_all([*accounts, *provisions])
+        session.commit()
+
+    report.imported += len(customers)
+    report.accounts += len(accounts)
+    report.routers += len(provisions)
+
+
+def import_customers(engine: Engine, lines: Iterable[str], fmt: str = "csv", chunk_size: int = CHUNK_SIZE) -> ImportReport:
+    """Validate and insert customers ``chunk_size`` rows per transaction.
+
+    Invalid rows are reported and skipped; valid rows in the same chunk are
+    still imported. Portal accounts are created for rows with a username
+    and router scripts rendered for rows with ``has_router``.
+    """
+    report = ImportReport()
+    records = iter_records(lines, fmt)
+    while chunk := list(islice(records, chunk_size)):
+        valid = []
+        for number, record in chunk:
+            if isinstance(record, str):
+                report.fail(number, record)
+                continue
+            try:
+                valid.append((number, CustomerImport.model_validate(record)))
+            except ValidationError as exc:
+                report.fail(number, *_messages(exc))
+        if valid:
+            try:
+                _write_chunk(engine, valid, report)
+            except IntegrityError:
+                # A concurrent import took one of the usernames; the chunk was rolled back.
+                for number, _ in valid:
+                    report.fail(number, "conflicts with a concurrent write; retry the row")
+    return report
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from sqlmodel import Session, select
+
+from app.models import Customer, CustomerBalance, Invoice, MonitoringEvent, MonitorNode, RouterProvision, UserAccount
+from app.services import archive, changes
+from app.services.fragments import data_version
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+@dataclass(frozen=True)
+class SectionQuery:
+    page: int = 1
+    page_size: int = DEFAULT_PAGE_SIZE
+    q: str = ""
+    status: str = ""
+
+    @classmethod
+    def build(cls, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE, q: str = "", status: str = "") -> "SectionQuery":
+        return cls(
+            page=max(page, 1),
+            page_size=min(max(page_size, 1), MAX_PAGE_SIZE),
+            q=q.strip(),
+            status=status.strip(),
+        )
+
+    @property
+    def offset(self) -> int:
+        return (self.page - 1) * self.page_size
+
+
+@dataclass
+class SectionPage:
+    name: str
+    query: SectionQuery
+    items: list[Any] = field(default_factory=list)
+    has_next: bool = False
+    # Cheap stand-in for digesting the rows, where one is known.
+    stamp: str = ""
+
+    @property
+    def has_previous(self) -> bool:
+        return self.query.page > 1
+
+    @property
+    def fragment_key(self) -> str:
+        return f"dashboard:{self.name}:{self.query.page}:{int(self.has_next)}"
+
+    @property
+    def version(self) -> str:
+        return self.stamp or data_version(self.items)
+
+
+def _fetch_page(session: Session, name: str, statement, query: SectionQuery, stream: str = "") -> SectionPage:
+    """One page of ``statement``. With ``stream`` the page is versioned by
+    that change stream, read before the rows so a write in between can only
+    make the cached fragment newer than its version, never older."""
+    stamp = ""
+    if stream:
+        version = changes.current_version(session.connection(), stream)
+        stamp = f"{stream}:{version}:{query.page_size}:{query.q}:{query.status}"
+    # Fetch one row past the page instead of running COUNT(*) so the cost stays
+    # bounded by page_size no matter how large the table grows.
+    rows = session.exec(statement.offset(query.offset).limit(query.page_size + 1)).all()
+    return SectionPage(
+        name=name, query=query, items=list(rows[: query.page_size]), has_next=len(rows) > query.page_size, stamp=stamp
+    )
+
+
+def load_customers(session: Session, query: SectionQuery) -> SectionPage:
+    statement = select(Customer).order_by(Customer.id.desc())
+    if query.q:
+        statement = statement.where(
+            Customer.name.startswith(query.q, autoescape=True) | Customer.email.startswith(query.q, autoescape=True)
+        )
+    if query.status in {"active", "suspended"}:
+        statement = statement.where(Customer.active.is_(query.status == "active"))
+    elif query.status == "owing":
+        statement = (
+            statement.join(CustomerBalance, CustomerBalance.customer_id == Customer.id)
+            .where(CustomerBalance.balance > 0)
+            .order_by(None)
+            .order_by(CustomerBalance.balance.desc(), Customer.id.desc())
+        )
+        # Payments reorder this list without touching the billing stream.
+        return _fetch_page(session, "customers", statement, query)
+    return _fetch_page(session, "customers", statement, query, changes.BILLING)
+
+
+def load_accounts(session: Session, query: SectionQuery) -> SectionPage:
+    statement = select(UserAccount).where(UserAccount.role == "client").order_by(UserAccount.id.desc())
+    if query.q:
+        statement = statement.where(UserAccount.username.startswith(query.q, autoescape=True))
+    if query.status in {"active", "disabled"}:
+        statement = statement.where(UserAccount.active.is_(query.status == "active"))
+    return _fetch_page(session, "accounts", statement, query)
+
+
+def load_invoices(session: Session, query: SectionQuery) -> SectionPage:
+    def filters(table) -> list:
+        criteria = []
+        if query.q.isdigit():
+            criteria.append(table.c.customer_id == int(query.q))
+        elif query.q:
+            criteria.append(table.c.billing_month.startswith(query.q, autoescape=True))
+        if query.status in {"unpaid", "paid", "overdue"}:
+            criteria.append(table.c.status == query.status)
+        return criteria
+
+    if query.status in archive.HOT_ONLY_STATUSES:
+        statement = select(Invoice).where(*filters(Invoice.__table__)).order_by(Invoice.id.desc())
+        return _fetch_page(session, "invoices", statement, query, changes.BILLING)
+    # Rows from both tables, rebuilt as Invoice objects for the template.
+    # Archiving moves rows without a version bump but changes nothing shown.
+    statement = archive.invoice_history(where=filters, limit=query.offset + query.page_size + 1)
+    page = _fetch_page(session, "invoices", statement, query, changes.BILLING)
+    page.items = [Invoice(**row._mapping) for row in page.items]
+    return page
+
+
+def load_events(session: Session, query: SectionQuery) -> SectionPage:
+    statement = select(MonitoringEvent).order_by(MonitoringEvent.created_at.desc(), MonitoringEvent.id.desc())
+    if query.q:
+        statement = statement.where(MonitoringEvent.service_name.startswith(query.q, autoescape=True))
+    if query.status in {"info", "warning", "critical"}:
+        statement = statement.where(MonitoringEvent.severity == query.status)
+    elif query.status == "open":
+        statement = statement.where(MonitoringEvent.acknowledged.is_(False))
+    return _fetch_page(session, "events", statement, query, changes.EVENTS)
+
+
+def load_router_configs(session: Session, query: SectionQuery) -> SectionPage:
+    statement = select(RouterProvision).order_by(RouterProvision.id.desc())
+    if query.q.isdigit():
+        statement = statement.where(RouterProvision.customer_id == int(query.q))
+    elif query.q:
+        statement = statement.where(RouterProvision.customer_ip.startswith(query.q, autoescape=True))
+    page = _fetch_page(session, "routers", statement, query)
+    # Provisions are never edited, so their ids identify what is shown
+    # without hashing every script.
+    page.stamp = "ids:" + ",".join(str(config.id) for config in page.items)
+    return page
+
+
+def load_monitor_nodes(session: Session, query: SectionQuery) -> SectionPage:
+    statement = select(MonitorNode).order_by(MonitorNode.id)
+    if query.q:
+        statement = statement.where(
+            MonitorNode.name.startswith(query.q, autoescape=True) | MonitorNode.region.startswith(query.q, autoescape=True)
+        )
+    if query.status in {"healthy", "degraded", "critical", "unknown"}:
+        statement = statement.where(MonitorNode.health == query.status)
+    return _fetch_page(session, "nodes", statement, query)
+
+
+DASHBOARD_SECTIONS: dict[str, Callable[[Session, SectionQuery], SectionPage]] = {
+    "customers": load_customers,
+    "accounts": load_accounts,
+    "invoices": load_invoices,
+    "events": load_events,
+    "routers": load_router_configs,
+    "nodes": load_monitor_nodes,
+}
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import gzip
+import json
+import logging
+import os
+import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, LargeBinary, Table, cast, null, select
+from sqlalchemy.engine import Engine
+
+from app.models import Customer, Invoice, InvoiceArchive, MonitoringEvent, Transaction
+
+try:  # pyarrow is optional; gzip CSV is always available.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the deployment image
+    pa = pq = None
+
+try:  # advisory file locks are POSIX only
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_TABLES: dict[str, Table] = {
+    model.__tablename__: model.__table__ for model in (Customer, Invoice, InvoiceArchive, Transaction, MonitoringEvent)
+}
+# Watermark column per table; invoice_archive receives old ids late.
+EXPORT_CURSORS = {InvoiceArchive.__tablename__: "archive_seq"}
+# Columns appended to a table's export. An archived invoice is exported again
+# under invoice_archive with its final status; the NULL archived_at lets the
+# two be unioned and deduplicated on id, the archived row winning.
+EXPORT_EXTRA_COLUMNS = {Invoice.__tablename__: [cast(null(), DateTime).label("archived_at")]}
+FORMATS = ("parquet", "csv")
+MANIFEST = "manifest.json"
+
+
+@dataclass(frozen=True)
+class ExportResult:
+    table: str
+    rows: int
+    watermark: int
+    path: str = ""
+
+
+def default_format() -> str:
+    return "parquet" if pq is not None else "csv"
+
+
+def _arrow_schema(columns: list):
+    def arrow_type(column):
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, Float):
+            return pa.float64()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        if isinstance(column.type, Date):
+            return pa.date32()
+        if isinstance(column.type, LargeBinary):
+            return pa.binary()
+        return pa.string()
+
+    return pa.schema(
+        [pa.field(column.name, arrow_type(column), nullable=getattr(column, "nullable", True)) for column in columns]
+    )
+
+
+class _ParquetSink:
+    def __init__(self, path: Path, columns: list):
+        self.schema = _arrow_schema(columns)
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, columns: list[str], rows: list[tuple]) -> None:
+        # Column-major conversion keeps one chunk's worth of Python objects alive.
+        arrays = [
+            pa.array([row[index] for row in rows], type=self.schema.field(name).type) for index, name in enumerate(columns)
+        ]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class _CsvSink:
+    def __init__(self, path: Path, columns: list):
+        self.handle = gzip.open(path, "wt", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.handle)
+        self.writer.writerow([column.name for column in columns])
+
+    def write(self, columns: list[str], rows: list[tuple]) -> None:
+        self.writer.writerows(rows)
+
+    def close(self) -> None:
+        self.handle.close()
+
+
+def read_manifest(directory: Path) -> dict:
+    try:
+        return json.loads((directory / MANIFEST).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {"tables": {}}
+
+
+def _write_manifest(directory: Path, manifest: dict) -> None:
+    handle, temp_name = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    with os.fdopen(handle, "w", encoding="utf-8") as temp_file:
+        json.dump(manifest, temp_file, indent=2)
+    os.replace(temp_name, directory / MANIFEST)
+
+
+@contextmanager
+def _exclusive(directory: Path) -> Iterator[bool]:
+    """Whether this process won the export lock; workers that lose skip the run."""
+    if fcntl is None:
+        yield True
+        return
+    with open(directory / ".export.lock", "w") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        yield True
+
+
+def export_table(
+    engine: Engine,
+    directory: Path,
+    name: str,
+    after_id: int = 0,
+    fmt: str = "",
+    chunk_rows: int = 50_000,
+) -> ExportResult:
+    """Stream rows of ``name`` past ``after_id`` on its cursor column (``id``
+    unless :data:`EXPORT_CURSORS` says otherwise) into one new file."""
+    table = EXPORT_TABLES[name]
+    cursor = table.c[EXPORT_CURSORS.get(name, "id")]
+    fmt = fmt or default_format()
+    if fmt == "parquet" and pq is None:
+        raise RuntimeError("Parquet export needs pyarrow; use the csv format instead")
+
+    selected = [*table.columns, *EXPORT_EXTRA_COLUMNS.get(name, [])]
+    columns = [column.name for column in selected]
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    target = directory / name / f"{name}-{after_id + 1:010d}-{stamp}.{'parquet' if fmt == 'parquet' else 'csv.gz'}"
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(f".{target.name}.part")
+
+    rows = 0
+    watermark = after_id
+    sink = None
+    statement = select(*selected).where(cursor > after_id).order_by(cursor)
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(statement)
+            for chunk in result.partitions(chunk_rows):
+                if sink is None:
+                    sink = _ParquetSink(partial, selected) if fmt == "parquet" else _CsvSink(partial, selected)
+                sink.write(columns, [tuple(row) for row in chunk])
+                rows += len(chunk)
+                watermark = chunk[-1]._mapping[cursor]
+    except BaseException:
+        if sink is not None:
+            sink.close()
+        partial.unlink(missing_ok=True)
+        raise
+    if sink is None:
+        return ExportResult(name, 0, watermark)
+    sink.close()
+    os.replace(partial, target)
+    return ExportResult(name, rows, watermark, str(target.relative_to(directory)))
+
+
+def export_snapshot(
+    engine: Engine,
+    directory: str | Path,
+    tables: list[str] | None = None,
+    fmt: str = "",
+    chunk_rows: int = 50_000,
+    full: bool = False,
+) -> list[ExportResult]:
+    """Export the rows of each table added since the last run.
+
+    Rows past the table's watermark in ``manifest.json`` are streamed
+    through a server-side cursor into one Parquet file per table (gzip CSV
+    without pyarrow). ``full`` restarts from the first row; earlier files
+    stay in place. Returns an empty list when another process is exporting.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    with _exclusive(directory) as owner:
+        if not owner:
+            logger.info("Export to %s is already running in another process", directory)
+            return []
+        manifest = read_manifest(directory)
+        results = []
+        for name in tables or list(EXPORT_TABLES):
+            state = manifest["tables"].setdefault(name, {"watermark": 0, "files": []})
+            result = export_table(engine, directory, name, 0 if full else state["watermark"], fmt, chunk_rows)
+            results.append(result)
+            if result.path:
+                state["watermark"] = result.watermark
+                state["files"].append({"path": result.path, "rows": result.rows, "exported_at": datetime.utcnow().isoformat()})
+            # Saved per table so a failure later in the run keeps earlier progress.
+            _write_manifest(directory, manifest)
+    return results
+
+
+async def export_forever(
+    engine: Engine, directory: str, interval_seconds: float, stop: asyncio.Event, fmt: str = "", chunk_rows: int = 50_000
+) -> None:
+    """Run an incremental export every ``interval_seconds`` off the event loop."""
+    next_run = time.monotonic()
+    while not stop.is_set():
+        if time.monotonic() >= next_run:
+            try:
+                results = await asyncio.to_thread(export_snapshot, engine, directory, None, fmt, chunk_rows)
+                for result in results:
+                    if result.rows:
+                        logger.info("Exported %d %s rows to %s", result.rows, result.table, result.path)
+            except Exception:
+                logger.exception("Analytics export to %s failed", directory)
+            next_run = time.monotonic() + interval_seconds
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=max(next_run - time.monotonic(), 0.1))
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Hashable, Iterable
+from pathlib import Path
+from typing import Any
+
+from jinja2 import Environment, FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from app.services.cache import CacheNamespace
+
+
+class FragmentCache(CacheNamespace):
+    """LRU cache of rendered template fragments.
+
+    Keys carry the data version, so entries never go stale and need no
+    cross-worker invalidation; an old version simply ages out.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        super().__init__("fragments", max_entries=max_entries)
+
+    @property
+    def hits(self) -> int:
+        return self.stats.hits
+
+    @property
+    def misses(self) -> int:
+        return self.stats.misses
+
+
+class FragmentCacheExtension(Extension):
+    """Adds ``{% cache key, version %}...{% endcache %}`` to templates.
+
+    The body is rendered once per ``(key, version)`` pair and served from the
+    environment's :class:`FragmentCache` afterwards. Callers pass a version
+    that changes whenever the data rendered inside the block changes.
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment: Environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_render_cached", args), [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, key: Hashable, version: Hashable, caller) -> Markup:
+        cache: FragmentCache = self.environment.fragment_cache
+        cache_key = (key, version)
+        rendered = cache.get(cache_key)
+        if rendered is None:
+            rendered = Markup(caller())
+            cache.set(cache_key, rendered)
+        return rendered
+
+
+def data_version(items: Iterable[Any]) -> str:
+    """Digest of the rows a fragment renders, used as its cache version."""
+    digest = hashlib.blake2b(digest_size=12)
+    for item in items:
+        values = item.model_dump() if hasattr(item, "model_dump") else item
+        digest.update(repr(values).encode())
+    return digest.hexdigest()
+
+
+def configure_template_environment(
+    env: Environment,
+    *,
+    bytecode_cache_dir: str = "",
+    fragment_cache_size: int = 512,
+    auto_reload: bool = True,
+) -> None:
+    if bytecode_cache_dir:
+        Path(bytecode_cache_dir).mkdir(parents=True, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+    else:
+        env.bytecode_cache = FileSystemBytecodeCache()
+    env.auto_reload = auto_reload
+    env.add_extension(FragmentCacheExtension)
+    env.fragment_cache = FragmentCache(max_entries=fragment_cache_size)
+    env.globals["data_version"] = data_version
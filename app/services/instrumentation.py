@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds in seconds; the implicit +Inf bucket catches the rest.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_label(scope: dict) -> str:
+    """Route template (``/api/customers/{customer_id}``) rather than the raw
+    path, so label cardinality stays bounded."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        # Mounted apps such as /static only leave their mount point behind.
+        return scope.get("root_path") or UNMATCHED_ROUTE
+    return UNMATCHED_ROUTE
+
+
+class RequestMetrics:
+    """Request latency histograms and in-flight gauges for one worker.
+
+    Every update happens on the event loop thread that serves the request,
+    so plain dicts and lists are enough and no lock sits on the hot path.
+    With ``directory`` set, each worker publishes snapshots to its own file
+    and a scrape sums the files of all workers sharing that directory.
+    """
+
+    def __init__(self, directory: str = "", buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.directory = Path(directory) if directory else None
+        self.pid = os.getpid()
+        # (route, method, status) -> per-bucket counts + [+Inf count, sum]
+        self._latency: dict[tuple[str, str, str], list[float]] = {}
+        self._in_flight: defaultdict[str, int] = defaultdict(int)
+
+    def started(self, method: str) -> None:
+        self._in_flight[method] += 1
+
+    def finished(self, method: str, route: str, status: int, seconds: float) -> None:
+        self._in_flight[method] -= 1
+        key = (route, method, str(status))
+        series = self._latency.get(key)
+        if series is None:
+            series = self._latency[key] = [0.0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    def snapshot(self) -> dict:
+        return {
+            "pid": self.pid,
+            "buckets": list(self.buckets),
+            "latency": [[*key, list(series)] for key, series in self._latency.items()],
+            "in_flight": dict(self._in_flight),
+        }
+
+    def _snapshot_path(self) -> Path:
+        return self.directory / f"requests-{self.pid}.json"
+
+    async def publish_forever(self, stop: asyncio.Event, interval: float = 5.0) -> None:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            snapshot = json.dumps(self.snapshot())
+            try:
+                await asyncio.to_thread(self._write_snapshot, snapshot)
+            except OSError:
+                logger.exception("Could not publish request metrics to %s", self.directory)
+
+    def _write_snapshot(self, snapshot: str) -> None:
+        # Written atomically so a sibling's scrape never reads half a file.
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self._snapshot_path()
+        temporary = target.with_suffix(".tmp")
+        temporary.write_text(snapshot)
+        os.replace(temporary, target)
+
+    def _worker_snapshots(self, own: dict) -> list[dict]:
+        if self.directory is None:
+            return [own]
+        self._write_snapshot(json.dumps(own))
+        snapshots = []
+        for path in self.directory.glob("requests-*.json"):
+            try:
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            if snapshot.get("buckets") == list(self.buckets):
+                snapshots.append(snapshot)
+        return snapshots
+
+    def collect(self, own: dict) -> tuple[dict[tuple[str, str, str], list[float]], dict[str, int]]:
+        """Sum every worker's histograms; in-flight gauges only count live
+        workers so a crashed worker does not leave requests hanging forever.
+
+        ``own`` is this worker's ``snapshot()``, taken on the event loop so
+        the file I/O here can run in a thread without racing requests.
+        """
+        latency: dict[tuple[str, str, str], list[float]] = {}
+        in_flight: defaultdict[str, int] = defaultdict(int)
+        for snapshot in self._worker_snapshots(own):
+            for route, method, status, series in snapshot["latency"]:
+                total = latency.setdefault((route, method, status), [0.0] * len(series))
+                for index, value in enumerate(series):
+                    total[index] += value
+            if _process_alive(snapshot["pid"]):
+                for method, count in snapshot["in_flight"].items():
+                    in_flight[method] += count
+        return latency, dict(in_flight)
+
+    def render(self, own: dict) -> str:
+        latency, in_flight = self.collect(own)
+        bounds = [*(_format_number(bound) for bound in self.buckets), "+Inf"]
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route, method and status.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (route, method, status), series in sorted(latency.items()):
+            labels = f'route="{_escape(route)}",method="{method}",status="{status}"'
+            cumulative = 0.0
+            for bound, count in zip(bounds, series[:-1]):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {_format_number(cumulative)}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {series[-1]:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {_format_number(cumulative)}")
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+        ]
+        lines += [f'http_requests_in_flight{{method="{method}"}} {count}' for method, count in sorted(in_flight.items())]
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing every HTTP request into a ``RequestMetrics``."""
+
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.started(method)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.finished(method, route_label(scope), status, time.perf_counter() - started)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import weakref
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, delete, event, func, insert, inspect, literal, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.orm.attributes import NO_VALUE
+
+from app.models import Customer, CustomerBalance, Invoice, Transaction
+from app.services.archive import invoice_history
+
+# Floats accumulate rounding noise over thousands of increments.
+TOLERANCE = 0.005
+
+_ledger_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+_balances = CustomerBalance.__table__
+_LEDGER_COLUMNS = ("invoiced", "outstanding", "paid", "balance")
+
+# (invoiced, outstanding, paid) per customer
+Delta = list[float]
+
+
+def _contribution(instance, values: dict) -> tuple[float, float, float]:
+    amount = float(values["amount"] or 0)
+    if isinstance(instance, Invoice):
+        return amount, amount if values["status"] != "paid" else 0.0, 0.0
+    return 0.0, 0.0, amount if values["status"] == "completed" else 0.0
+
+
+def _values(instance, *, before: bool) -> dict:
+    """Current or pre-flush values of the fields the ledger depends on."""
+    state = inspect(instance)
+    values = {}
+    for name in ("customer_id", "amount", "status"):
+        history = state.attrs[name].history
+        if before and history.deleted:
+            values[name] = history.deleted[0]
+        else:
+            value = getattr(instance, name)
+            values[name] = None if value is NO_VALUE else value
+    return values
+
+
+def _add(deltas: dict[int, Delta], customer_id: int | None, contribution: tuple[float, float, float], sign: int) -> None:
+    if customer_id is None or not any(contribution):
+        return
+    delta = deltas[customer_id]
+    for index, value in enumerate(contribution):
+        delta[index] += sign * value
+
+
+def collect_deltas(session: OrmSession) -> dict[int, Delta]:
+    deltas: dict[int, Delta] = defaultdict(lambda: [0.0, 0.0, 0.0])
+    for instance in session.new:
+        if isinstance(instance, (Invoice, Transaction)):
+            values = _values(instance, before=False)
+            _add(deltas, values["customer_id"], _contribution(instance, values), 1)
+    for instance in session.dirty:
+        if isinstance(instance, (Invoice, Transaction)) and session.is_modified(instance):
+            old, new = _values(instance, before=True), _values(instance, before=False)
+            _add(deltas, old["customer_id"], _contribution(instance, old), -1)
+            _add(deltas, new["customer_id"], _contribution(instance, new), 1)
+    for instance in session.deleted:
+        if isinstance(instance, (Invoice, Transaction)):
+            values = _values(instance, before=True)
+            _add(deltas, values["customer_id"], _contribution(instance, values), -1)
+    return {customer_id: delta for customer_id, delta in deltas.items() if any(delta)}
+
+
+def _upsert(dialect: str):
+    """``INSERT`` that adds to an existing row instead of failing, or None
+    where the dialect has no upsert."""
+    if dialect in ("sqlite", "postgresql"):
+        module = sqlite if dialect == "sqlite" else postgresql
+        statement = module.insert(_balances)
+        added = statement.excluded
+        return statement.on_conflict_do_update(
+            index_elements=[_balances.c.customer_id],
+            set_={name: _balances.c[name] + added[name] for name in _LEDGER_COLUMNS} | {"updated_at": added.updated_at},
+        )
+    if dialect in ("mysql", "mariadb"):
+        statement = mysql.insert(_balances)
+        added = statement.inserted
+        return statement.on_duplicate_key_update(
+            {name: _balances.c[name] + added[name] for name in _LEDGER_COLUMNS} | {"updated_at": added.updated_at}
+        )
+    return None
+
+
+def apply_deltas(conn: Connection, deltas: dict[int, Delta]) -> None:
+    """Add ``deltas`` to the ledger inside the caller's transaction.
+
+    Increments are relative, so concurrent writers for the same customer
+    serialize on the row instead of overwriting each other. A customer's
+    first write inserts the row with a dialect upsert, so two writers racing
+    to create it both land as increments instead of one failing on the key.
+    """
+    if not deltas:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {
+            "customer_id": customer_id,
+            "invoiced": invoiced,
+            "outstanding": outstanding,
+            "paid": paid,
+            "balance": invoiced - paid,
+            "updated_at": now,
+        }
+        for customer_id in sorted(deltas)
+        for invoiced, outstanding, paid in [deltas[customer_id]]
+    ]
+    upsert = _upsert(conn.dialect.name)
+    if upsert is not None:
+        conn.execute(upsert, rows)
+        return
+
+    existing = set(
+        conn.execute(select(_balances.c.customer_id).where(_balances.c.customer_id.in_(sorted(deltas)))).scalars()
+    )
+    updates = [
+        {"id": row["customer_id"], **{f"d_{name}": row[name] for name in _LEDGER_COLUMNS}, "now": now}
+        for row in rows
+        if row["customer_id"] in existing
+    ]
+    if updates:
+        conn.execute(
+            update(_balances)
+            .where(_balances.c.customer_id == bindparam("id"))
+            .values(
+                {name: _balances.c[name] + bindparam(f"d_{name}") for name in _LEDGER_COLUMNS}
+                | {"updated_at": bindparam("now")}
+            ),
+            updates,
+        )
+    inserts = [row for row in rows if row["customer_id"] not in existing]
+    if inserts:
+        conn.execute(insert(_balances), inserts)
+
+
+def transaction_deltas(rows: Iterable[dict]) -> dict[int, Delta]:
+    """Deltas for Transaction rows written with bulk inserts, which bypass
+    the flush hook."""
+    deltas: dict[int, Delta] = defaultdict(lambda: [0.0, 0.0, 0.0])
+    for row in rows:
+        if row.get("status", "completed") == "completed":
+            deltas[row["customer_id"]][2] += float(row["amount"])
+    return dict(deltas)
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _update_balances(session: OrmSession, flush_context, instances) -> None:
+    bind = session.get_bind()
+    if bind not in _ledger_engines and getattr(bind, "engine", None) not in _ledger_engines:
+        return
+    apply_deltas(session.connection(), collect_deltas(session))
+
+
+def _expected_balances():
+    # Archived invoices are paid but still part of what a customer was billed.
+    history = invoice_history(("customer_id", "amount", "status"), order_by=None).subquery()
+    invoices = (
+        select(
+            history.c.customer_id.label("customer_id"),
+            func.sum(history.c.amount).label("invoiced"),
+            func.sum(case((history.c.status != "paid", history.c.amount), else_=0)).label("outstanding"),
+        )
+        .group_by(history.c.customer_id)
+        .subquery()
+    )
+    payments = (
+        select(Transaction.customer_id.label("customer_id"), func.sum(Transaction.amount).label("paid"))
+        .where(Transaction.status == "completed")
+        .group_by(Transaction.customer_id)
+        .subquery()
+    )
+    invoiced = func.coalesce(invoices.c.invoiced, 0)
+    paid = func.coalesce(payments.c.paid, 0)
+    return (
+        select(
+            Customer.id.label("customer_id"),
+            invoiced.label("invoiced"),
+            func.coalesce(invoices.c.outstanding, 0).label("outstanding"),
+            paid.label("paid"),
+            (invoiced - paid).label("balance"),
+        )
+        .select_from(Customer)
+        .outerjoin(invoices, invoices.c.customer_id == Customer.id)
+        .outerjoin(payments, payments.c.customer_id == Customer.id)
+    )
+
+
+def rebuild_balances(engine: Engine) -> int:
+    """Recompute every customer's ledger row from invoices and transactions."""
+    expected = _expected_balances().add_columns(literal(datetime.utcnow()).label("updated_at")).subquery()
+    with engine.begin() as conn:
+        conn.execute(delete(_balances))
+        result = conn.execute(
+            insert(_balances).from_select(
+                ["customer_id", "invoiced", "outstanding", "paid", "balance", "updated_at"], select(expected)
+            )
+        )
+    return result.rowcount
+
+
+def check_balances(engine: Engine, tolerance: float = TOLERANCE) -> list[dict]:
+    """Ledger rows that disagree with a full recomputation."""
+    expected = _expected_balances().subquery()
+    statement = select(
+        expected,
+        func.coalesce(_balances.c.invoiced, 0).label("ledger_invoiced"),
+        func.coalesce(_balances.c.outstanding, 0).label("ledger_outstanding"),
+        func.coalesce(_balances.c.paid, 0).label("ledger_paid"),
+        func.coalesce(_balances.c.balance, 0).label("ledger_balance"),
+    ).outerjoin(_balances, _balances.c.customer_id == expected.c.customer_id)
+    mismatches = []
+    with engine.connect() as conn:
+        for row in conn.execute(statement).mappings():
+            fields = ("invoiced", "outstanding", "paid", "balance")
+            if any(abs(float(row[name]) - float(row[f"ledger_{name}"])) > tolerance for name in fields):
+                mismatches.append(dict(row))
+    return mismatches
+
+
+def ensure_ledger(engine: Engine, rebuild: bool = False) -> None:
+    """Start maintaining balances for ``engine``; ``rebuild`` backfills a
+    freshly created ledger table from existing invoices and transactions."""
+    if rebuild:
+        rebuild_balances(engine)
+    _ledger_engines.add(engine)
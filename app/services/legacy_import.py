@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlmodel import Session, select
+
+from app.models import Customer, Invoice, MonitoringEvent, MonitorNode, Notification, SchemaMigration
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_NAME = "legacy-flask-monitoring"
+LEGACY_TABLES = ("customers", "invoices", "monitor_nodes", "alerts", "notifications")
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _legacy_rows(conn: sqlite3.Connection, table: str, tables: set[str]) -> list[sqlite3.Row]:
+    if table not in tables:
+        return []
+    return conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+
+
+def import_legacy_monitoring(engine: Engine, legacy_path: str) -> bool:
+    """Copies the tables of the retired Flask monitoring app into the SQLModel
+    schema, once.
+
+    The legacy database is only read. Completion is recorded in the
+    ``schemamigration`` table in the same transaction as the imported rows, so
+    an interrupted import is retried as a whole on the next start. The marker
+    is inserted before anything is copied: every web worker calls this at
+    start, and only the one whose insert succeeds does the import.
+    """
+    path = Path(legacy_path)
+    if not path.is_file():
+        return False
+
+    with Session(engine) as session:
+        if session.get(SchemaMigration, MIGRATION_NAME):
+            return False
+
+        source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        source.row_factory = sqlite3.Row
+        try:
+            tables = {
+                row["name"] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            } & set(LEGACY_TABLES)
+            if "monitor_nodes" not in tables:
+                return False
+            session.add(SchemaMigration(name=MIGRATION_NAME))
+            try:
+                session.flush()
+            except (IntegrityError, OperationalError):
+                # Another worker holds the marker: it has imported already or
+                # is importing now (SQLite gives up waiting for its lock).
+                session.rollback()
+                logger.info("Legacy monitoring data is imported by another worker")
+                return False
+            counts = _copy(session, source, tables)
+        finally:
+            source.close()
+
+        session.commit()
+
+    logger.info(
+        "Imported legacy monitoring data: %s",
+        ", ".join(f"{count} {table}" for table, count in counts.items()),
+    )
+    return True
+
+
+def _copy(session: Session, source: sqlite3.Connection, tables: set[str]) -> dict[str, int]:
+    existing = {email: customer_id for customer_id, email in session.exec(select(Customer.id, Customer.email)).all()}
+    customer_ids: dict[int, int] = {}
+    new_customers: list[tuple[int, Customer]] = []
+    for row in _legacy_rows(source, "customers", tables):
+        if row["email"] in existing:
+            customer_ids[row["id"]] = existing[row["email"]]
+            continue
+        customer = Customer(
+            name=row["name"],
+            plan_name=row["plan"],
+            monthly_rate=row["monthly_rate"],
+            due_day=1,
+            email=row["email"],
+            active=row["status"] == "active",
+        )
+        new_customers.append((row["id"], customer))
+    session.add_all([customer for _, customer in new_customers])
+    session.flush()
+    customer_ids.update({legacy_id: customer.id for legacy_id, customer in new_customers})
+
+    invoices = [
+        Invoice(
+            customer_id=customer_ids[row["customer_id"]],
+            billing_month=row["due_date"][:7],
+            amount=row["amount"],
+            status=row["status"] if row["status"] in {"unpaid", "paid", "overdue"} else "unpaid",
+            created_at=_parse_timestamp(row["created_at"]) or datetime.utcnow(),
+        )
+        for row in _legacy_rows(source, "invoices", tables)
+        if row["customer_id"] in customer_ids
+    ]
+
+    legacy_nodes = _legacy_rows(source, "monitor_nodes", tables)
+    nodes = []
+    for row in legacy_nodes:
+        host = row["host"] if "host" in row.keys() else None
+        nodes.append(
+            MonitorNode(
+                name=row["name"],
+                region=row["region"],
+                expected_latency_ms=row["expected_latency_ms"],
+                host=host,
+                probe_method=row["probe_method"] if "probe_method" in row.keys() else "tcp",
+                probe_port=row["probe_port"] if "probe_port" in row.keys() else None,
+                last_latency_ms=row["last_latency_ms"] if host else None,
+                last_seen=_parse_timestamp(row["last_seen"]),
+                # Without a host the node is not probed until an operator sets
+                # one, so the Flask app's last verdict would never be refreshed.
+                health=row["health"] if host else "unknown",
+            )
+        )
+    session.add_all(nodes)
+    session.flush()
+    node_ids = {row["id"]: node for row, node in zip(legacy_nodes, nodes)}
+
+    events = [
+        MonitoringEvent(
+            node_id=node_ids[row["node_id"]].id,
+            service_name=node_ids[row["node_id"]].name,
+            severity=row["severity"],
+            message=row["message"],
+            created_at=_parse_timestamp(row["created_at"]) or datetime.utcnow(),
+            acknowledged=bool(row["acknowledged"]),
+        )
+        for row in _legacy_rows(source, "alerts", tables)
+        if row["node_id"] in node_ids
+    ]
+    notifications = [
+        Notification(
+            channel=row["channel"],
+            target=row["target"],
+            message=row["message"],
+            created_at=_parse_timestamp(row["created_at"]) or datetime.utcnow(),
+        )
+        for row in _legacy_rows(source, "notifications", tables)
+    ]
+    session.add_all([*invoices, *events, *notifications])
+    session.flush()
+
+    return {
+        "customers": len(new_customers),
+        "invoices": len(invoices),
+        "monitor nodes": len(nodes),
+        "alerts": len(events),
+        "notifications": len(notifications),
+    }
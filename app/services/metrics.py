@@ -1,18 +1,26 @@
 from __future__ import annotations
 
+from sqlalchemy import func
 from sqlmodel import Session, select
 
-from app.models import Customer, Invoice, MonitoringEvent
+from app.models import Customer, CustomerBalance, MonitoringEvent
 
 
 def collect_dashboard_metrics(session: Session) -> dict[str, float | int]:
-    customers = session.exec(select(Customer)).all()
-    invoices = session.exec(select(Invoice)).all()
-    events = session.exec(select(MonitoringEvent)).all()
+    customer_count, mrr = session.exec(
+        select(func.count(Customer.id), func.coalesce(func.sum(Customer.monthly_rate), 0))
+    ).one()
+    unpaid = session.exec(select(func.coalesce(func.sum(CustomerBalance.outstanding), 0))).one()
+    critical_count = session.exec(
+        select(func.count(MonitoringEvent.id)).where(
+            MonitoringEvent.severity == "critical",
+            MonitoringEvent.acknowledged.is_(False),
+        )
+    ).one()
 
     return {
-        "customer_count": len(customers),
-        "mrr": round(sum(customer.monthly_rate for customer in customers), 2),
-        "unpaid": round(sum(invoice.amount for invoice in invoices if invoice.status != "paid"), 2),
-        "critical_count": sum(1 for event in events if event.severity == "critical" and not event.acknowledged),
+        "customer_count": customer_count,
+        "mrr": round(float(mrr), 2),
+        "unpaid": round(float(unpaid), 2),
+        "critical_count": critical_count,
     }
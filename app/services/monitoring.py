@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.models import MonitoringEvent, MonitorNode, OutboxMessage
+from app.services import anomaly, changes, timeseries
+from app.services.prober import ProbeTarget, probe_all
+from app.services.scheduler import Shard
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NODES = (
+    ("Edge Router Alpha", "Metro Core", 15),
+    ("Backhaul Link Orion", "Northern Ring", 28),
+    ("Tower POP Delta", "Coastal Zone", 22),
+)
+
+
+def seed_monitor_nodes(session: Session) -> None:
+    if session.exec(select(MonitorNode.id).limit(1)).first() is None:
+        session.add_all(
+            MonitorNode(name=name, region=region, expected_latency_ms=expected)
+            for name, region, expected in DEFAULT_NODES
+        )
+        session.commit()
+
+
+def reset_unprobed_health(session: Session) -> None:
+    # Nodes without a host are never probed, so a health value they carry
+    # was seeded or imported and would otherwise never change.
+    session.exec(
+        update(MonitorNode)
+        .where(MonitorNode.host.is_(None) | (MonitorNode.host == ""), MonitorNode.health != "unknown")
+        .values(health="unknown", last_latency_ms=None)
+    )
+    session.commit()
+
+
+def set_probe_target(node: MonitorNode, host: str | None, probe_method: str, probe_port: int | None) -> None:
+    if (node.host, node.probe_method, node.probe_port) == (host, probe_method, probe_port):
+        return
+    node.host = host
+    node.probe_method = probe_method
+    node.probe_port = probe_port
+    # The last reading was taken against the old target, if any.
+    node.health = "unknown"
+    node.last_latency_ms = None
+
+
+def describe_health(node: MonitorNode, latency_ms: float | None, severity: int, breach_run: int, sustained: int) -> str:
+    if latency_ms is None:
+        return f"{node.name} is unreachable in {node.region}"
+    if severity == anomaly.CRITICAL and breach_run >= sustained:
+        return f"{node.name} has been degraded for {breach_run} cycles at {latency_ms:.0f}ms in {node.region}"
+    if severity == anomaly.CRITICAL:
+        return f"{node.name} latency spike to {latency_ms:.0f}ms in {node.region}"
+    if severity == anomaly.WARNING:
+        return f"{node.name} is degraded at {latency_ms:.0f}ms"
+    return f"{node.name} is stable at {latency_ms:.0f}ms"
+
+
+class MonitorService:
+    """Probe, classify and record one monitor cycle for this process's shard.
+
+    Latency history and anomaly baselines live in memory for the lifetime of
+    the process; everything a cycle produces is written in one transaction,
+    and latency rollups follow in a second.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        shard: Shard | None = None,
+        probe_concurrency: int = 500,
+        probe_timeout: float = 2.0,
+        rollup_grace_seconds: float = 60.0,
+        alert_recipients: list[tuple[str, str]] | None = None,
+    ):
+        self.engine = engine
+        self.shard = shard or Shard()
+        # False in workers that lost the scheduler election (claim_shard):
+        # they run no cycles, so they hold no raw samples or baselines.
+        self.owner = True
+        self.probe_concurrency = probe_concurrency
+        self.probe_timeout = probe_timeout
+        self.rollup_grace_seconds = rollup_grace_seconds
+        self.alert_recipients = alert_recipients or []
+        self.series = timeseries.LatencySeries()
+        self.detector = anomaly.AnomalyDetector()
+
+    def _load_nodes(self, session: Session) -> dict[int, MonitorNode]:
+        statement = select(MonitorNode).where(MonitorNode.host.is_not(None), MonitorNode.host != "")
+        if self.shard.sharded:
+            statement = statement.where(MonitorNode.id % self.shard.count == self.shard.index)
+        return {node.id: node for node in session.exec(statement).all()}
+
+    def run_cycle(self) -> dict:
+        now = datetime.utcnow().replace(microsecond=0)
+        with Session(self.engine, expire_on_commit=False) as session:
+            nodes = self._load_nodes(session)
+
+        targets = [
+            ProbeTarget(node_id=node.id, host=node.host, method=node.probe_method, port=node.probe_port)
+            for node in nodes.values()
+        ]
+        results = probe_all(targets, concurrency=self.probe_concurrency, timeout=self.probe_timeout)
+        probed_at = time.time()
+        self.series.record_many(
+            (result.node_id, probed_at, result.latency_ms) for result in results if result.latency_ms is not None
+        )
+        assessment = self.detector.evaluate(
+            [result.node_id for result in results],
+            [result.latency_ms if result.latency_ms is not None else float("nan") for result in results],
+            [nodes[result.node_id].expected_latency_ms for result in results],
+        )
+
+        updates = []
+        events = []
+        for result, severity, breach_run in zip(results, assessment.severity.tolist(), assessment.breach_run.tolist()):
+            node = nodes[result.node_id]
+            updates.append(
+                {
+                    "id": node.id,
+                    "last_latency_ms": round(result.latency_ms) if result.latency_ms is not None else None,
+                    "last_seen": now,
+                    "health": anomaly.HEALTH_LABELS[severity],
+                }
+            )
+            if severity != anomaly.HEALTHY:
+                message = describe_health(node, result.latency_ms, severity, breach_run, self.detector.sustained_cycles)
+                events.append(
+                    {
+                        "node_id": node.id,
+                        "service_name": node.name,
+                        "severity": anomaly.SEVERITY_LABELS[severity],
+                        "message": message,
+                        "created_at": now,
+                        "acknowledged": False,
+                    }
+                )
+
+        # Critical alerts are paged out through the outbox, committed together
+        # with the events so a crash can neither lose nor invent a page.
+        pages = [
+            {
+                "channel": channel,
+                "recipient": recipient,
+                "subject": f"[CRITICAL] {event['service_name']}",
+                "body": event["message"],
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "created_at": now,
+            }
+            for event in events
+            if event["severity"] == "critical"
+            for channel, recipient in self.alert_recipients
+        ]
+
+        # Probing happens outside the transaction; the write lock is only held
+        # for the batched statements below.
+        with Session(self.engine) as session:
+            if updates:
+                session.exec(update(MonitorNode), params=updates)
+            if events:
+                # Bulk inserts skip the flush hook, so the cycle stamps its own version.
+                version = changes.bump(session.connection(), changes.EVENTS, changes.METRICS)[changes.EVENTS]
+                session.exec(insert(MonitoringEvent), params=[{**event, "version": version} for event in events])
+            if pages:
+                session.exec(insert(OutboxMessage), params=pages)
+            self.series.flush(session)
+            session.commit()
+
+        # Rollups read back raw segments, so they run in a transaction of their
+        # own once the cycle's writes are committed. One that fails is redone
+        # by the next cycle, as its rollup state was not advanced.
+        try:
+            with Session(self.engine) as session:
+                # Other shards flush their samples on their own schedule, so buckets
+                # are only rolled up once every shard has had a cycle past them.
+                timeseries.downsample(session, probed_at - self.rollup_grace_seconds)
+                timeseries.prune(session, probed_at)
+                session.commit()
+        except Exception:
+            logger.exception("Latency rollup failed; retrying next cycle")
+
+        return {"ran_at": now.isoformat(), "nodes_probed": len(results), "alerts_created": len(events)}
@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import random
+import smtplib
+import socket
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Optional, Protocol
+from uuid import uuid4
+
+import httpx
+from sqlalchemy import and_, bindparam, func, or_, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.models import Notification, OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+# Share of the claim lease a rate-limited channel's batch may spend waiting
+# for its token bucket; the rest is left for slow sends.
+LEASE_MARGIN = 0.5
+
+
+class DeliveryError(Exception):
+    """A message could not be delivered; ``permanent`` failures are not retried."""
+
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+class Sender(Protocol):
+    channels: tuple[str, ...]
+
+    async def send(self, message: OutboxMessage) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+
+def enqueue(
+    session: Session,
+    channel: str,
+    recipient: str,
+    body: str,
+    subject: str = "",
+    notification_id: Optional[int] = None,
+) -> OutboxMessage:
+    """Adds a message to the outbox in the caller's transaction; it is only
+    visible to delivery workers once the caller commits."""
+    message = OutboxMessage(
+        channel=channel,
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        notification_id=notification_id,
+    )
+    session.add(message)
+    return message
+
+
+def record_notification(session: Session, channel: str, target: str, message: str) -> Notification:
+    notification = Notification(channel=channel, target=target, message=message)
+    session.add(notification)
+    session.flush()
+    enqueue(session, channel, target, message, subject="NetNova notification", notification_id=notification.id)
+    return notification
+
+
+def parse_recipients(value: str) -> list[tuple[str, str]]:
+    """Parses ``"email:noc@example.com,sms:+254700000000"``."""
+    recipients = []
+    for item in value.split(","):
+        channel, _, recipient = item.strip().partition(":")
+        if channel in {"email", "sms", "voice"} and recipient.strip():
+            recipients.append((channel, recipient.strip()))
+    return recipients
+
+
+class TokenBucket:
+    """Async rate limiter allowing ``rate`` acquisitions per second."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SmtpSender:
+    """Delivers email over a small pool of persistent SMTP connections.
+
+    smtplib is blocking, so each send runs in a worker thread holding one
+    pooled connection; connections are reused until the server drops them.
+    """
+
+    channels = ("email",)
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 25,
+        sender: str = "noreply@netnova.local",
+        username: str = "",
+        password: str = "",
+        starttls: bool = False,
+        pool_size: int = 4,
+        timeout: float = 10.0,
+        local_hostname: str = "",
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        # smtplib would otherwise resolve the FQDN for EHLO on every connect.
+        self.local_hostname = local_hostname or socket.gethostname()
+        self._idle: queue.LifoQueue[smtplib.SMTP] = queue.LifoQueue()
+        self._slots = asyncio.Semaphore(pool_size)
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, self.local_hostname, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password)
+        return connection
+
+    def _send_sync(self, email: EmailMessage) -> None:
+        connection = None
+        try:
+            try:
+                connection = self._idle.get_nowait()
+                connection.send_message(email)
+            except (queue.Empty, smtplib.SMTPServerDisconnected):
+                # No idle connection, or the server closed a pooled one.
+                connection = self._connect()
+                connection.send_message(email)
+        except smtplib.SMTPRecipientsRefused as exc:
+            self._release(connection)
+            codes = [code for code, _ in exc.recipients.values()]
+            raise DeliveryError("recipient refused", permanent=all(500 <= code < 600 for code in codes)) from exc
+        except smtplib.SMTPResponseException as exc:
+            self._release(connection)
+            raise DeliveryError(f"SMTP {exc.smtp_code}", permanent=500 <= exc.smtp_code < 600) from exc
+        except (OSError, smtplib.SMTPException) as exc:
+            if connection is not None:
+                connection.close()
+            raise DeliveryError(exc.__class__.__name__) from exc
+        self._idle.put(connection)
+
+    def _release(self, connection: Optional[smtplib.SMTP]) -> None:
+        if connection is None:
+            return
+        try:
+            connection.rset()
+        except (OSError, smtplib.SMTPException):
+            connection.close()
+            return
+        self._idle.put(connection)
+
+    async def send(self, message: OutboxMessage) -> None:
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = message.recipient
+        email["Subject"] = message.subject or "NetNova notification"
+        email.set_content(message.body)
+        async with self._slots:
+            await asyncio.to_thread(self._send_sync, email)
+
+    def _close_idle(self) -> None:
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                connection.quit()
+            except (OSError, smtplib.SMTPException):
+                connection.close()
+
+    async def aclose(self) -> None:
+        await asyncio.to_thread(self._close_idle)
+
+
+class HttpGatewaySender:
+    """Delivers SMS and voice callbacks through an HTTP gateway over a pooled,
+    keep-alive client."""
+
+    channels = ("sms", "voice")
+
+    def __init__(self, url: str, token: str = "", pool_size: int = 20, timeout: float = 10.0):
+        self.url = url
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def send(self, message: OutboxMessage) -> None:
+        payload = {"channel": message.channel, "to": message.recipient, "message": message.body, "reference": message.id}
+        try:
+            response = await self.client.post(self.url, json=payload)
+        except httpx.HTTPError as exc:
+            raise DeliveryError(exc.__class__.__name__) from exc
+        if response.status_code == 429 or response.status_code >= 500:
+            raise DeliveryError(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            raise DeliveryError(f"HTTP {response.status_code}", permanent=True)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+@dataclass(frozen=True)
+class DeliveryOutcome:
+    message_id: int
+    attempts: int
+    error: Optional[str] = None
+    permanent: bool = False
+
+
+class OutboxDispatcher:
+    """Claims due outbox messages in batches and delivers them per channel.
+
+    Claims are conditional updates, so any number of workers and processes
+    can poll the same table; a claim whose worker died is picked up again
+    once its lease expires. A rate-limited channel claims no more than it can
+    send within ``LEASE_MARGIN`` of the lease, so a live batch is never
+    re-claimed and sent twice.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        senders: list[Sender],
+        batch_size: int = 200,
+        concurrency: int = 20,
+        rate_per_second: Optional[dict[str, float]] = None,
+        max_attempts: int = 8,
+        base_backoff_seconds: float = 5.0,
+        max_backoff_seconds: float = 3600.0,
+        lease_seconds: float = 300.0,
+    ):
+        self.engine = engine
+        self.senders = {channel: sender for sender in senders for channel in sender.channels}
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.lease_seconds = lease_seconds
+        self.worker_id = uuid4().hex[:12]
+        self._limits = {channel: asyncio.Semaphore(concurrency) for channel in self.senders}
+        self._buckets = {channel: TokenBucket((rate_per_second or {}).get(channel, 0)) for channel in self.senders}
+        self._claim_limits = {channel: batch_size for channel in self.senders}
+        for channel, bucket in self._buckets.items():
+            if bucket.rate > 0:
+                self._claim_limits[channel] = min(batch_size, max(1, int(bucket.rate * lease_seconds * LEASE_MARGIN)))
+
+    def _due(self, now: datetime):
+        return and_(
+            OutboxMessage.channel.in_(list(self.senders)),
+            or_(
+                and_(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now),
+                and_(
+                    OutboxMessage.status == "sending",
+                    OutboxMessage.claimed_at < now - timedelta(seconds=self.lease_seconds),
+                ),
+            ),
+        )
+
+    def claim(self, now: Optional[datetime] = None) -> tuple[str, list[OutboxMessage]]:
+        """Returns the claim token and the claimed messages; outcomes are
+        recorded against the token."""
+        now = now or datetime.utcnow()
+        token = f"{self.worker_id}:{uuid4().hex[:8]}"
+        with Session(self.engine, expire_on_commit=False) as session:
+            candidates = []
+            for channel, limit in self._claim_limits.items():
+                candidates += session.exec(
+                    select(OutboxMessage.next_attempt_at, OutboxMessage.id)
+                    .where(OutboxMessage.channel == channel, self._due(now))
+                    .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+                    .limit(limit)
+                ).all()
+            ids = [message_id for _, message_id in sorted(candidates)[: self.batch_size]]
+            if not ids:
+                return token, []
+            # Re-checking the due condition makes the claim safe against
+            # another worker that selected the same ids concurrently.
+            session.exec(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(ids), self._due(now))
+                .values(status="sending", claimed_by=token, claimed_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+            return token, list(session.exec(select(OutboxMessage).where(OutboxMessage.claimed_by == token)).all())
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.base_backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+        return delay * random.uniform(0.8, 1.2)
+
+    def record(self, token: str, outcomes: list[DeliveryOutcome], now: Optional[datetime] = None) -> None:
+        now = now or datetime.utcnow()
+        rows = []
+        for outcome in outcomes:
+            row = {"message_id": outcome.message_id, "attempts": outcome.attempts, "claimed_by": None, "claimed_at": None}
+            if outcome.error is None:
+                row.update(status="sent", sent_at=now, last_error=None, next_attempt_at=now)
+            elif outcome.permanent or outcome.attempts >= self.max_attempts:
+                row.update(status="failed", sent_at=None, last_error=outcome.error[:500], next_attempt_at=now)
+            else:
+                retry_at = now + timedelta(seconds=self.backoff(outcome.attempts))
+                row.update(status="pending", sent_at=None, last_error=outcome.error[:500], next_attempt_at=retry_at)
+            rows.append(row)
+        if rows:
+            # Only rows still held under this claim are updated: if the lease
+            # ran out and another worker re-claimed a message, its outcome wins.
+            table = OutboxMessage.__table__
+            statement = update(table).where(table.c.id == bindparam("message_id"), table.c.claimed_by == token)
+            with Session(self.engine) as session:
+                session.exec(statement, params=rows)
+                session.commit()
+
+    async def _deliver(self, message: OutboxMessage) -> DeliveryOutcome:
+        attempts = message.attempts + 1
+        async with self._limits[message.channel]:
+            await self._buckets[message.channel].acquire()
+            try:
+                await self.senders[message.channel].send(message)
+            except DeliveryError as exc:
+                return DeliveryOutcome(message.id, attempts, str(exc), exc.permanent)
+            except Exception as exc:  # an unexpected sender bug must not wedge the batch
+                logger.exception("Outbox sender failed for message %s", message.id)
+                return DeliveryOutcome(message.id, attempts, exc.__class__.__name__)
+        return DeliveryOutcome(message.id, attempts)
+
+    async def run_once(self) -> int:
+        token, messages = await asyncio.to_thread(self.claim)
+        if not messages:
+            return 0
+        by_channel: dict[str, list[OutboxMessage]] = defaultdict(list)
+        for message in messages:
+            by_channel[message.channel].append(message)
+        outcomes = await asyncio.gather(
+            *(self._deliver(message) for channel_messages in by_channel.values() for message in channel_messages)
+        )
+        await asyncio.to_thread(self.record, token, list(outcomes))
+        failed = sum(outcome.error is not None for outcome in outcomes)
+        logger.info("Outbox delivered %d of %d messages", len(outcomes) - failed, len(outcomes))
+        return len(outcomes)
+
+    async def run_forever(self, stop: asyncio.Event, poll_seconds: float = 2.0) -> None:
+        while not stop.is_set():
+            try:
+                delivered = await self.run_once()
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                delivered = 0
+            if delivered < self.batch_size:
+                try:
+                    await asyncio.wait_for(stop.wait(), poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def aclose(self) -> None:
+        for sender in {id(sender): sender for sender in self.senders.values()}.values():
+            await sender.aclose()
+
+
+def outbox_summary(session: Session) -> list[dict]:
+    rows = session.exec(
+        select(OutboxMessage.channel, OutboxMessage.status, func.count())
+        .group_by(OutboxMessage.channel, OutboxMessage.status)
+        .order_by(OutboxMessage.channel, OutboxMessage.status)
+    ).all()
+    return [{"channel": channel, "status": status, "count": count} for channel, status, count in rows]
@@ -0,0 +1,433 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlmodel import Session, select
+
+from app.models import Customer, PaymentInbox, PaymentSuspense, Transaction
+from app.services import ledger
+
+logger = logging.getLogger(__name__)
+
+# Mirrors the PaymentGateway.provider choices.
+PROVIDERS = ("mpesa", "stripe", "kopokopo", "custom")
+STRIPE_TOLERANCE_SECONDS = 300
+# Transaction.provider_txn_id is a VARCHAR(120).
+MAX_TXN_ID_LENGTH = 120
+# Inbox rows older than this were left by a worker that died or fell behind.
+INBOX_SWEEP_SECONDS = 30.0
+
+_DIGITS = re.compile(r"\d+")
+
+
+class SignatureError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class PaymentNotice:
+    provider: str
+    txn_id: str
+    customer_ref: str
+    amount: float
+    method: str
+    received_at: datetime = field(default_factory=datetime.utcnow)
+    inbox_id: int | None = None
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.provider, self.txn_id
+
+
+def customer_id_from_ref(reference: str) -> int | None:
+    """Account references are the customer number, optionally prefixed
+    (``1024``, ``NN-1024``)."""
+    match = _DIGITS.search(reference or "")
+    return int(match.group()) if match else None
+
+
+def _hex_hmac(secret: str, payload: bytes) -> str:
+    return hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+
+
+def verify_hmac(body: bytes, signature: str, secret: str) -> None:
+    if not signature or not hmac.compare_digest(_hex_hmac(secret, body), signature.strip().lower()):
+        raise SignatureError("signature mismatch")
+
+
+def verify_stripe(body: bytes, header: str, secret: str, now: float | None = None) -> None:
+    """Stripe signs ``{timestamp}.{body}`` and may send several v1 signatures
+    while a secret is being rolled."""
+    parts: dict[str, list[str]] = {}
+    for item in (header or "").split(","):
+        key, _, value = item.strip().partition("=")
+        parts.setdefault(key, []).append(value)
+    try:
+        timestamp = int(parts["t"][0])
+    except (KeyError, ValueError):
+        raise SignatureError("missing timestamp") from None
+    if abs((now or time.time()) - timestamp) > STRIPE_TOLERANCE_SECONDS:
+        raise SignatureError("timestamp outside tolerance")
+    expected = _hex_hmac(secret, f"{timestamp}.".encode() + body)
+    if not any(hmac.compare_digest(expected, candidate) for candidate in parts.get("v1", [])):
+        raise SignatureError("signature mismatch")
+
+
+def verify_token(token: str, secret: str) -> None:
+    # Daraja does not sign callbacks; the callback URL carries a secret token.
+    if not token or not hmac.compare_digest(token, secret):
+        raise SignatureError("invalid callback token")
+
+
+def _amount(value) -> float:
+    # A NaN or negative amount would fail the whole insert batch later on.
+    amount = float(value)
+    if not math.isfinite(amount) or amount < 0:
+        raise ValueError(f"invalid amount {value!r}")
+    return amount
+
+
+def _txn_id(value) -> str:
+    txn_id = str(value)
+    if not txn_id or len(txn_id) > MAX_TXN_ID_LENGTH:
+        raise ValueError("transaction id is empty or too long")
+    return txn_id
+
+
+def parse_mpesa(payload: dict) -> PaymentNotice | None:
+    """C2B confirmation: the customer typed their account number as BillRefNumber."""
+    if "TransID" not in payload:
+        return None
+    return PaymentNotice(
+        provider="mpesa",
+        txn_id=_txn_id(payload["TransID"]),
+        customer_ref=str(payload.get("BillRefNumber", "")),
+        amount=_amount(payload["TransAmount"]),
+        method="mpesa",
+    )
+
+
+def parse_stripe(payload: dict) -> PaymentNotice | None:
+    obj = payload.get("data", {}).get("object", {})
+    if payload.get("type") == "payment_intent.succeeded":
+        amount = obj.get("amount_received", obj.get("amount", 0))
+    elif payload.get("type") == "checkout.session.completed" and obj.get("payment_status") == "paid":
+        amount = obj.get("amount_total", 0)
+    else:
+        return None
+    reference = obj.get("metadata", {}).get("customer_id") or obj.get("client_reference_id") or ""
+    return PaymentNotice(
+        provider="stripe",
+        txn_id=_txn_id(obj["id"]),
+        customer_ref=str(reference),
+        # Stripe amounts are in the currency's minor unit.
+        amount=_amount(amount) / 100,
+        method="card",
+    )
+
+
+def parse_kopokopo(payload: dict) -> PaymentNotice | None:
+    event = payload.get("event", {})
+    if payload.get("topic") != "buygoods_transaction_received" or not event.get("resource"):
+        return None
+    resource = event["resource"]
+    if resource.get("status", "Received") not in ("Received", "Success"):
+        return None
+    reference = payload.get("metadata", {}).get("customer_id") or resource.get("account_number", "")
+    return PaymentNotice(
+        provider="kopokopo",
+        txn_id=_txn_id(resource.get("reference") or payload["id"]),
+        customer_ref=str(reference),
+        amount=_amount(resource["amount"]),
+        method="kopokopo",
+    )
+
+
+def parse_custom(payload: dict) -> PaymentNotice | None:
+    if payload.get("status", "completed") != "completed":
+        return None
+    return PaymentNotice(
+        provider="custom",
+        txn_id=_txn_id(payload["transaction_id"]),
+        customer_ref=str(payload["customer_id"]),
+        amount=_amount(payload["amount"]),
+        method=str(payload.get("method", "custom"))[:80],
+    )
+
+
+PARSERS: dict[str, Callable[[dict], PaymentNotice | None]] = {
+    "mpesa": parse_mpesa,
+    "stripe": parse_stripe,
+    "kopokopo": parse_kopokopo,
+    "custom": parse_custom,
+}
+
+
+class RecentIds:
+    """Bounded filter of recently accepted transaction ids.
+
+    Gateways retry aggressively during peaks; most duplicates are caught here
+    without touching the queue. The unique index stays the real guarantee.
+    """
+
+    def __init__(self, capacity: int = 100_000):
+        self.capacity = capacity
+        self._ids: OrderedDict[tuple[str, str], None] = OrderedDict()
+
+    def add(self, key: tuple[str, str]) -> bool:
+        """Remember ``key``; False if it was already seen."""
+        if key in self._ids:
+            self._ids.move_to_end(key)
+            return False
+        self._ids[key] = None
+        if len(self._ids) > self.capacity:
+            self._ids.popitem(last=False)
+        return True
+
+    def discard(self, key: tuple[str, str]) -> None:
+        self._ids.pop(key, None)
+
+
+def _fresh_rows(session: Session, rows: list[dict]) -> list[dict]:
+    """Drop payments already stored or repeated within the batch.
+
+    Only rows that will really be inserted may reach the ledger, so this
+    filters up front instead of relying on a dialect's insert-or-ignore. A
+    concurrent writer can still race us; the unique index then fails the
+    batch and the row-by-row fallback filters it out.
+    """
+    existing = set(
+        session.exec(
+            select(Transaction.provider, Transaction.provider_txn_id).where(
+                Transaction.provider_txn_id.in_({row["provider_txn_id"] for row in rows})
+            )
+        ).all()
+    )
+    fresh = []
+    for row in rows:
+        key = (row["provider"], row["provider_txn_id"])
+        if key not in existing:
+            existing.add(key)
+            fresh.append(row)
+    return fresh
+
+
+def _suspend(session: Session, rows: list[dict], reason: str, detail: str = "") -> None:
+    """Keep payments that cannot be booked in PaymentSuspense, once each."""
+    existing = set(
+        session.exec(
+            select(PaymentSuspense.provider, PaymentSuspense.provider_txn_id).where(
+                PaymentSuspense.provider_txn_id.in_({row["provider_txn_id"] for row in rows})
+            )
+        ).all()
+    )
+    for row in rows:
+        if (row["provider"], row["provider_txn_id"]) in existing:
+            continue
+        existing.add((row["provider"], row["provider_txn_id"]))
+        session.add(
+            PaymentSuspense(
+                provider=row["provider"],
+                provider_txn_id=row["provider_txn_id"],
+                customer_ref=str(row["customer_ref"])[:120],
+                amount=row["amount"] if math.isfinite(row["amount"]) else None,
+                method=row["method"],
+                reason=reason,
+                detail=detail[:500],
+                received_at=row["created_at"],
+            )
+        )
+
+
+class PaymentBatcher:
+    """Queue between the webhook handlers and the database.
+
+    Handlers store each callback in PaymentInbox with one small insert,
+    enqueue it and return; one consumer task per worker collects whatever
+    arrived within ``linger_seconds`` (up to ``batch_size``) and writes it
+    with a single multi-row insert in a worker thread. The inbox makes the
+    acknowledgement durable: rows a dead worker never wrote are swept up by
+    the others.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        batch_size: int = 500,
+        linger_seconds: float = 0.05,
+        max_queue: int = 50_000,
+        on_written: Callable[[Iterable[int]], None] | None = None,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self.queue: asyncio.Queue[PaymentNotice] = asyncio.Queue(maxsize=max_queue)
+        self.on_written = on_written
+        self.written = 0
+        self.unmatched = 0
+
+    def persist(self, notice: PaymentNotice) -> PaymentNotice | None:
+        """Store ``notice`` in the inbox; None if it is already waiting there."""
+        row = {
+            "provider": notice.provider,
+            "provider_txn_id": notice.txn_id,
+            "customer_ref": notice.customer_ref[:120],
+            "amount": notice.amount,
+            "method": notice.method,
+            "received_at": notice.received_at,
+        }
+        try:
+            with self.engine.begin() as conn:
+                inbox_id = conn.execute(insert(PaymentInbox).values(row)).inserted_primary_key[0]
+        except IntegrityError:
+            return None
+        return replace(notice, inbox_id=inbox_id)
+
+    def stale_notices(self, older_than: float = INBOX_SWEEP_SECONDS) -> list[PaymentNotice]:
+        """Inbox rows no consumer has written within ``older_than`` seconds."""
+        cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+        with Session(self.engine) as session:
+            rows = session.exec(
+                select(PaymentInbox).where(PaymentInbox.received_at < cutoff).order_by(PaymentInbox.id).limit(self.batch_size)
+            ).all()
+        return [
+            PaymentNotice(row.provider, row.provider_txn_id, row.customer_ref, row.amount, row.method, row.received_at, row.id)
+            for row in rows
+        ]
+
+    def submit(self, notice: PaymentNotice) -> bool:
+        try:
+            self.queue.put_nowait(notice)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def drain_nowait(self, limit: int | None = None) -> list[PaymentNotice]:
+        limit = self.batch_size if limit is None else limit
+        batch = []
+        while len(batch) < limit and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    def write_batch(self, notices: list[PaymentNotice]) -> int:
+        """Insert the batch and book it on the customers' ledgers in the same
+        transaction, which also clears the batch from the inbox. Payments for
+        unknown accounts go to PaymentSuspense. Returns the number of new
+        payments written."""
+        handled = delete(PaymentInbox).where(
+            PaymentInbox.id.in_([notice.inbox_id for notice in notices if notice.inbox_id is not None])
+        )
+        refs = {notice: customer_id_from_ref(notice.customer_ref) for notice in notices}
+        with Session(self.engine) as session:
+            known = set(
+                session.exec(
+                    select(Customer.id).where(Customer.id.in_({ref for ref in refs.values() if ref is not None}))
+                ).all()
+            )
+            rows, unmatched = [], []
+            for notice, customer_id in refs.items():
+                row = {
+                    "amount": notice.amount,
+                    "method": notice.method,
+                    "provider": notice.provider,
+                    "provider_txn_id": notice.txn_id,
+                    "created_at": notice.received_at,
+                }
+                if customer_id not in known:
+                    logger.warning(
+                        "Unmatched %s payment %s for account %r", notice.provider, notice.txn_id, notice.customer_ref
+                    )
+                    unmatched.append({**row, "customer_ref": notice.customer_ref})
+                    continue
+                rows.append({**row, "customer_id": customer_id, "reference": notice.txn_id[:120], "status": "completed"})
+            if unmatched:
+                # Committed on its own so a refused batch cannot lose them.
+                _suspend(session, unmatched, "unmatched")
+                session.commit()
+                self.unmatched += len(unmatched)
+            rows = _fresh_rows(session, rows) if rows else rows
+            try:
+                if rows:
+                    session.exec(insert(Transaction), params=rows)
+                    ledger.apply_deltas(session.connection(), ledger.transaction_deltas(rows))
+                session.exec(handled)
+                session.commit()
+            except (IntegrityError, DataError):
+                session.rollback()
+                logger.warning("Database refused a batch of %d payments; writing them one by one", len(rows))
+                rows = self._write_rows(session, rows)
+                session.exec(handled)
+                session.commit()
+
+        self.written += len(rows)
+        if self.on_written and rows:
+            self.on_written({row["customer_id"] for row in rows})
+        return len(rows)
+
+    def _write_rows(self, session: Session, rows: list[dict]) -> list[dict]:
+        """Write each row in its own transaction, so one bad row no longer
+        holds back the batch. Rows refused again are dead-lettered to
+        PaymentSuspense, except duplicates a concurrent writer stored first.
+        Returns the rows written."""
+        written = []
+        for row in rows:
+            try:
+                session.exec(insert(Transaction), params=[row])
+                ledger.apply_deltas(session.connection(), ledger.transaction_deltas([row]))
+                session.commit()
+            except (IntegrityError, DataError) as exc:
+                session.rollback()
+                if not _fresh_rows(session, [row]):
+                    continue
+                logger.error("Dead-lettered %s payment %s: %s", row["provider"], row["provider_txn_id"], exc.orig)
+                _suspend(session, [{**row, "customer_ref": row["customer_id"]}], "rejected", str(exc.orig))
+                session.commit()
+            else:
+                written.append(row)
+        return written
+
+    async def _write(self, batch: list[PaymentNotice], stop: asyncio.Event, retry_seconds: float) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.write_batch, batch)
+                return
+            except Exception:
+                logger.exception("Could not record %d payment callbacks", len(batch))
+                if stop.is_set():
+                    logger.error("Left %d payment callbacks in the inbox for the next start", len(batch))
+                    return
+                await asyncio.sleep(retry_seconds)
+
+    async def run_forever(self, stop: asyncio.Event, retry_seconds: float = 1.0) -> None:
+        next_sweep = time.monotonic()
+        while not (stop.is_set() and self.queue.empty()):
+            if not stop.is_set() and time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + INBOX_SWEEP_SECONDS
+                try:
+                    stale = await asyncio.to_thread(self.stale_notices)
+                except Exception:
+                    logger.exception("Could not read the payment inbox")
+                    stale = []
+                if stale:
+                    logger.warning("Recovering %d payment callbacks from the inbox", len(stale))
+                    await self._write(stale, stop, retry_seconds)
+            try:
+                first = await asyncio.wait_for(self.queue.get(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            # Let the rest of a burst arrive so it shares one insert.
+            await asyncio.sleep(self.linger_seconds)
+            await self._write([first, *self.drain_nowait(self.batch_size - 1)], stop, retry_seconds)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import Boolean, DateTime, Float, String, cast, literal, null, union_all
+from sqlmodel import Session, select
+
+from app.models import Customer, Invoice, PaymentGateway, RouterProvision, Transaction, UserAccount
+from app.services.archive import invoice_history
+from app.services.cache import CacheNamespace
+
+
+@dataclass(frozen=True)
+class PortalHistory:
+    invoices: list[Invoice] = field(default_factory=list)
+    transactions: list[Transaction] = field(default_factory=list)
+    gateways: list[PaymentGateway] = field(default_factory=list)
+
+    @property
+    def active_gateway_methods(self) -> list[str]:
+        return [gateway.gateway_name for gateway in self.gateways if gateway.active]
+
+
+@dataclass(frozen=True)
+class PortalData:
+    user: UserAccount
+    customer: Customer
+    router: Optional[RouterProvision]
+    history: PortalHistory
+
+
+def load_portal_identity(
+    session: Session, username: str
+) -> tuple[UserAccount, Customer, Optional[RouterProvision]] | None:
+    statement = (
+        select(UserAccount, Customer, RouterProvision)
+        .join(Customer, Customer.id == UserAccount.customer_id)
+        .outerjoin(RouterProvision, RouterProvision.customer_id == Customer.id)
+        .where(UserAccount.username == username, UserAccount.active.is_(True), UserAccount.role == "client")
+    )
+    return session.exec(statement).first()
+
+
+def load_portal_history(session: Session, customer_id: int, limit: int = 20) -> PortalHistory:
+    # One UNION ALL round trip for the three bounded lists. Every branch is
+    # projected onto the same column layout and tagged with its kind.
+    no_text = cast(null(), String)
+    no_amount = cast(null(), Float)
+    no_flag = cast(null(), Boolean)
+    no_stamp = cast(null(), DateTime)
+
+    # Hot and archived invoices, so history reaches past the archive horizon.
+    recent_invoices = (
+        invoice_history(where=lambda table: [table.c.customer_id == customer_id], order_by="created_at", limit=limit)
+        .limit(limit)
+        .subquery()
+    )
+    invoices = select(
+        literal("invoice").label("kind"),
+        recent_invoices.c.id.label("id"),
+        recent_invoices.c.created_at.label("created_at"),
+        recent_invoices.c.amount.label("amount"),
+        recent_invoices.c.status.label("status"),
+        recent_invoices.c.billing_month.label("label"),
+        no_text.label("reference"),
+        no_text.label("callback_url"),
+        no_text.label("public_key"),
+        no_flag.label("active"),
+        recent_invoices.c.paid_at.label("stamp"),
+    ).subquery()
+    transactions = (
+        select(
+            literal("transaction").label("kind"),
+            Transaction.id,
+            Transaction.created_at,
+            Transaction.amount,
+            Transaction.status,
+            Transaction.method,
+            Transaction.reference,
+            no_text,
+            no_text,
+            no_flag,
+            no_stamp,
+        )
+        .where(Transaction.customer_id == customer_id)
+        .order_by(Transaction.created_at.desc())
+        .limit(limit)
+        .subquery()
+    )
+    gateways = (
+        select(
+            literal("gateway").label("kind"),
+            PaymentGateway.id,
+            PaymentGateway.created_at,
+            no_amount,
+            PaymentGateway.provider,
+            PaymentGateway.gateway_name,
+            PaymentGateway.account_ref,
+            PaymentGateway.callback_url,
+            PaymentGateway.public_key,
+            PaymentGateway.active,
+            no_stamp,
+        )
+        .where(PaymentGateway.customer_id == customer_id)
+        .order_by(PaymentGateway.created_at.desc())
+        .subquery()
+    )
+
+    history = PortalHistory()
+    statement = union_all(select(invoices), select(transactions), select(gateways))
+    for row in session.exec(statement):
+        if row.kind == "invoice":
+            history.invoices.append(
+                Invoice(
+                    id=row.id,
+                    customer_id=customer_id,
+                    billing_month=row.label,
+                    amount=row.amount,
+                    status=row.status,
+                    created_at=row.created_at,
+                    paid_at=row.stamp,
+                )
+            )
+        elif row.kind == "transaction":
+            history.transactions.append(
+                Transaction(
+                    id=row.id,
+                    customer_id=customer_id,
+                    amount=row.amount,
+                    method=row.label,
+                    reference=row.reference,
+                    status=row.status,
+                    created_at=row.created_at,
+                )
+            )
+        else:
+            history.gateways.append(
+                PaymentGateway(
+                    id=row.id,
+                    customer_id=customer_id,
+                    gateway_name=row.label,
+                    provider=row.status,
+                    account_ref=row.reference,
+                    public_key=row.public_key,
+                    callback_url=row.callback_url,
+                    active=bool(row.active),
+                    created_at=row.created_at,
+                )
+            )
+
+    for items in (history.invoices, history.transactions, history.gateways):
+        items.sort(key=lambda item: item.created_at, reverse=True)
+    return history
+
+
+def load_portal_data(
+    session: Session, username: str, cache: CacheNamespace | None = None, limit: int = 20
+) -> PortalData | None:
+    identity = load_portal_identity(session, username)
+    if not identity:
+        return None
+    user, customer, router = identity
+
+    if cache is None:
+        history = load_portal_history(session, customer.id, limit=limit)
+    else:
+        history = cache.get_or_load(customer.id, lambda: load_portal_history(session, customer.id, limit=limit))
+    return PortalData(user=user, customer=customer, router=router, history=history)
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import socket
+import ssl
+import struct
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+PROBE_METHODS = ("icmp", "tcp", "http", "https")
+DEFAULT_PORTS = {"tcp": 80, "http": 80, "https": 443}
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+
+@dataclass(frozen=True)
+class ProbeTarget:
+    node_id: int
+    host: str
+    method: str = "tcp"
+    port: Optional[int] = None
+    path: str = "/"
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    node_id: int
+    latency_ms: Optional[float]
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _checksum(payload: bytes) -> int:
+    if len(payload) % 2:
+        payload += b"\0"
+    total = sum(struct.unpack(f"!{len(payload) // 2}H", payload))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+class _IcmpChannel:
+    """One shared ICMP socket for all echo probes of a cycle.
+
+    Unprivileged datagram ICMP sockets are used when the kernel allows them
+    (``net.ipv4.ping_group_range``), otherwise a raw socket (root only).
+    Replies are dispatched to waiting probes by sequence number.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.identifier = os.getpid() & 0xFFFF
+        self._sequence = itertools.cycle(range(1, 0x10000))
+        self._waiters: dict[int, asyncio.Future] = {}
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            self.raw = False
+        except OSError:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            self.raw = True
+        # Thousands of replies can land between two reads of the event loop.
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.setblocking(False)
+        loop.add_reader(self.sock.fileno(), self._on_readable)
+
+    def close(self) -> None:
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+        for waiter in self._waiters.values():
+            if not waiter.done():
+                waiter.cancel()
+
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                packet = self.sock.recv(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            if self.raw:
+                packet = packet[(packet[0] & 0x0F) * 4:]
+            if len(packet) < 8:
+                continue
+            kind, _, _, identifier, sequence = struct.unpack("!BBHHH", packet[:8])
+            if kind != ICMP_ECHO_REPLY or (self.raw and identifier != self.identifier):
+                continue
+            waiter = self._waiters.pop(sequence, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(time.perf_counter())
+
+    async def echo(self, address: str) -> float:
+        sequence = next(self._sequence)
+        header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, self.identifier, sequence)
+        payload = b"netnova-evil-maria"
+        checksum = _checksum(header + payload)
+        packet = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, self.identifier, sequence) + payload
+
+        waiter = self.loop.create_future()
+        self._waiters[sequence] = waiter
+        started = time.perf_counter()
+        try:
+            self.sock.sendto(packet, (address, 0))
+            received = await waiter
+        finally:
+            self._waiters.pop(sequence, None)
+        return (received - started) * 1000
+
+
+class Prober:
+    """Measures node latency for many targets concurrently.
+
+    At most ``concurrency`` probes are in flight at once and every probe is
+    bounded by ``timeout`` seconds; failures are reported, never raised.
+    """
+
+    def __init__(self, concurrency: int = 500, timeout: float = 2.0):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._icmp: Optional[_IcmpChannel] = None
+        self._icmp_unavailable = False
+
+    async def run(self, targets: list[ProbeTarget]) -> list[ProbeResult]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(target: ProbeTarget) -> ProbeResult:
+            async with semaphore:
+                return await self.probe(target)
+
+        try:
+            return await asyncio.gather(*(bounded(target) for target in targets))
+        finally:
+            if self._icmp is not None:
+                self._icmp.close()
+                self._icmp = None
+
+    async def probe(self, target: ProbeTarget) -> ProbeResult:
+        try:
+            if target.method == "icmp":
+                probe = self._probe_icmp(target)
+            elif target.method in {"http", "https"}:
+                probe = self._probe_http(target)
+            else:
+                probe = self._probe_tcp(target)
+            latency = await asyncio.wait_for(probe, self.timeout)
+        except asyncio.TimeoutError:
+            return ProbeResult(target.node_id, None, "timeout")
+        except (OSError, ValueError, ssl.SSLError) as exc:
+            return ProbeResult(target.node_id, None, exc.__class__.__name__)
+        return ProbeResult(target.node_id, round(latency, 2))
+
+    async def _probe_tcp(self, target: ProbeTarget) -> float:
+        started = time.perf_counter()
+        _, writer = await asyncio.open_connection(target.host, target.port or DEFAULT_PORTS["tcp"])
+        latency = (time.perf_counter() - started) * 1000
+        writer.close()
+        return latency
+
+    async def _probe_http(self, target: ProbeTarget) -> float:
+        use_tls = target.method == "https"
+        started = time.perf_counter()
+        reader, writer = await asyncio.open_connection(
+            target.host,
+            target.port or DEFAULT_PORTS[target.method],
+            ssl=ssl.create_default_context() if use_tls else None,
+        )
+        try:
+            request = f"HEAD {target.path or '/'} HTTP/1.1\r\nHost: {target.host}\r\nConnection: close\r\n\r\n"
+            writer.write(request.encode("ascii"))
+            await writer.drain()
+            status_line = await reader.readline()
+            latency = (time.perf_counter() - started) * 1000
+        finally:
+            writer.close()
+
+        parts = status_line.split()
+        if len(parts) < 2 or not parts[0].startswith(b"HTTP/") or not parts[1].isdigit():
+            raise ValueError("invalid HTTP response")
+        if int(parts[1]) >= 500:
+            raise ValueError(f"HTTP {int(parts[1])}")
+        return latency
+
+    async def _probe_icmp(self, target: ProbeTarget) -> float:
+        if not self._icmp_unavailable and self._icmp is None:
+            try:
+                self._icmp = _IcmpChannel(asyncio.get_running_loop())
+            except OSError:
+                logger.warning("ICMP sockets are not permitted here; probing ICMP nodes with TCP connect")
+                self._icmp_unavailable = True
+        if self._icmp is None:
+            return await self._probe_tcp(target)
+
+        infos = await asyncio.get_running_loop().getaddrinfo(target.host, None, family=socket.AF_INET)
+        return await self._icmp.echo(infos[0][4][0])
+
+
+def probe_all(targets: list[ProbeTarget], concurrency: int = 500, timeout: float = 2.0) -> list[ProbeResult]:
+    """Synchronous entry point for callers outside an event loop."""
+    return asyncio.run(Prober(concurrency=concurrency, timeout=timeout).run(targets))
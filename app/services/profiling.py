@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import logging
+import random
+import re
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app.services.instrumentation import route_label
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Debug-Queries"
+# A SELECT shape repeated this often in one request is usually a loop that
+# should have been a join or an IN query.
+N_PLUS_ONE_THRESHOLD = 5
+
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_current: ContextVar["QueryProfile | None"] = ContextVar("query_profile", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """Collapse whitespace and expanded ``IN (?, ?, ...)`` lists so the same
+    query issued with different parameters counts as one shape."""
+    return _PLACEHOLDER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryProfile:
+    def __init__(self, n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.queries = 0
+        self.seconds = 0.0
+        self.shapes: Counter[str] = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.queries += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    @property
+    def duplicates(self) -> dict[str, int]:
+        return {shape: count for shape, count in self.shapes.items() if count > 1}
+
+    @property
+    def suspected_n_plus_one(self) -> dict[str, int]:
+        return {
+            shape: count
+            for shape, count in self.shapes.items()
+            if count >= self.n_plus_one_threshold and shape[:6].upper() == "SELECT"
+        }
+
+    def server_timing(self) -> str:
+        repeated = sum(count - 1 for count in self.duplicates.values())
+        timing = f'db;dur={self.seconds * 1000:.1f};desc="{self.queries} queries, {repeated} repeated"'
+        if self.suspected_n_plus_one:
+            timing += f', n-plus-one;desc="{len(self.suspected_n_plus_one)} suspected"'
+        return timing
+
+
+@contextmanager
+def profile_queries(n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD) -> Iterator[QueryProfile]:
+    """Collect every query issued from this context (including sync handlers
+    that FastAPI runs in its threadpool, which inherit the context)."""
+    profile = QueryProfile(n_plus_one_threshold)
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    profile = _current.get()
+    if profile is not None and conn.info.get("query_started"):
+        profile.record(statement, time.perf_counter() - conn.info["query_started"].pop())
+
+
+def install_query_profiler(engine: Engine) -> None:
+    # Outside a profiled request both hooks return after one ContextVar lookup.
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryProfilerMiddleware:
+    """Profile a sample of requests, plus any request carrying ``X-Debug-Queries``
+    when ``allow_header`` is set, and report them via ``Server-Timing`` and the log."""
+
+    def __init__(self, app, sample_rate: float = 0.0, allow_header: bool = False):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.allow_header = allow_header
+        self._header = PROFILE_HEADER.lower().encode()
+
+    def _wanted(self, scope) -> bool:
+        if self.allow_header and any(name == self._header for name, _ in scope["headers"]):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries() as profile:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message).append("Server-Timing", profile.server_timing())
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+        _log_profile(f"{scope['method']} {route_label(scope)}", profile)
+
+
+def _log_profile(request: str, profile: QueryProfile) -> None:
+    logger.info(
+        "%s: %d queries in %.1fms, %d repeated shapes",
+        request,
+        profile.queries,
+        profile.seconds * 1000,
+        len(profile.duplicates),
+    )
+    for shape, count in profile.suspected_n_plus_one.items():
+        logger.warning("Suspected N+1 in %s: %d x %s", request, count, shape[:200])
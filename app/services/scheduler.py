@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import IO, Any, Callable, Optional
+
+try:  # advisory file locks are POSIX only
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+OVERLAP_POLICIES = ("skip", "coalesce")
+
+
+@dataclass(frozen=True)
+class Shard:
+    """Slice of the node set owned by one worker process (``id % count == index``)."""
+
+    index: int = 0
+    count: int = 1
+
+    def __post_init__(self):
+        if self.count < 1 or not 0 <= self.index < self.count:
+            raise ValueError(f"invalid shard {self.index}/{self.count}")
+
+    @property
+    def sharded(self) -> bool:
+        return self.count > 1
+
+    def owns(self, node_id: int) -> bool:
+        return node_id % self.count == self.index
+
+
+def claim_shard(count: int, index: int = -1, lock_dir: str = "") -> Optional[tuple[Shard, Optional[IO]]]:
+    """Elects this process as the scheduler for one shard on this host.
+
+    Web servers fork several identical workers; each one calls this at start
+    and only the winners run a scheduler. With ``index`` set the process
+    competes for that shard only, otherwise it takes the first free one.
+    The returned handle holds the lock and must stay open.
+    """
+    if fcntl is None:
+        return Shard(max(index, 0), count), None
+
+    directory = Path(lock_dir) if lock_dir else Path(tempfile.gettempdir())
+    directory.mkdir(parents=True, exist_ok=True)
+    for candidate in ([index] if index >= 0 else range(count)):
+        handle = open(directory / f"netnova-monitor-{candidate}-of-{count}.lock", "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            continue
+        handle.write(str(os.getpid()))
+        handle.flush()
+        return Shard(candidate, count), handle
+    return None
+
+
+@dataclass
+class SchedulerStats:
+    cycles: int = 0
+    failures: int = 0
+    skipped: int = 0
+    coalesced: int = 0
+    overruns: int = 0
+    missed_ticks: int = 0
+    running: bool = False
+    last_started_at: Optional[float] = None
+    last_duration_ms: Optional[float] = None
+    max_duration_ms: float = 0.0
+    last_lag_ms: Optional[float] = None
+    max_lag_ms: float = 0.0
+    last_error: Optional[str] = None
+
+
+class MonitorScheduler:
+    """Owns the monitor cycle: runs it every ``interval`` seconds (plus up to
+    ``jitter`` seconds, so shards do not probe in lockstep) on a background
+    thread, and never lets two cycles of the same process overlap.
+
+    A request that arrives while a cycle is running is either dropped
+    (``skip``) or folded into a single follow-up cycle (``coalesce``). Ticks
+    missed because a cycle outlasted the interval are counted, not replayed.
+    """
+
+    def __init__(
+        self,
+        cycle: Callable[[], Any],
+        interval: float = 30.0,
+        jitter: float = 0.0,
+        overlap: str = "coalesce",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"overlap must be one of {', '.join(OVERLAP_POLICIES)}")
+        self.cycle = cycle
+        self.interval = interval
+        self.jitter = jitter
+        self.overlap = overlap
+        self.clock = clock
+        self.stats = SchedulerStats()
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._pending = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def snapshot(self) -> dict:
+        with self._stats_lock:
+            data = asdict(self.stats)
+        data.update(interval_seconds=self.interval, jitter_seconds=self.jitter, overlap=self.overlap)
+        return data
+
+    def run_once(self, lag: float = 0.0) -> Optional[Any]:
+        """Runs a cycle now unless one is in progress; returns its result, or
+        None when the request was skipped or coalesced."""
+        if not self._lock.acquire(blocking=False):
+            with self._stats_lock:
+                if self.overlap == "coalesce":
+                    self._pending = True
+                    self.stats.coalesced += 1
+                else:
+                    self.stats.skipped += 1
+            return None
+        try:
+            result = self._run(lag)
+            while self.overlap == "coalesce" and self._take_pending():
+                self._run(0.0)
+            return result
+        finally:
+            self._lock.release()
+
+    def _take_pending(self) -> bool:
+        with self._stats_lock:
+            pending, self._pending = self._pending, False
+        return pending
+
+    def _run(self, lag: float) -> Optional[Any]:
+        started = self.clock()
+        with self._stats_lock:
+            self.stats.running = True
+            self.stats.last_started_at = time.time()
+            self.stats.last_lag_ms = round(lag * 1000, 2)
+            self.stats.max_lag_ms = max(self.stats.max_lag_ms, self.stats.last_lag_ms)
+        result = None
+        error = None
+        try:
+            result = self.cycle()
+        except Exception as exc:  # a failed cycle must not stop the schedule
+            logger.exception("Monitor cycle failed")
+            error = f"{exc.__class__.__name__}: {exc}"
+        duration = self.clock() - started
+        with self._stats_lock:
+            self.stats.running = False
+            self.stats.cycles += 1
+            self.stats.last_duration_ms = round(duration * 1000, 2)
+            self.stats.max_duration_ms = max(self.stats.max_duration_ms, self.stats.last_duration_ms)
+            if duration > self.interval:
+                self.stats.overruns += 1
+            if error is not None:
+                self.stats.failures += 1
+            self.stats.last_error = error
+        return result
+
+    def _jitter(self) -> float:
+        return random.uniform(0, self.jitter) if self.jitter > 0 else 0.0
+
+    def _loop(self) -> None:
+        tick = self.clock()
+        due = tick + self._jitter()
+        while not self._stop.wait(max(due - self.clock(), 0)):
+            self.run_once(lag=max(self.clock() - due, 0))
+            tick += self.interval
+            now = self.clock()
+            if now > tick:
+                # Ticks are laid on a fixed grid so jitter never drifts the
+                # schedule; ticks that fell inside a long cycle are dropped.
+                missed = math.ceil((now - tick) / self.interval)
+                tick += missed * self.interval
+                with self._stats_lock:
+                    self.stats.missed_ticks += missed
+            due = tick + self._jitter()
+
+    def start(self) -> "MonitorScheduler":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="monitor-scheduler", daemon=True)
+            self._thread.start()
+            logger.info("Monitor scheduler started (every %.1fs, jitter %.1fs)", self.interval, self.jitter)
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
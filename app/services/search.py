@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import logging
+import weakref
+from collections.abc import Iterable
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from app.models import Customer, RouterProvision
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = "customer_search"
+SEARCH_VOCAB_TABLE = "customer_search_vocab"
+FUZZY_CANDIDATES = 200
+FUZZY_MIN_SIMILARITY = 0.5
+# Trigrams present in more rows than this carry no signal for typo matching
+# (e.g. "cpe" in every router identity) and make ranking scan the whole index.
+FUZZY_MAX_TRIGRAM_DOCS = 2000
+
+_indexed_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def _dialect(bind) -> str:
+    return bind.dialect.name
+
+
+def ensure_search_schema(engine: Engine) -> None:
+    """Create the customer search index for the engine's dialect and backfill
+    it the first time it is created."""
+    dialect = _dialect(engine)
+    if dialect not in {"sqlite", "mysql"}:
+        logger.info("Customer search falls back to LIKE queries on %s", dialect)
+        return
+
+    created = not inspect(engine).has_table(SEARCH_TABLE)
+    with engine.begin() as conn:
+        if dialect == "sqlite":
+            conn.execute(
+                text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+                    "USING fts5(name, email, router_identity, customer_ip, tokenize='trigram')"
+                )
+            )
+            conn.execute(
+                text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_VOCAB_TABLE} USING fts5vocab({SEARCH_TABLE}, 'row')")
+            )
+        else:
+            conn.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                    "customer_id INT PRIMARY KEY, "
+                    "name VARCHAR(120) NOT NULL, "
+                    "email VARCHAR(255) NOT NULL, "
+                    "router_identity VARCHAR(120) NULL, "
+                    "customer_ip VARCHAR(40) NULL, "
+                    "FULLTEXT KEY ft_customer_search (name, email, router_identity, customer_ip) WITH PARSER ngram"
+                    ") ENGINE=InnoDB"
+                )
+            )
+        if created:
+            _reindex(conn, None)
+    _indexed_engines.add(engine)
+
+
+def _is_indexed(bind) -> bool:
+    # A session may be bound to a Connection rather than the Engine itself.
+    return bind in _indexed_engines or getattr(bind, "engine", None) in _indexed_engines
+
+
+def _key_column(dialect: str) -> str:
+    return "rowid" if dialect == "sqlite" else "customer_id"
+
+
+def _reindex(conn: Connection, customer_ids: Iterable[int] | None) -> None:
+    key = _key_column(_dialect(conn))
+    source = (
+        "SELECT c.id, c.name, c.email, c.router_identity, rp.customer_ip "
+        "FROM customer c LEFT JOIN routerprovision rp ON rp.customer_id = c.id"
+    )
+    if customer_ids is None:
+        conn.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+        conn.execute(text(f"INSERT INTO {SEARCH_TABLE} ({key}, name, email, router_identity, customer_ip) {source}"))
+        return
+
+    ids = sorted(set(customer_ids))
+    if not ids:
+        return
+    placeholders = ", ".join(f":id{index}" for index in range(len(ids)))
+    params = {f"id{index}": customer_id for index, customer_id in enumerate(ids)}
+    conn.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE {key} IN ({placeholders})"), params)
+    conn.execute(
+        text(
+            f"INSERT INTO {SEARCH_TABLE} ({key}, name, email, router_identity, customer_ip) "
+            f"{source} WHERE c.id IN ({placeholders})"
+        ),
+        params,
+    )
+
+
+def rebuild_search_index(engine: Engine) -> None:
+    with engine.begin() as conn:
+        _reindex(conn, None)
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _sync_search_index(session: OrmSession, flush_context) -> None:
+    if not _is_indexed(session.get_bind()):
+        return
+
+    changed: set[int] = set()
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Customer) and instance.id is not None:
+            changed.add(instance.id)
+        elif isinstance(instance, RouterProvision) and instance.customer_id is not None:
+            changed.add(instance.customer_id)
+    if changed:
+        # Deleted customers simply produce no source row and drop out.
+        _reindex(session.connection(), changed)
+
+
+def _trigrams(value: str) -> set[str]:
+    padded = f"  {value.lower()} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def similarity(query: str, value: str | None) -> float:
+    """Share of the query's trigrams found in ``value`` (0.0 - 1.0)."""
+    if not value:
+        return 0.0
+    wanted = _trigrams(query)
+    return len(wanted & _trigrams(value)) / len(wanted)
+
+
+def _fts5_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _sqlite_candidates(session: Session, q: str, limit: int) -> list[int]:
+    exact = session.connection().execute(
+        text(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :expr ORDER BY rank LIMIT :limit"),
+        {"expr": _fts5_phrase(q), "limit": limit},
+    ).all()
+    ids = [row[0] for row in exact]
+    if ids or len(q) < 4:
+        return ids
+
+    # Typo tolerance: rows sharing any selective trigram become candidates and
+    # are re-ranked by trigram similarity against their best matching field.
+    grams = sorted(gram for gram in _trigrams(q) if len(gram.strip()) == 3)
+    placeholders = ", ".join(f":g{index}" for index in range(len(grams)))
+    frequencies = dict(
+        session.connection().execute(
+            text(f"SELECT term, doc FROM {SEARCH_VOCAB_TABLE} WHERE term IN ({placeholders})"),
+            {f"g{index}": gram for index, gram in enumerate(grams)},
+        ).all()
+    )
+    selective = [gram for gram in grams if 0 < frequencies.get(gram, 0) <= FUZZY_MAX_TRIGRAM_DOCS]
+    if not selective:
+        return ids
+    fuzzy = session.connection().execute(
+        text(
+            f"SELECT rowid, name, email, router_identity, customer_ip FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH :expr ORDER BY rank LIMIT :limit"
+        ),
+        {"expr": " OR ".join(_fts5_phrase(gram) for gram in selective), "limit": FUZZY_CANDIDATES},
+    ).all()
+    return _merge_fuzzy(q, ids, fuzzy, limit)
+
+
+def _mysql_candidates(session: Session, q: str, limit: int) -> list[int]:
+    match = "MATCH(name, email, router_identity, customer_ip)"
+    exact = session.connection().execute(
+        text(
+            f"SELECT customer_id FROM {SEARCH_TABLE} WHERE {match} AGAINST (:expr IN BOOLEAN MODE) "
+            f"ORDER BY {match} AGAINST (:expr IN BOOLEAN MODE) DESC LIMIT :limit"
+        ),
+        {"expr": '"' + q.replace('"', " ") + '"', "limit": limit},
+    ).all()
+    ids = [row[0] for row in exact]
+    if ids or len(q) < 4:
+        return ids
+
+    # Natural language mode ranks rows by shared ngrams, which tolerates typos.
+    fuzzy = session.connection().execute(
+        text(
+            f"SELECT customer_id, name, email, router_identity, customer_ip FROM {SEARCH_TABLE} "
+            f"WHERE {match} AGAINST (:q IN NATURAL LANGUAGE MODE) LIMIT :limit"
+        ),
+        {"q": q, "limit": FUZZY_CANDIDATES},
+    ).all()
+    return _merge_fuzzy(q, ids, fuzzy, limit)
+
+
+def _merge_fuzzy(q: str, ids: list[int], rows, limit: int) -> list[int]:
+    seen = set(ids)
+    scored = []
+    for customer_id, *fields in rows:
+        if customer_id in seen:
+            continue
+        score = max(similarity(q, field) for field in fields)
+        if score >= FUZZY_MIN_SIMILARITY:
+            scored.append((score, customer_id))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return ids + [customer_id for _, customer_id in scored[: limit - len(ids)]]
+
+
+def search_customers(session: Session, q: str, limit: int = 20) -> list[Customer]:
+    q = " ".join(q.split())
+    if not q:
+        return []
+
+    bind = session.get_bind()
+    if not _is_indexed(bind):
+        pattern = f"%{q}%"
+        statement = select(Customer.id).where(
+            Customer.name.ilike(pattern) | Customer.email.ilike(pattern) | Customer.router_identity.ilike(pattern)
+        )
+        ids = list(session.exec(statement.limit(limit)).all())
+    elif len(q) < 3:
+        # Too short for trigram/ngram matching: serve it as a B-tree prefix scan.
+        statement = select(Customer.id).where(
+            Customer.name.startswith(q, autoescape=True) | Customer.email.startswith(q, autoescape=True)
+        )
+        ids = list(session.exec(statement.order_by(Customer.name).limit(limit)).all())
+    elif _dialect(bind) == "sqlite":
+        ids = _sqlite_candidates(session, q, limit)
+    else:
+        ids = _mysql_candidates(session, q, limit)
+
+    if not ids:
+        return []
+    customers = {customer.id: customer for customer in session.exec(select(Customer).where(Customer.id.in_(ids))).all()}
+    return [customers[customer_id] for customer_id in ids if customer_id in customers]
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import Select, select
+from sqlmodel import Session, SQLModel
+
+try:  # orjson is optional; the stdlib encoder produces the same documents.
+    import orjson
+except ImportError:  # pragma: no cover - depends on the deployment image
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson when it is installed.
+
+    Datetimes and dates are written in ISO format, as FastAPI's own encoder
+    writes them, so swapping the response class does not change a payload.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def select_fields(model: type[SQLModel], schema: type[BaseModel]) -> Select:
+    """``SELECT`` of exactly the columns ``schema`` exposes, in its order."""
+    table = model.__table__
+    return select(*[table.c[name] for name in schema.model_fields])
+
+
+def json_rows(session: Session, statement: Select, headers: dict[str, str] | None = None) -> FastJSONResponse:
+    """Serialize a :func:`select_fields` query straight from its result tuples.
+
+    No ORM objects are built and no response model re-validates the rows:
+    the columns already have the schema's types, so each row only needs to
+    become a dict. Routes using this keep ``response_model`` for the docs.
+    """
+    result = session.execute(statement)
+    keys = list(result.keys())
+    return FastJSONResponse([dict(zip(keys, row)) for row in result], headers=headers)
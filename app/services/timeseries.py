@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import math
+import sys
+import zlib
+from array import array
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+
+from sqlalchemy import delete, func, insert
+from sqlmodel import Session, select
+
+from app.models import LatencyRollup, LatencyRollupState, LatencySegment
+
+MINUTE = 60
+HOUR = 3600
+RESOLUTIONS = (MINUTE, HOUR)
+RAW_RETENTION_SECONDS = 2 * 24 * HOUR
+MINUTE_RETENTION_SECONDS = 31 * 24 * HOUR
+
+
+class NodeRing:
+    """Fixed-capacity ring of (timestamp, latency) samples for one node."""
+
+    __slots__ = ("timestamps", "values", "head", "size")
+
+    def __init__(self, capacity: int):
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.values = array("f", bytes(4 * capacity))
+        self.head = 0
+        self.size = 0
+
+    def append(self, timestamp: float, value: float) -> None:
+        capacity = len(self.timestamps)
+        self.timestamps[self.head] = timestamp
+        self.values[self.head] = value
+        self.head = (self.head + 1) % capacity
+        self.size = min(self.size + 1, capacity)
+
+    def samples(self, since: float = 0.0) -> list[tuple[float, float]]:
+        capacity = len(self.timestamps)
+        start = (self.head - self.size) % capacity
+        samples = []
+        for offset in range(self.size):
+            index = (start + offset) % capacity
+            if self.timestamps[index] >= since:
+                samples.append((self.timestamps[index], round(self.values[index], 2)))
+        return samples
+
+
+def _to_le(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le(typecode: str, payload: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(payload)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def encode_segment(node_ids: array, timestamps: array, values: array) -> tuple[float, float, bytes]:
+    """Packs samples column-wise: uint32 node ids, uint32 millisecond offsets
+    from the segment start and float32 latencies, zlib-compressed."""
+    start = min(timestamps)
+    offsets = array("I", (int(round((timestamp - start) * 1000)) for timestamp in timestamps))
+    payload = zlib.compress(_to_le(node_ids) + _to_le(offsets) + _to_le(values), 6)
+    return start, max(timestamps), payload
+
+
+def decode_segment(start_ts: float, sample_count: int, payload: bytes) -> Iterable[tuple[int, float, float]]:
+    raw = zlib.decompress(payload)
+    width = 4 * sample_count
+    node_ids = _from_le("I", raw[:width])
+    offsets = _from_le("I", raw[width:2 * width])
+    values = _from_le("f", raw[2 * width:])
+    return zip(node_ids, (start_ts + offset / 1000 for offset in offsets), values)
+
+
+@dataclass(frozen=True)
+class Rollup:
+    node_id: int
+    resolution: int
+    bucket_start: int
+    sample_count: int
+    min_ms: float
+    avg_ms: float
+    max_ms: float
+    p95_ms: float
+
+
+def summarize(node_id: int, resolution: int, bucket_start: int, values: list[float]) -> Rollup:
+    ordered = sorted(values)
+    p95 = ordered[max(math.ceil(0.95 * len(ordered)) - 1, 0)]
+    return Rollup(
+        node_id=node_id,
+        resolution=resolution,
+        bucket_start=bucket_start,
+        sample_count=len(ordered),
+        min_ms=round(ordered[0], 2),
+        avg_ms=round(sum(ordered) / len(ordered), 2),
+        max_ms=round(ordered[-1], 2),
+        p95_ms=round(p95, 2),
+    )
+
+
+class LatencySeries:
+    """In-memory latency history for every monitored node.
+
+    Each node keeps a ring of its most recent samples for live charts, while
+    samples recorded since the last flush accumulate in flat column arrays so
+    a flush writes them as a single packed segment row.
+    """
+
+    def __init__(self, ring_capacity: int = 720):
+        self.ring_capacity = ring_capacity
+        self._rings: dict[int, NodeRing] = {}
+        self._pending_nodes = array("I")
+        self._pending_timestamps = array("d")
+        self._pending_values = array("f")
+
+    def record(self, node_id: int, timestamp: float, latency_ms: float) -> None:
+        ring = self._rings.get(node_id)
+        if ring is None:
+            ring = self._rings[node_id] = NodeRing(self.ring_capacity)
+        ring.append(timestamp, latency_ms)
+        self._pending_nodes.append(node_id)
+        self._pending_timestamps.append(timestamp)
+        self._pending_values.append(latency_ms)
+
+    def record_many(self, samples: Iterable[tuple[int, float, float]]) -> None:
+        for node_id, timestamp, latency_ms in samples:
+            self.record(node_id, timestamp, latency_ms)
+
+    def recent(self, node_id: int, since: float = 0.0) -> list[tuple[float, float]]:
+        ring = self._rings.get(node_id)
+        return ring.samples(since) if ring else []
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending_values)
+
+    def flush(self, session: Session) -> int:
+        """Writes pending samples as one segment; the caller commits."""
+        count = len(self._pending_values)
+        if not count:
+            return 0
+        start, end, payload = encode_segment(self._pending_nodes, self._pending_timestamps, self._pending_values)
+        session.exec(
+            insert(LatencySegment).values(start_ts=start, end_ts=end, sample_count=count, payload=payload)
+        )
+        self._pending_nodes = array("I")
+        self._pending_timestamps = array("d")
+        self._pending_values = array("f")
+        return count
+
+
+def _rollup_segments(session: Session, resolution: int, since: int, until: int) -> list[Rollup]:
+    buckets: dict[tuple[int, int], list[float]] = defaultdict(list)
+    segments = session.exec(
+        select(LatencySegment.start_ts, LatencySegment.sample_count, LatencySegment.payload).where(
+            LatencySegment.end_ts >= since, LatencySegment.start_ts < until
+        )
+    )
+    for start_ts, sample_count, payload in segments:
+        for node_id, timestamp, value in decode_segment(start_ts, sample_count, payload):
+            if since <= timestamp < until:
+                buckets[(node_id, int(timestamp // resolution) * resolution)].append(value)
+    return [summarize(node_id, resolution, bucket, values) for (node_id, bucket), values in buckets.items()]
+
+
+def _rollup_minutes(session: Session, resolution: int, since: int, until: int) -> list[Rollup]:
+    """Coarser buckets merged from the 1m rollups instead of the raw samples.
+
+    Count, min, avg and max merge exactly; p95 is the sample-weighted 95th
+    percentile of the minute p95s, an approximation.
+    """
+    buckets: dict[tuple[int, int], list[LatencyRollup]] = defaultdict(list)
+    minutes = session.exec(
+        select(LatencyRollup).where(
+            LatencyRollup.resolution == MINUTE,
+            LatencyRollup.bucket_start >= since,
+            LatencyRollup.bucket_start < until,
+        )
+    )
+    for minute in minutes:
+        buckets[(minute.node_id, minute.bucket_start // resolution * resolution)].append(minute)
+
+    rollups = []
+    for (node_id, bucket), parts in buckets.items():
+        count = sum(part.sample_count for part in parts)
+        weighted, p95 = 0, 0.0
+        for part in sorted(parts, key=lambda part: part.p95_ms):
+            weighted += part.sample_count
+            p95 = part.p95_ms
+            if weighted >= 0.95 * count:
+                break
+        rollups.append(
+            Rollup(
+                node_id=node_id,
+                resolution=resolution,
+                bucket_start=bucket,
+                sample_count=count,
+                min_ms=min(part.min_ms for part in parts),
+                avg_ms=round(sum(part.avg_ms * part.sample_count for part in parts) / count, 2),
+                max_ms=max(part.max_ms for part in parts),
+                p95_ms=p95,
+            )
+        )
+    return rollups
+
+
+def downsample(session: Session, now: float) -> int:
+    """Rolls up every closed 1m and 1h bucket not yet rolled up.
+
+    Buckets are only computed once they are complete, so they never need
+    merging across flushes. 1m buckets are summarized from the raw segments;
+    1h buckets are merged from the 1m rollups written just before them.
+    """
+    written = 0
+    for resolution in RESOLUTIONS:
+        until = int(now // resolution) * resolution
+        state = session.get(LatencyRollupState, resolution)
+        if state:
+            since = state.rolled_until
+        else:
+            first = session.exec(select(func.min(LatencySegment.start_ts))).one()
+            if first is None:
+                continue
+            since = int(first // resolution) * resolution
+            state = LatencyRollupState(resolution=resolution, rolled_until=since)
+        if until <= since:
+            continue
+
+        if resolution == MINUTE:
+            rollups = _rollup_segments(session, resolution, since, until)
+        else:
+            rollups = _rollup_minutes(session, resolution, since, until)
+        # A rerun over the same window (e.g. after a crash before commit)
+        # replaces its buckets instead of colliding with them.
+        session.exec(
+            delete(LatencyRollup).where(
+                LatencyRollup.resolution == resolution,
+                LatencyRollup.bucket_start >= since,
+                LatencyRollup.bucket_start < until,
+            )
+        )
+        if rollups:
+            session.exec(insert(LatencyRollup), params=[asdict(rollup) for rollup in rollups])
+        state.rolled_until = until
+        session.add(state)
+        written += len(rollups)
+    return written
+
+
+def prune(session: Session, now: float) -> None:
+    session.exec(delete(LatencySegment).where(LatencySegment.end_ts < now - RAW_RETENTION_SECONDS))
+    session.exec(
+        delete(LatencyRollup).where(
+            LatencyRollup.resolution == MINUTE,
+            LatencyRollup.bucket_start < int(now - MINUTE_RETENTION_SECONDS),
+        )
+    )
+
+
+def pick_resolution(start: float, end: float, max_points: int = 720) -> int:
+    return MINUTE if (end - start) / MINUTE <= max_points else HOUR
+
+
+def query_range(session: Session, node_id: int, start: float, end: float, resolution: int | None = None) -> list[dict]:
+    """Chart points for one node, read from the rollup tier only."""
+    resolution = resolution or pick_resolution(start, end)
+    rollups = session.exec(
+        select(LatencyRollup)
+        .where(
+            LatencyRollup.node_id == node_id,
+            LatencyRollup.resolution == resolution,
+            LatencyRollup.bucket_start >= int(start // resolution) * resolution,
+            LatencyRollup.bucket_start < end,
+        )
+        .order_by(LatencyRollup.bucket_start)
+    ).all()
+    return [
+        {"t": r.bucket_start, "count": r.sample_count, "min": r.min_ms, "avg": r.avg_ms, "max": r.max_ms, "p95": r.p95_ms}
+        for r in rollups
+    ]
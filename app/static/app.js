@@ -46,45 +46,113 @@ function announceCriticalAlertsFromDom() {
   });
 }
 
+// Change versions from the last poll; the API answers 304 until they move.
+let metricsVersion = null;
+let eventsVersion = null;
+
+function withSince(url, version) {
+  if (version === null) {
+    return url;
+  }
+  return `${url}${url.includes("?") ? "&" : "?"}since=${version}`;
+}
+
+function changeVersion(response, fallback) {
+  const header = response.headers.get("X-Change-Version");
+  return header === null ? fallback : Number(header);
+}
+
 async function pollApi() {
   try {
     const [metricsResponse, eventsResponse] = await Promise.all([
-      fetch("/api/metrics", { headers: { Accept: "application/json" } }),
-      fetch("/api/events?unacknowledged_only=true", { headers: { Accept: "application/json" } }),
+      fetch(withSince("/api/metrics", metricsVersion), { headers: { Accept: "application/json" } }),
+      fetch(withSince("/api/events?unacknowledged_only=true", eventsVersion), { headers: { Accept: "application/json" } }),
     ]);
 
     if (metricsResponse.ok) {
       const metrics = await metricsResponse.json();
       updateMetrics(metrics);
+      metricsVersion = changeVersion(metricsResponse, metricsVersion);
     }
 
     if (eventsResponse.ok) {
+      // The first poll lists open events; later polls only carry new or
+      // changed ones, acknowledgements included.
       const events = await eventsResponse.json();
-      const hasNewCritical = events.some((event) => event.severity === "critical" && !announcedEventIds.has(event.id));
-      if (hasNewCritical) {
-        window.location.reload();
+      const hasNewCritical = events.some(
+        (event) => event.severity === "critical" && !event.acknowledged && !announcedEventIds.has(event.id),
+      );
+      const hasAcknowledged = events.some((event) => event.acknowledged);
+      if (hasNewCritical || hasAcknowledged) {
+        reloadSection("events");
       }
-async function pollUnacknowledgedEvents() {
+      eventsVersion = changeVersion(eventsResponse, eventsVersion);
+    }
+  } catch (error) {
+    console.debug("EVIL MARIA poll failed", error);
+  }
+}
+
+const dashboardSections = document.querySelectorAll("[data-section][data-section-url]");
+const sectionState = new Map();
+
+async function loadSection(container, params) {
+  const body = container.querySelector("[data-section-body]");
+  if (!body) {
+    return;
+  }
+  sectionState.set(container.dataset.section, params);
+  const url = `${container.dataset.sectionUrl}?${params.toString()}`;
   try {
-    const response = await fetch("/api/events?unacknowledged_only=true", { headers: { Accept: "application/json" } });
+    const response = await fetch(url, { headers: { Accept: "text/html" } });
     if (!response.ok) {
+      body.innerHTML = "<p>Unable to load this section.</p>";
       return;
     }
-    const events = await response.json();
-
-    const hasNewCritical = events.some((event) => event.severity === "critical" && !announcedEventIds.has(event.id));
-    if (hasNewCritical) {
-      window.location.reload();
+    body.innerHTML = await response.text();
+    if (container.dataset.section === "events") {
+      announceCriticalAlertsFromDom();
     }
   } catch (error) {
-    console.debug("EVIL MARIA poll failed", error);
+    console.debug("Section load failed", error);
+  }
+}
+
+function reloadSection(name) {
+  const container = document.querySelector(`[data-section="${name}"]`);
+  if (container) {
+    loadSection(container, sectionState.get(name) || new URLSearchParams());
   }
 }
 
+dashboardSections.forEach((container) => {
+  const filters = container.querySelector("[data-section-filters]");
+  if (filters) {
+    filters.addEventListener("submit", (event) => {
+      event.preventDefault();
+      loadSection(container, new URLSearchParams(new FormData(filters)));
+    });
+  }
+
+  container.addEventListener("click", (event) => {
+    const target = event.target;
+    if (!(target instanceof HTMLElement) || !target.dataset.page || !target.closest("[data-section-pager]")) {
+      return;
+    }
+    const params = new URLSearchParams(sectionState.get(container.dataset.section) || "");
+    params.set("page", target.dataset.page);
+    loadSection(container, params);
+  });
+
+  loadSection(container, new URLSearchParams());
+});
+
 if (alertsList) {
   announceCriticalAlertsFromDom();
+}
+
+if (document.getElementById("critical-count")) {
   setInterval(pollApi, 15000);
-  setInterval(pollUnacknowledgedEvents, 15000);
 }
 
 if (toggleButton) {
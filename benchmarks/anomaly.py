@@ -0,0 +1,50 @@
+"""Classification cost of the adaptive anomaly detector.
+
+Run with ``python -m benchmarks.anomaly [--nodes 50000] [--cycles 200]``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.services.anomaly import AnomalyDetector
+
+
+def run(nodes: int, cycles: int, seed: int = 7) -> dict:
+    rng = np.random.default_rng(seed)
+    node_ids = np.arange(1, nodes + 1)
+    expected = rng.uniform(5, 80, nodes)
+    jitter = expected * rng.uniform(0.02, 0.4, nodes)
+
+    detector = AnomalyDetector()
+    timings = []
+    for _ in range(cycles):
+        latency = expected + rng.normal(0, 1, nodes) * jitter
+        latency[rng.random(nodes) < 0.001] = np.nan
+        started = time.perf_counter()
+        detector.evaluate(node_ids, latency, expected)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings_ms = np.array(timings[1:])  # the first cycle seeds and allocates
+    return {
+        "nodes": nodes,
+        "cycles": cycles,
+        "p50_ms": round(float(np.percentile(timings_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings_ms, 95)), 3),
+        "max_ms": round(float(timings_ms.max()), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=50_000)
+    parser.add_argument("--cycles", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.nodes, args.cycles)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Bandwidth and CPU cost of response compression on representative pages.
+
+Run with ``python -m benchmarks.compression [--customers 2000] [--repeat 20]``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.config import Settings
+from app.main import create_app
+from app.models import Customer
+from app.services.compression import compress, levels_for, parse_levels
+from benchmarks.dataset import generate
+from benchmarks.load import _admin_login
+
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def _pages(router_customer: int) -> dict[str, str]:
+    return {
+        "admin_dashboard": "/admin/dashboard",
+        "customers_json": "/api/customers",
+        "overdue_invoices_json": "/api/invoices?status=overdue",
+        "open_events_json": "/api/events?unacknowledged_only=true",
+        "router_script": f"/customers/{router_customer}/router-config",
+    }
+
+
+def _cpu_ms(body: bytes, encoding: str, level: int, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        compress(body, encoding, level)
+    return (time.process_time() - started) * 1000 / repeat
+
+
+def run(customers: int, repeat: int) -> dict:
+    settings_levels = parse_levels(Settings.compression_levels)
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(
+            Settings(database_url=f"sqlite:///{Path(directory) / 'bench.db'}", environment="benchmark", rate_limit_scale=0)
+        )
+        generate(app.state.engine, customers=customers, months=3, events=customers)
+        with Session(app.state.engine) as session:
+            router_customer = session.exec(select(Customer.id).where(Customer.has_router).limit(1)).one()
+        client = TestClient(app)
+        _admin_login(client)
+
+        results = {}
+        for name, path in _pages(router_customer).items():
+            page = {}
+            for encoding in ENCODINGS:
+                timings, wire = [], 0
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    response = client.get(path, headers={"Accept-Encoding": encoding})
+                    timings.append((time.perf_counter() - started) * 1000)
+                    response.raise_for_status()
+                    wire = response.num_bytes_downloaded
+                page[encoding] = {"bytes": wire, "p50_ms": round(statistics.median(timings), 2)}
+            body = response.content
+            levels = levels_for(settings_levels, response.headers["content-type"])
+            for encoding, level in (("gzip", levels.gzip), ("br", levels.brotli)):
+                page[encoding]["level"] = level
+                page[encoding]["ratio"] = round(page["identity"]["bytes"] / page[encoding]["bytes"], 2)
+                page[encoding]["cpu_ms"] = round(_cpu_ms(body, encoding, level, repeat), 3)
+            results[name] = page
+        client.close()
+        app.state.engine.dispose()
+    return {"customers": customers, "pages": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.customers, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Bulk synthetic dataset at production scale.
+
+Run with ``python -m benchmarks.dataset --database-url sqlite:///./bench.db
+[--customers 100000] [--months 12] [--events 1000000]``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from app.config import Settings
+from app.database import create_db_engine, init_db
+from app.models import Customer, Invoice, MonitoringEvent, RouterProvision, Transaction, UserAccount
+from app.services.ledger import rebuild_balances
+from app.services.mikrotik import assign_point_to_point_block, build_mikrotik_script
+from app.services.search import rebuild_search_index
+
+CHUNK_SIZE = 10_000
+PLANS = (("Home 10M", 25.0), ("Home 50M", 45.0), ("Business 100M", 120.0), ("Enterprise 1G", 249.99))
+SERVICES = tuple(f"POP-{index:03d}" for index in range(200))
+CLIENT_PASSWORD = "bench123"
+
+
+def client_username(customer_id: int) -> str:
+    return f"client{customer_id}"
+
+
+def _chunks(rows: Iterable[dict], size: int = CHUNK_SIZE) -> Iterator[list[dict]]:
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _bulk_insert(engine: Engine, model, rows: Iterable[dict]) -> int:
+    # Core executemany in fixed chunks: no ORM identity map or flush hooks,
+    # and memory stays flat however many rows are generated.
+    written = 0
+    with engine.begin() as conn:
+        for chunk in _chunks(rows):
+            conn.execute(insert(model), chunk)
+            written += len(chunk)
+    return written
+
+
+def _months(count: int, now: datetime) -> list[str]:
+    year, month = now.year, now.month
+    months = []
+    for _ in range(count):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return months[::-1]
+
+
+def generate(engine: Engine, customers: int = 100_000, months: int = 12, events: int = 1_000_000, seed: int = 7) -> dict:
+    """Fill an empty database; customer ids are assumed to start at 1."""
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    started = time.perf_counter()
+    init_db(engine)
+
+    plans = [rng.choice(PLANS) for _ in range(customers)]
+    routers = [rng.random() < 0.3 for _ in range(customers)]
+    counts = {
+        "customers": _bulk_insert(
+            engine,
+            Customer,
+            (
+                {
+                    "name": f"Customer {index:06d} {rng.choice(('Fiber', 'Networks', 'Holdings', 'Cafe', 'Clinic'))}",
+                    "plan_name": plans[index - 1][0],
+                    "monthly_rate": plans[index - 1][1],
+                    "due_day": rng.randint(1, 28),
+                    "email": f"billing{index}@customer{index % 997}.example",
+                    "has_router": routers[index - 1],
+                    "router_identity": f"CPE-{index:06d}" if routers[index - 1] else None,
+                    "wan_interface": "ether1",
+                    "lan_interface": "ether2",
+                    "active": rng.random() > 0.05,
+                    "created_at": now - timedelta(days=rng.randint(30, 900)),
+                }
+                for index in range(1, customers + 1)
+            ),
+        )
+    }
+    counts["accounts"] = _bulk_insert(engine, UserAccount, _account_rows(customers, now))
+    counts["router_provisions"] = _bulk_insert(engine, RouterProvision, _router_rows(routers, now))
+
+    billing_months = _months(months, now)
+    invoices, transactions = [], []
+    for customer_id in range(1, customers + 1):
+        rate = plans[customer_id - 1][1]
+        for age, month in enumerate(reversed(billing_months)):
+            created = datetime.strptime(month, "%Y-%m")
+            roll = rng.random()
+            status = "paid" if roll < 0.85 or age > 3 else ("overdue" if age > 0 and roll < 0.95 else "unpaid")
+            paid_at = created + timedelta(days=rng.randint(1, 25)) if status == "paid" else None
+            invoices.append(
+                {
+                    "customer_id": customer_id,
+                    "billing_month": month,
+                    "amount": rate,
+                    "status": status,
+                    "created_at": created,
+                    "paid_at": paid_at,
+                }
+            )
+            if paid_at is not None:
+                transactions.append(
+                    {
+                        "customer_id": customer_id,
+                        "amount": rate,
+                        "method": rng.choice(("mpesa", "card", "bank")),
+                        "reference": f"TX{customer_id:06d}{month.replace('-', '')}",
+                        "status": "completed",
+                        "created_at": paid_at,
+                    }
+                )
+        if len(invoices) >= 10 * CHUNK_SIZE:
+            counts["invoices"] = counts.get("invoices", 0) + _bulk_insert(engine, Invoice, invoices)
+            counts["transactions"] = counts.get("transactions", 0) + _bulk_insert(engine, Transaction, transactions)
+            invoices, transactions = [], []
+    counts["invoices"] = counts.get("invoices", 0) + _bulk_insert(engine, Invoice, invoices)
+    counts["transactions"] = counts.get("transactions", 0) + _bulk_insert(engine, Transaction, transactions)
+
+    counts["events"] = _bulk_insert(engine, MonitoringEvent, _event_rows(rng, events, now))
+
+    # Bulk inserts bypass the flush hooks that keep the search index and the
+    # balance ledger current.
+    rebuild_search_index(engine)
+    rebuild_balances(engine)
+    counts["seconds"] = round(time.perf_counter() - started, 1)
+    return counts
+
+
+def _account_rows(customers: int, now: datetime) -> Iterator[dict]:
+    # The admin is seeded here as well so concurrent first logins do not race
+    # to bootstrap it.
+    yield {"username": "admin", "password": "admin123", "role": "admin", "customer_id": None, "active": True,
+           "created_at": now}
+    for customer_id in range(1, customers + 1):
+        yield {
+            "username": client_username(customer_id),
+            "password": CLIENT_PASSWORD,
+            "role": "client",
+            "customer_id": customer_id,
+            "active": True,
+            "created_at": now,
+        }
+
+
+def _router_rows(routers: list[bool], now: datetime) -> Iterator[dict]:
+    for customer_id, has_router in enumerate(routers, start=1):
+        if not has_router:
+            continue
+        block = assign_point_to_point_block(customer_id)
+        yield {
+            "customer_id": customer_id,
+            "subnet_cidr": block.subnet_cidr,
+            "gateway_ip": block.gateway_ip,
+            "customer_ip": block.customer_ip,
+            "script": build_mikrotik_script(
+                customer_name=f"Customer {customer_id:06d}",
+                router_identity=f"CPE-{customer_id:06d}",
+                wan_interface="ether1",
+                lan_interface="ether2",
+                gateway_ip=block.gateway_ip,
+                customer_ip=block.customer_ip,
+            ),
+            "created_at": now,
+        }
+
+
+def _event_rows(rng: random.Random, count: int, now: datetime) -> Iterator[dict]:
+    span = 90 * 24 * 3600
+    for index in range(count):
+        severity = rng.choices(("info", "warning", "critical"), weights=(70, 25, 5))[0]
+        service = rng.choice(SERVICES)
+        created = now - timedelta(seconds=rng.randint(0, span))
+        yield {
+            "service_name": service,
+            "severity": severity,
+            "message": f"{service} {severity} condition #{index}",
+            "created_at": created,
+            # Everything but the last few hundred alerts has been handled.
+            "acknowledged": index < count - 500,
+            "acknowledged_at": created + timedelta(minutes=5) if index < count - 500 else None,
+            "version": 0,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    engine = create_db_engine(Settings(database_url=args.database_url))
+    print(json.dumps(generate(engine, args.customers, args.months, args.events, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Scripted load scenarios against the API and web routes.
+
+Run with ``python -m benchmarks.load --database-url sqlite:///./bench.db
+[--scenario dashboard_load] [--base-url http://127.0.0.1:8000] [--output results.json]``
+after filling the database with ``python -m benchmarks.dataset``. Without
+``--base-url`` the app is served in-process.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import subprocess
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import datetime
+
+import httpx
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.config import Settings
+from app.models import Customer, Invoice
+from app.services.dashboard import DASHBOARD_SECTIONS
+from benchmarks.dataset import CLIENT_PASSWORD, client_username
+
+# One step issues a handful of requests and returns how many it sent.
+Step = Callable[[httpx.Client, random.Random], int]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    step: Step
+    iterations: int
+    concurrency: int
+    login_as_admin: bool = False
+
+
+@dataclass(frozen=True)
+class Dataset:
+    customers: int
+    next_month: str
+
+
+def _check(response: httpx.Response) -> httpx.Response:
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: HTTP {response.status_code}")
+    return response
+
+
+def _admin_login(client: httpx.Client) -> None:
+    _check(client.post("/login", data={"username": "admin", "password": "admin123"}))
+
+
+def build_scenarios(dataset: Dataset) -> dict[str, Scenario]:
+    def dashboard_load(client: httpx.Client, rng: random.Random) -> int:
+        _check(client.get("/admin/dashboard"))
+        for section in DASHBOARD_SECTIONS:
+            _check(client.get(f"/admin/dashboard/sections/{section}", params={"page": rng.randint(1, 20)}))
+        _check(client.get("/api/metrics"))
+        return 2 + len(DASHBOARD_SECTIONS)
+
+    def list_endpoints(client: httpx.Client, rng: random.Random) -> int:
+        _check(client.get("/api/invoices", params={"status": "overdue"}))
+        _check(client.get("/api/events", params={"unacknowledged_only": "true"}))
+        _check(client.get("/api/customers/search", params={"q": f"Customer {rng.randint(1, dataset.customers):06d}"}))
+        return 3
+
+    def portal_login_storm(client: httpx.Client, rng: random.Random) -> int:
+        customer_id = rng.randint(1, dataset.customers)
+        login = {"username": client_username(customer_id), "password": CLIENT_PASSWORD}
+        _check(client.post("/login", data=login))
+        _check(client.get("/client/portal"))
+        client.cookies.clear()
+        return 2
+
+    def event_ingestion_burst(client: httpx.Client, rng: random.Random) -> int:
+        severity = rng.choice(("info", "warning", "critical"))
+        payload = {"service_name": f"POP-{rng.randint(0, 199):03d}", "severity": severity, "message": "Benchmark burst"}
+        _check(client.post("/api/events", json=payload))
+        return 1
+
+    def month_end_billing(client: httpx.Client, rng: random.Random) -> int:
+        customer_id = rng.randint(1, dataset.customers)
+        invoice = _check(
+            client.post(
+                "/api/invoices",
+                json={"customer_id": customer_id, "billing_month": dataset.next_month, "amount": 45.0},
+            )
+        ).json()
+        _check(client.patch(f"/api/invoices/{invoice['id']}", json={"status": "paid"}))
+        return 2
+
+    return {
+        scenario.name: scenario
+        for scenario in (
+            Scenario("dashboard_load", dashboard_load, iterations=50, concurrency=4, login_as_admin=True),
+            Scenario("list_endpoints", list_endpoints, iterations=50, concurrency=4),
+            Scenario("portal_login_storm", portal_login_storm, iterations=500, concurrency=16),
+            Scenario("event_ingestion_burst", event_ingestion_burst, iterations=2000, concurrency=16),
+            Scenario("month_end_billing", month_end_billing, iterations=500, concurrency=8),
+        )
+    }
+
+
+def run_scenario(scenario: Scenario, make_client: Callable[[], httpx.Client], seed: int = 7) -> dict:
+    """Latency percentiles are per iteration (one step), throughput is in requests."""
+    def worker(worker_index: int) -> tuple[list[float], int, int]:
+        rng = random.Random(seed * 1000 + worker_index)
+        timings, requests, errors = [], 0, 0
+        # Not used as a context manager: for an in-process TestClient that
+        # would run the app lifespan (scheduler, workers) once per thread.
+        client = make_client()
+        try:
+            if scenario.login_as_admin:
+                _admin_login(client)
+            for _ in range(worker_index, scenario.iterations, scenario.concurrency):
+                started = time.perf_counter()
+                try:
+                    requests += scenario.step(client, rng)
+                except (RuntimeError, httpx.HTTPError):
+                    errors += 1
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            client.close()
+        return timings, requests, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=scenario.concurrency) as pool:
+        results = list(pool.map(worker, range(scenario.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    timings_ms = np.array([timing for timings, _, _ in results for timing in timings] or [0.0])
+    requests = sum(count for _, count, _ in results)
+    return {
+        "iterations": scenario.iterations,
+        "concurrency": scenario.concurrency,
+        "requests": requests,
+        "errors": sum(errors for _, _, errors in results),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(float(np.percentile(timings_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(timings_ms, 99)), 3),
+    }
+
+
+def _next_month() -> str:
+    today = datetime.utcnow()
+    return f"{today.year + today.month // 12:04d}-{today.month % 12 + 1:02d}"
+
+
+def _commit() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(database_url: str, names: list[str], base_url: str = "", scale: float = 1.0) -> dict:
+    # Imported here so --help works without touching the database.
+    from fastapi.testclient import TestClient
+
+    from app.main import create_app
+
+    # Every in-process client shares one address, so per-client rate limits
+    # would throttle the whole run.
+    app = create_app(Settings(database_url=database_url, environment="benchmark", rate_limit_scale=0))
+    with Session(app.state.engine) as session:
+        customers = session.exec(select(func.count(Customer.id))).one()
+        invoices = session.exec(select(func.count(Invoice.id))).one()
+    if not customers:
+        raise SystemExit("The database is empty; run python -m benchmarks.dataset first.")
+
+    def make_client() -> httpx.Client:
+        if base_url:
+            return httpx.Client(base_url=base_url, timeout=60)
+        return TestClient(app, raise_server_exceptions=False)
+
+    scenarios = build_scenarios(Dataset(customers=customers, next_month=_next_month()))
+    results = {}
+    for name in names:
+        scenario = scenarios[name]
+        iterations = max(scenario.concurrency, int(scenario.iterations * scale))
+        results[name] = run_scenario(replace(scenario, iterations=iterations), make_client)
+    return {
+        "commit": _commit(),
+        "database": app.state.engine.dialect.name,
+        "target": base_url or "in-process",
+        "dataset": {"customers": customers, "invoices": invoices},
+        "scenarios": results,
+    }
+
+
+def main() -> None:
+    scenario_names = list(build_scenarios(Dataset(customers=1, next_month="2000-01")))
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--base-url", default="", help="benchmark a running server instead of an in-process app")
+    parser.add_argument("--scenario", action="append", choices=scenario_names, help="repeatable; default: all")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every scenario's iteration count")
+    parser.add_argument("--output", default="", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args.database_url, args.scenario or scenario_names, args.base_url, args.scale)
+    body = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(body + "\n")
+    print(body)
+
+
+if __name__ == "__main__":
+    main()
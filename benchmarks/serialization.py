@@ -0,0 +1,103 @@
+"""Throughput of the large list endpoints: ORM rows re-validated through the
+response model versus rows serialized straight from result tuples.
+
+Run with ``python -m benchmarks.serialization [--rows 10000] [--repeat 10]``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.config import Settings
+from app.main import create_app
+from app.models import Customer, Invoice, MonitoringEvent
+from app.schemas import CustomerOut, InvoiceOut, MonitoringEventOut
+from app.services import serialization
+from benchmarks.dataset import generate
+
+LISTS = (
+    ("customers", Customer, CustomerOut),
+    ("invoices", Invoice, InvoiceOut),
+    ("events", MonitoringEvent, MonitoringEventOut),
+)
+
+
+def _baseline_router(get_session) -> APIRouter:
+    """The list endpoints as they were: ORM objects, ``response_model``
+    validation and the stdlib encoder."""
+    router = APIRouter(prefix="/baseline", default_response_class=JSONResponse)
+    for name, model, schema in LISTS:
+
+        def handler(session: Session = Depends(get_session), model=model):
+            return session.exec(select(model).order_by(model.created_at.desc())).all()
+
+        router.add_api_route(f"/{name}", handler, response_model=list[schema])
+    return router
+
+
+def _time(client: TestClient, path: str, repeat: int) -> tuple[list[float], int]:
+    timings = []
+    size = 0
+    for _ in range(repeat + 1):
+        started = time.perf_counter()
+        response = client.get(path)
+        timings.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+        size = len(response.content)
+    return timings[1:], size  # the first request warms SQLite's page cache
+
+
+def run(rows: int, repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(
+            Settings(database_url=f"sqlite:///{Path(directory) / 'bench.db'}", environment="benchmark", rate_limit_scale=0)
+        )
+        generate(app.state.engine, customers=rows, months=1, events=rows)
+
+        def get_session():
+            with Session(app.state.engine) as session:
+                yield session
+
+        app.include_router(_baseline_router(get_session))
+        client = TestClient(app)
+        results = {}
+        for name, _, _ in LISTS:
+            baseline, size = _time(client, f"/baseline/{name}", repeat)
+            fast, fast_size = _time(client, f"/api/{name}", repeat)
+            payload = client.get(f"/api/{name}").json()
+            if client.get(f"/baseline/{name}").json() != payload:
+                raise SystemExit(f"/api/{name} no longer matches the response-model payload")
+            baseline_ms, fast_ms = statistics.median(baseline), statistics.median(fast)
+            results[name] = {
+                "rows": len(payload),
+                "baseline_p50_ms": round(baseline_ms, 1),
+                "fast_p50_ms": round(fast_ms, 1),
+                "baseline_rows_per_s": round(len(payload) / baseline_ms * 1000),
+                "fast_rows_per_s": round(len(payload) / fast_ms * 1000),
+                "speedup": round(baseline_ms / fast_ms, 2),
+                "bytes": {"baseline": size, "fast": fast_size},
+            }
+        client.close()
+        app.state.engine.dispose()
+    return {"encoder": "orjson" if serialization.orjson is not None else "json", "lists": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
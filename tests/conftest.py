@@ -0,0 +1,36 @@
+from collections.abc import Callable
+from pathlib import Path
+from typing import Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.config import Settings
+from app.database import init_db
+from app.main import create_app
+
+
+@pytest.fixture
+def make_client(tmp_path: Path) -> Callable[..., TestClient]:
+    """Builds the app on a fresh SQLite database in ``tmp_path``.
+
+    ``seed`` adds rows in one committed session before the first request;
+    keyword arguments override :class:`Settings` fields.
+    """
+
+    def make(seed: Optional[Callable[[Session], None]] = None, **settings) -> TestClient:
+        app = create_app(Settings(database_url=f"sqlite:///{tmp_path / 'test.db'}", environment="test", **settings))
+        init_db(app.state.engine)
+        if seed is not None:
+            with Session(app.state.engine) as session:
+                seed(session)
+                session.commit()
+        return TestClient(app)
+
+    return make
+
+
+@pytest.fixture
+def client(make_client) -> TestClient:
+    return make_client()
@@ -0,0 +1,64 @@
+import asyncio
+
+from app.services.admission import HIGH, INGEST, NORMAL, AdmissionController, TokenBuckets, request_lane
+
+
+def test_token_buckets_admit_bursts_then_refill():
+    buckets = TokenBuckets(max_keys=2)
+    limits = [(("events", "10.0.0.1"), 2.0, 2.0), (("events", None), 100.0, 100.0)]
+    assert buckets.take(limits, now=0.0) == 0
+    assert buckets.take(limits, now=0.0) == 0
+    assert buckets.take(limits, now=0.0) == 0.5
+    assert buckets.take(limits, now=0.5) == 0
+
+    # Eviction keeps the table bounded; a forgotten client starts with a full bucket.
+    buckets.take([(("events", "10.0.0.2"), 2.0, 2.0)], now=0.5)
+    assert len(buckets) == 2
+    assert buckets.take(limits, now=0.5) == 0
+
+
+def test_high_lane_is_served_first_and_ingest_is_shed():
+    assert request_lane("GET", "/admin/dashboard/sections/customers", None) == HIGH
+    assert request_lane("POST", "/payments/mpesa/callback", None) == INGEST
+    assert request_lane("GET", "/client/portal", None) == NORMAL
+
+    async def scenario():
+        controller = AdmissionController(limit=2, reserved=1, queue_seconds=0.2)
+        assert controller.try_acquire(INGEST)
+        assert not controller.try_acquire(INGEST)  # the last slot is held for the high lane
+        assert not await controller.wait(INGEST)  # shed after a quarter of the budget
+        assert controller.try_acquire(HIGH)
+
+        order = []
+
+        async def queued(lane, name):
+            if await controller.wait(lane):
+                order.append(name)
+
+        tasks = [asyncio.create_task(queued(NORMAL, "normal")), asyncio.create_task(queued(HIGH, "admin"))]
+        await asyncio.sleep(0.01)
+        controller.release()
+        await asyncio.sleep(0.01)
+        assert order == ["admin"]
+        controller.release()
+        controller.release()
+        await asyncio.gather(*tasks)
+        assert order == ["admin", "normal"]
+
+    asyncio.run(scenario())
+
+
+def test_event_flood_gets_429_with_retry_after(make_client):
+    client = make_client(rate_limit_scale=0.1)
+    event = {"service_name": "poller", "severity": "info", "message": "tick"}
+
+    statuses = [client.post("/api/events", json=event).status_code for _ in range(6)]
+    assert statuses[:4] == [201] * 4 and statuses[-1] == 429
+    limited = client.post("/api/events", json=event)
+    assert limited.headers["Retry-After"] == "1"
+    assert limited.json() == {"detail": "Too many requests"}
+
+    assert client.get("/api/events").status_code == 200
+    stats = client.get("/metrics/admission").json()
+    assert stats["rate_limited"]["/api/events"] >= 2
+    assert stats["admitted"]["ingest"] == 4
@@ -0,0 +1,88 @@
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.models import AgingSnapshot, Customer, Invoice
+from app.services.aging import ensure_snapshot
+
+
+def _seed(session: Session) -> None:
+    now = datetime.utcnow()
+    session.add(Customer(name="Aging Home", plan_name="Home", monthly_rate=30, due_day=1, email="home@example.com"))
+    session.add(Customer(name="Aging Biz", plan_name="Business", monthly_rate=90, due_day=1, email="biz@example.com"))
+    session.flush()
+    for customer_id, days, amount, status in [
+        (1, 5, 30, "unpaid"),
+        (1, 45, 30, "overdue"),
+        (1, 75, 30, "paid"),
+        (2, 120, 90, "overdue"),
+        (2, 10, 90, "unpaid"),
+    ]:
+        session.add(
+            Invoice(
+                customer_id=customer_id,
+                billing_month=(now - timedelta(days=days)).strftime("%Y-%m"),
+                amount=amount,
+                status=status,
+                created_at=now - timedelta(days=days),
+                paid_at=now - timedelta(days=2) if status == "paid" else None,
+            )
+        )
+
+
+@pytest.fixture
+def client(make_client) -> TestClient:
+    return make_client(_seed)
+
+
+def test_aging_buckets_by_customer_and_plan(client):
+    report = client.get("/api/reports/aging").json()
+    assert report["totals"] == {"days_0_30": 120, "days_31_60": 30, "days_61_90": 0, "days_over_90": 90, "total": 240}
+    assert [(row["customer_name"], row["total"]) for row in report["rows"]] == [("Aging Biz", 180), ("Aging Home", 60)]
+
+    by_plan = client.get("/api/reports/aging", params={"group_by": "plan"}).json()
+    assert {row["plan_name"]: row["days_over_90"] for row in by_plan["rows"]} == {"Business": 90, "Home": 0}
+
+    # A week ago the invoice paid two days ago was still open, 68 days old.
+    week_ago = (datetime.utcnow() - timedelta(days=7)).date().isoformat()
+    past = client.get("/api/reports/aging", params={"as_of": week_ago}).json()
+    assert past["totals"]["days_61_90"] == 30
+    assert client.get("/api/reports/aging", params={"as_of": "2999-01-01"}).status_code == 400
+
+
+def test_todays_snapshot_is_recomputed_only_after_billing_writes(client):
+    engine = client.app.state.engine
+    today = datetime.utcnow().date()
+
+    first = ensure_snapshot(engine, today)
+    client.post("/api/events", json={"service_name": "core", "severity": "info", "message": "not billing"})
+    assert ensure_snapshot(engine, today).computed_at == first.computed_at
+
+    client.post("/api/invoices", json={"customer_id": 1, "billing_month": "2026-10", "amount": 15})
+    assert ensure_snapshot(engine, today).computed_at > first.computed_at
+    assert client.get("/api/reports/aging").json()["totals"]["days_0_30"] == 135
+
+    # A snapshot taken after its day closed is never recomputed.
+    closed = date(2020, 1, 1)
+    ensure_snapshot(engine, closed)
+    client.post("/api/invoices", json={"customer_id": 2, "billing_month": "2026-10", "amount": 15})
+    with Session(engine) as session:
+        taken = session.exec(select(AgingSnapshot.computed_at).where(AgingSnapshot.snapshot_date == closed)).one()
+    assert ensure_snapshot(engine, closed).computed_at == taken
+
+
+def test_stale_reports_are_served_while_the_snapshot_refreshes(client):
+    first = client.get("/api/reports/aging").json()
+
+    client.post("/api/invoices", json={"customer_id": 1, "billing_month": "2026-10", "amount": 15})
+    stale = client.get("/api/reports/aging").json()
+    assert (stale["computed_at"], stale["totals"]["total"]) == (first["computed_at"], 240)
+
+    deadline = time.monotonic() + 5
+    while client.get("/api/reports/aging").json()["totals"]["total"] != 255 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    fresh = client.get("/api/reports/aging").json()
+    assert fresh["totals"]["total"] == 255 and fresh["computed_at"] > first["computed_at"]
@@ -0,0 +1,37 @@
+import math
+
+import numpy as np
+
+from app.services.anomaly import CRITICAL, HEALTHY, WARNING, AnomalyDetector
+from benchmarks.anomaly import run
+
+
+def test_noisy_links_get_a_wider_band_than_quiet_ones():
+    detector = AnomalyDetector()
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        quiet = 20 + rng.normal(0, 0.5)
+        noisy = 20 + rng.normal(0, 12)
+        detector.evaluate([1, 2], [quiet, noisy], [20, 20])
+
+    # The same 45ms reading is routine for the noisy link only.
+    assessment = detector.evaluate([1, 2], [45, 45], [20, 20])
+    assert assessment.severity.tolist() == [CRITICAL, HEALTHY]
+
+
+def test_sustained_breach_escalates_and_outages_are_critical():
+    detector = AnomalyDetector(alpha=0.01, warning_z=3, critical_z=6, sustained_cycles=3, min_std_ms=1, seed_std_ratio=0)
+    for _ in range(20):
+        detector.evaluate([5], [10.0], [10])
+
+    severities = [int(detector.evaluate([5], [14.0], [10]).severity[0]) for _ in range(3)]
+    assert severities == [WARNING, WARNING, CRITICAL]
+
+    outage = detector.evaluate([5, 9], [math.nan, 30.0], [10, 30])
+    assert outage.severity.tolist() == [CRITICAL, HEALTHY]
+    assert outage.breach_run.tolist() == [4, 0]
+
+
+def test_fleet_classification_stays_in_milliseconds():
+    result = run(nodes=50_000, cycles=20)
+    assert result["p50_ms"] < 50
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, func, select
+
+from app.cli import main as cli_main
+from app.models import Customer, Invoice, InvoiceArchive
+from app.services.archive import archive_paid_invoices
+from app.services.dashboard import SectionQuery, load_invoices
+from app.services.export import export_snapshot
+from app.services.ledger import check_balances, rebuild_balances
+from app.services.portal import load_portal_history
+
+NOW = datetime.utcnow()
+
+
+def _seed(session: Session) -> None:
+    session.add(Customer(name="Archive Home", plan_name="Home", monthly_rate=30, due_day=1, email="a@example.com"))
+    session.flush()
+    # Four invoices paid two years ago, one paid last week, one open;
+    # the newest row is old and paid too but must stay in place.
+    for months_ago, status, paid_days_ago in [
+        (26, "paid", 700),
+        (25, "paid", 690),
+        (24, "paid", 680),
+        (23, "paid", 670),
+        (2, "paid", 7),
+        (1, "unpaid", None),
+        (22, "paid", 660),
+    ]:
+        created = NOW - timedelta(days=30 * months_ago)
+        session.add(
+            Invoice(
+                customer_id=1,
+                billing_month=created.strftime("%Y-%m"),
+                amount=30,
+                status=status,
+                created_at=created,
+                paid_at=NOW - timedelta(days=paid_days_ago) if paid_days_ago else None,
+            )
+        )
+
+
+@pytest.fixture
+def client(make_client) -> TestClient:
+    return make_client(_seed)
+
+
+def _count(engine, model) -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(model)).one()
+
+
+def test_old_paid_invoices_move_in_batches_and_reads_union_them(client):
+    engine = client.app.state.engine
+    before = client.get("/api/invoices").json()
+    balance = client.get("/api/customers/1/balance").json()
+
+    assert archive_paid_invoices(engine, older_than_days=365, batch_size=2, max_batches=1) == 2
+    assert archive_paid_invoices(engine, older_than_days=365, batch_size=2) == 2
+    assert (_count(engine, Invoice), _count(engine, InvoiceArchive)) == (3, 4)
+    assert archive_paid_invoices(engine, older_than_days=365) == 0
+
+    assert client.get("/api/invoices").json() == before
+    assert len(client.get("/api/invoices", params={"status": "paid"}).json()) == 6
+    assert [row["status"] for row in client.get("/api/invoices", params={"status": "unpaid"}).json()] == ["unpaid"]
+    assert client.patch("/api/invoices/1", json={"status": "unpaid"}).status_code == 409
+
+    # Balances still count archived invoices, incrementally and rebuilt.
+    assert client.get("/api/customers/1/balance").json()["invoiced"] == balance["invoiced"] == 210
+    assert check_balances(engine) == []
+    rebuild_balances(engine)
+    assert client.get("/api/customers/1/balance").json()["outstanding"] == 30
+
+    with Session(engine) as session:
+        history = load_portal_history(session, 1, limit=5)
+        assert [invoice.id for invoice in history.invoices] == [6, 5, 7, 4, 3]
+        page = load_invoices(session, SectionQuery.build(page=2, page_size=3, status="paid"))
+        assert [invoice.id for invoice in page.items] == [3, 2, 1] and not page.has_next
+
+    # Two years ago the two oldest archived invoices were raised and still open.
+    as_of = (NOW - timedelta(days=735)).date().isoformat()
+    assert client.get("/api/reports/aging", params={"as_of": as_of}).json()["totals"]["total"] == 60
+
+
+def test_cli_archives_with_the_configured_horizon(client, capsys):
+    url = str(client.app.state.engine.url)
+    assert cli_main(["--database-url", url, "archive-invoices", "--older-than-days", "365"]) == 0
+    assert "Archived 4 invoices paid more than 365 days ago." in capsys.readouterr().out
+
+
+def test_export_follows_archive_order_not_ids(client, tmp_path):
+    engine = client.app.state.engine
+    with Session(engine) as session:
+        paid_at = NOW - timedelta(days=700)
+        session.add(Invoice(customer_id=1, billing_month="2024-01", amount=30, status="paid", paid_at=paid_at))
+        session.add(Invoice(customer_id=1, billing_month="2024-02", amount=30))
+        session.commit()
+    output = tmp_path / "export"
+
+    assert archive_paid_invoices(engine, older_than_days=365) == 6
+    (first,) = export_snapshot(engine, output, ["invoice_archive"], fmt="csv")
+    assert (first.rows, first.watermark) == (6, 6)
+
+    # Invoice 5 is archived after invoices 7 and 8, which have higher ids.
+    assert archive_paid_invoices(engine, older_than_days=1) == 1
+    (second,) = export_snapshot(engine, output, ["invoice_archive"], fmt="csv")
+    assert (second.rows, second.watermark) == (1, 7)
+    with Session(engine) as session:
+        order = session.exec(select(InvoiceArchive.id).order_by(InvoiceArchive.archive_seq)).all()
+    assert order == [1, 2, 3, 4, 7, 8, 5]
+
+
+def test_invoice_export_dedupes_against_the_archive_on_id(client, tmp_path):
+    import csv
+    import gzip
+
+    engine = client.app.state.engine
+    output = tmp_path / "export"
+
+    def read(result):
+        with gzip.open(output / result.path, "rt", encoding="utf-8") as handle:
+            return list(csv.DictReader(handle))
+
+    (invoices,) = export_snapshot(engine, output, ["invoice"], fmt="csv")
+    archive_paid_invoices(engine, older_than_days=365)
+    (archived,) = export_snapshot(engine, output, ["invoice_archive"], fmt="csv")
+
+    rows = read(invoices) + read(archived)
+    assert {row["archived_at"] for row in read(invoices)} == {""}
+    latest = {}
+    for row in sorted(rows, key=lambda row: row["archived_at"] != ""):
+        latest[row["id"]] = row
+    assert len(rows) == 11 and len(latest) == 7
+    assert all(latest[row["id"]]["archived_at"] for row in read(archived))
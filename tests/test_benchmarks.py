@@ -0,0 +1,38 @@
+from dataclasses import replace
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.config import Settings
+from app.main import create_app
+from benchmarks.dataset import generate
+from benchmarks.compression import run as run_compression
+from benchmarks.load import Dataset, build_scenarios, run_scenario
+from benchmarks.serialization import run as run_serialization
+
+
+def test_generated_dataset_supports_every_load_scenario(tmp_path: Path):
+    app = create_app(Settings(database_url=f"sqlite:///{tmp_path / 'bench.db'}", environment="test"))
+    counts = generate(app.state.engine, customers=50, months=3, events=200)
+    assert counts["customers"] == 50 and counts["accounts"] == 51 and counts["invoices"] == 150
+    assert counts["events"] == 200 and 0 < counts["transactions"] <= 150
+
+    for scenario in build_scenarios(Dataset(customers=50, next_month="2030-01")).values():
+        result = run_scenario(replace(scenario, iterations=4, concurrency=2), lambda: TestClient(app))
+        assert result["errors"] == 0, scenario.name
+        assert result["requests"] >= 4 and result["p50_ms"] <= result["p99_ms"]
+
+
+def test_serialization_benchmark_compares_identical_payloads():
+    results = run_serialization(rows=30, repeat=1)
+    assert set(results["lists"]) == {"customers", "invoices", "events"}
+    for result in results["lists"].values():
+        assert result["rows"] == 30
+        assert result["bytes"]["baseline"] == result["bytes"]["fast"]
+
+
+def test_compression_benchmark_measures_every_page():
+    results = run_compression(customers=30, repeat=1)
+    dashboard = results["pages"]["admin_dashboard"]
+    assert dashboard["gzip"]["bytes"] < dashboard["identity"]["bytes"] and dashboard["gzip"]["cpu_ms"] >= 0
+    assert set(results["pages"]["router_script"]) == {"identity", "gzip", "br"}
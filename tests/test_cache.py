@@ -0,0 +1,108 @@
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.config import Settings
+from app.database import create_db_engine, init_db
+from app.main import create_app
+from app.services.cache import CacheNamespace, CacheRegistry, DatabaseInvalidationBus, LocalInvalidationBus
+
+
+def test_namespace_lru_ttl_and_stats():
+    cache = CacheNamespace("users", max_entries=2, ttl_seconds=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats.as_dict() == {"hits": 1, "misses": 2, "evictions": 1, "expirations": 1, "invalidations": 0}
+
+    # A value loaded before an invalidation is not stored after it.
+    epoch = cache.epoch
+    cache.invalidate("c")
+    cache.set("c", "stale", epoch)
+    assert cache.get("c") is None
+    assert cache.get_or_load("c", lambda: "fresh") == "fresh" and cache.get("c") == "fresh"
+
+
+def test_invalidations_reach_other_registries_through_the_bus(tmp_path):
+    local = LocalInvalidationBus()
+    engine = create_db_engine(Settings(database_url=f"sqlite:///{tmp_path / 'test.db'}", environment="test"))
+    init_db(engine)
+    for bus_a, bus_b in [(local, local), (DatabaseInvalidationBus(engine), DatabaseInvalidationBus(engine))]:
+        worker_a, worker_b = CacheRegistry(bus_a), CacheRegistry(bus_b)
+        portal_a, portal_b = worker_a.namespace("portal"), worker_b.namespace("portal")
+        other_b = worker_b.namespace("routers")
+        worker_a.sync(), worker_b.sync()
+
+        for cache in (portal_a, portal_b, other_b):
+            cache.set(7, "history")
+            cache.set((1, "x"), "tuple key")
+        portal_a.invalidate(7)
+        portal_a.invalidate((1, "x"))
+        assert portal_b.get(7) == "history"
+
+        assert worker_b.sync() == 2
+        assert worker_a.sync() == 0  # its own messages are skipped
+        assert portal_b.get(7) is None and portal_b.get((1, "x")) is None
+        assert other_b.get(7) == "history"
+
+        portal_b.clear()
+        worker_a.sync()
+        assert portal_a.get((1, "x")) is None
+        assert worker_b.stats()["portal"]["invalidations"] == 3
+
+
+def test_invalidate_many_publishes_in_one_transaction(tmp_path):
+    from sqlalchemy import event
+
+    engine = create_db_engine(Settings(database_url=f"sqlite:///{tmp_path / 'test.db'}", environment="test"))
+    init_db(engine)
+    worker_a, worker_b = CacheRegistry(DatabaseInvalidationBus(engine)), CacheRegistry(DatabaseInvalidationBus(engine))
+    portal_a, portal_b = worker_a.namespace("portal"), worker_b.namespace("portal")
+    worker_a.sync(), worker_b.sync()
+    for customer_id in range(50):
+        portal_b.set(customer_id, "history")
+
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(conn))
+    portal_a.invalidate_many(list(range(50)))
+    assert len(commits) == 1
+
+    assert worker_b.sync() == 50
+    assert all(portal_b.get(customer_id) is None for customer_id in range(50))
+
+
+def test_portal_writes_in_one_worker_reach_another(tmp_path: Path):
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'test.db'}", environment="test")
+    apps = [create_app(settings), create_app(settings)]
+    init_db(apps[0].state.engine)
+    writer, reader = (TestClient(app) for app in apps)
+    for app in apps:
+        app.state.caches.sync()
+
+    writer.post("/login", data={"username": "admin", "password": "admin123"}, follow_redirects=False)
+    writer.post(
+        "/admin/accounts",
+        data={
+            "name": "Charlie Homes",
+            "email": "charlie@example.com",
+            "username": "charlie",
+            "password": "charlie123",
+            "plan_name": "Home 30M",
+            "monthly_rate": "19.99",
+            "due_day": "5",
+        },
+        follow_redirects=False,
+    )
+    reader.post("/login", data={"username": "charlie", "password": "charlie123"}, follow_redirects=False)
+    assert "2026-03" not in reader.get("/client/portal").text
+
+    writer.post("/api/invoices", json={"customer_id": 1, "billing_month": "2026-03", "amount": 19.99})
+    assert "2026-03" not in reader.get("/client/portal").text  # not synced yet
+    apps[1].state.caches.sync()
+    assert "2026-03" in reader.get("/client/portal").text
+    assert reader.get("/metrics/cache").json()["portal"]["invalidations"] == 1
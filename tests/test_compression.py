@@ -0,0 +1,109 @@
+import asyncio
+import gzip
+import zlib
+from pathlib import Path
+
+import brotli
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+
+from app.models import Customer
+from app.services.compression import CompressionMiddleware, levels_for, parse_levels
+
+
+@pytest.fixture
+def client(make_client) -> TestClient:
+    def seed(session: Session) -> None:
+        for index in range(200):
+            session.add(
+                Customer(name=f"Zip {index}", plan_name="Home", monthly_rate=30, due_day=1, email=f"z{index}@example.com")
+            )
+
+    return make_client(seed)
+
+
+def test_json_lists_are_negotiated_and_small_bodies_skipped(client):
+    plain = client.get("/api/customers", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    for encoding in ("gzip", "br"):
+        response = client.get("/api/customers", headers={"Accept-Encoding": f"{encoding};q=1, identity;q=0.5"})
+        assert response.headers["content-encoding"] == encoding
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) == response.num_bytes_downloaded < len(plain.content) / 4
+        assert response.content == plain.content
+
+    health = client.get("/api/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in health.headers
+    disabled = client.get("/api/customers", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in disabled.headers
+
+
+def test_precompressed_static_assets_pass_through(client):
+    url = client.app.state.templates.env.globals["asset_url"]("style.css")
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == (Path(__file__).parent.parent / "app" / "static" / "style.css").read_bytes()
+
+
+def _call(app, accept_encoding: str) -> list[dict]:
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # The client stays connected until the response is complete.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+def test_streamed_bodies_are_flushed_chunk_by_chunk():
+    chunks = [f"data: {index} {'x' * 300}\n\n".encode() for index in range(5)]
+
+    async def events():
+        for chunk in chunks:
+            yield chunk
+
+    app = CompressionMiddleware(
+        StreamingResponse(events(), media_type="text/event-stream"), parse_levels("text/event-stream=1/1")
+    )
+    start, *bodies = _call(app, "gzip")
+    assert (b"content-encoding", b"gzip") in start["headers"]
+    assert not any(name == b"content-length" for name, _ in start["headers"])
+    decoder = zlib.decompressobj(31)
+    # Each message decodes to its own chunk without waiting for the next one.
+    for chunk, message in zip(chunks, bodies):
+        assert decoder.decompress(message["body"]) == chunk
+    assert bodies[-1]["more_body"] is False
+    assert b"".join(decoder.decompress(message["body"]) for message in bodies[len(chunks):]) == b""
+
+
+def test_levels_per_content_type_and_opt_outs():
+    levels = parse_levels("text/html=6/5, text/*=1/0, application/json=0/4")
+    assert levels_for(levels, "text/html; charset=utf-8").brotli == 5
+    assert levels_for(levels, "text/csv").gzip == 1
+    assert levels_for(levels, "image/png") is None
+
+    body = b"<p>netnova</p>" * 500
+    html = CompressionMiddleware(Response(body, media_type="text/html"), levels, minimum_size=100)
+    start, message = _call(html, "br, gzip")
+    assert brotli.decompress(message["body"]) == body
+    csv = CompressionMiddleware(PlainTextResponse(body.decode(), media_type="text/csv"), levels, minimum_size=100)
+    start, message = _call(csv, "br, gzip")
+    assert (b"content-encoding", b"gzip") in start["headers"] and gzip.decompress(message["body"]) == body
+
+    opted_out = Response(body, media_type="text/html", headers={"Cache-Control": "no-transform"})
+    start, message = _call(CompressionMiddleware(opted_out, levels, minimum_size=100), "gzip")
+    assert message["body"] == body
+    png = Response(body, media_type="image/png")
+    start, message = _call(CompressionMiddleware(png, levels, minimum_size=100), "gzip")
+    assert message["body"] == body
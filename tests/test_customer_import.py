@@ -0,0 +1,64 @@
+import json
+import time
+
+from sqlmodel import Session, func, select
+
+from app.cli import main as cli_main
+from app.models import Customer, RouterProvision, UserAccount
+
+CSV = """name,plan_name,monthly_rate,due_day,email,has_router,username,password
+Alpha Imports,Home,30,5,alpha@example.com,false,alpha,secret1
+Bravo Imports,Business,80,10,bravo@example.com,true,,
+Broken Row,Home,-1,40,x,false,,
+Charlie Imports,Home,30,5,charlie@example.com,false,alpha,secret2
+Delta Imports,Home,30,5,delta@example.com,false,delta,
+"""
+
+
+def test_csv_import_reports_bad_rows_and_provisions_routers(client):
+    response = client.post("/api/customers/import", content=CSV, headers={"content-type": "text/csv"})
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["imported"], report["accounts"], report["routers"], report["failed"]) == (2, 1, 1, 3)
+    errors = {error["row"]: error["errors"] for error in report["errors"]}
+    assert sorted(errors) == [3, 4, 5]
+    assert any(message.startswith("monthly_rate") for message in errors[3])
+    assert errors[4] == ["username: 'alpha' already exists"]
+    assert "password is required with username" in errors[5][0]
+
+    with Session(client.app.state.engine) as session:
+        bravo = session.exec(select(Customer).where(Customer.name == "Bravo Imports")).one()
+        provision = session.exec(select(RouterProvision).where(RouterProvision.customer_id == bravo.id)).one()
+        assert provision.gateway_ip in provision.script
+        account = session.exec(select(UserAccount).where(UserAccount.username == "alpha")).one()
+        assert account.role == "client" and account.customer_id is not None
+
+    found = client.get("/api/customers/search", params={"q": "Bravo"}).json()
+    assert [row["name"] for row in found] == ["Bravo Imports"]
+
+
+def test_ndjson_import_in_small_chunks(client):
+    lines = [
+        json.dumps({"name": f"Bulk {index}", "plan_name": "Home", "monthly_rate": 25, "due_day": 1, "email": f"b{index}@x.io"})
+        for index in range(2500)
+    ]
+    lines.insert(7, "{not json")
+    started = time.perf_counter()
+    response = client.post("/api/customers/import", content="\n".join(lines), params={"format": "ndjson"})
+    elapsed = time.perf_counter() - started
+    report = response.json()
+    assert report["imported"] == 2500
+    assert report["failed"] == 1 and report["errors"][0]["row"] == 8
+    # Generous: the point is batching, not a benchmark.
+    assert elapsed < 20
+
+    with Session(client.app.state.engine) as session:
+        assert session.exec(select(func.count()).select_from(Customer)).one() == 2500
+
+
+def test_cli_import_exits_nonzero_on_failed_rows(tmp_path, capsys):
+    source = tmp_path / "customers.csv"
+    source.write_text(CSV, encoding="utf-8")
+    url = f"sqlite:///{tmp_path / 'cli.db'}"
+    assert cli_main(["--database-url", url, "import-customers", str(source), "--chunk-size", "2"]) == 1
+    assert "Imported 2 customers (1 portal accounts, 1 routers); 3 rows failed." in capsys.readouterr().out
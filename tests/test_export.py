@@ -0,0 +1,63 @@
+import csv
+import gzip
+from pathlib import Path
+
+import pytest
+from sqlmodel import Session
+
+from app.config import Settings
+from app.database import create_db_engine, init_db
+from app.models import Customer, Invoice
+from app.services.export import export_snapshot, read_manifest
+
+
+def _engine(tmp_path: Path):
+    engine = create_db_engine(Settings(database_url=f"sqlite:///{tmp_path / 'test.db'}", environment="test"))
+    init_db(engine)
+    return engine
+
+
+def _add_invoices(engine, count: int) -> None:
+    with Session(engine) as session:
+        customer = Customer(name="Export Customer", plan_name="Home", monthly_rate=30, due_day=1, email="x@example.com")
+        session.add(customer)
+        session.flush()
+        for index in range(count):
+            session.add(Invoice(customer_id=customer.id, billing_month=f"2026-{index % 12 + 1:02d}", amount=10 + index))
+        session.commit()
+
+
+def test_parquet_export_is_incremental(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    engine = _engine(tmp_path)
+    output = tmp_path / "export"
+    _add_invoices(engine, 25)
+
+    first = {result.table: result for result in export_snapshot(engine, output, chunk_rows=10)}
+    assert (first["invoice"].rows, first["invoice"].watermark) == (25, 25)
+    assert first["monitoringevent"].rows == 0 and not first["monitoringevent"].path
+    table = pq.read_table(output / first["invoice"].path)
+    assert table.num_rows == 25
+    assert table.schema.field("amount").type == "double"
+    assert table.column("amount").to_pylist()[-1] == 34
+
+    _add_invoices(engine, 3)
+    second = {result.table: result for result in export_snapshot(engine, output, ["invoice"], chunk_rows=10)}
+    assert pq.read_table(output / second["invoice"].path).column("id").to_pylist() == [26, 27, 28]
+    manifest = read_manifest(output)
+    assert manifest["tables"]["invoice"]["watermark"] == 28
+    assert [entry["rows"] for entry in manifest["tables"]["invoice"]["files"]] == [25, 3]
+
+    assert export_snapshot(engine, output, ["invoice"])[0].rows == 0
+
+
+def test_csv_fallback_writes_gzip_with_header(tmp_path):
+    engine = _engine(tmp_path)
+    output = tmp_path / "export"
+    _add_invoices(engine, 4)
+
+    (result,) = export_snapshot(engine, output, ["invoice"], fmt="csv", chunk_rows=3)
+    with gzip.open(output / result.path, "rt", encoding="utf-8") as handle:
+        rows = list(csv.DictReader(handle))
+    assert result.path.endswith(".csv.gz")
+    assert [row["amount"] for row in rows] == ["10.0", "11.0", "12.0", "13.0"]
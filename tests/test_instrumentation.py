@@ -0,0 +1,60 @@
+import json
+import os
+from pathlib import Path
+
+from app.services.instrumentation import RequestMetrics
+
+
+def _sample(body: str, name: str, **labels: str) -> float:
+    wanted = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    for line in body.splitlines():
+        if line.startswith(f"{name}{{") and all(part in line for part in wanted.split(",")):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{name}{{{wanted}}} not exposed")
+
+
+def test_requests_are_timed_per_route_template(client):
+    client.get("/api/health")
+    client.get("/api/health")
+    client.patch("/api/customers/404", json={"name": "Missing"})
+    client.get("/does-not-exist")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert _sample(body, "http_request_duration_seconds_count", route="/api/health", method="GET", status="200") == 2
+    assert _sample(body, "http_request_duration_seconds_bucket", route="/api/health", le="+Inf") == 2
+    assert _sample(
+        body, "http_request_duration_seconds_count", route="/api/customers/{customer_id}", method="PATCH", status="404"
+    ) == 1
+    assert _sample(body, "http_request_duration_seconds_count", route="<unmatched>", status="404") == 1
+    # The scrape itself is still being served while the body is rendered.
+    assert _sample(body, "http_requests_in_flight", method="GET") == 1
+
+
+def test_worker_snapshots_are_summed_across_a_shared_directory(tmp_path: Path):
+    first = RequestMetrics(str(tmp_path))
+    second = RequestMetrics(str(tmp_path))
+    # Pretend the second instance is a sibling worker that has since exited.
+    second.pid = 2 ** 22 + 12345
+    assert second.pid != os.getpid()
+
+    for seconds in (0.003, 0.04, 7.0):
+        first.started("GET")
+        first.finished("GET", "/api/metrics", 200, seconds)
+    second.started("GET")
+    second.finished("GET", "/api/metrics", 200, 0.02)
+    second.started("POST")
+    second._write_snapshot(json.dumps(second.snapshot()))
+
+    body = first.render(first.snapshot())
+    labels = {"route": "/api/metrics", "method": "GET", "status": "200"}
+    assert _sample(body, "http_request_duration_seconds_count", **labels) == 4
+    assert _sample(body, "http_request_duration_seconds_bucket", **labels, le="0.005") == 1
+    assert _sample(body, "http_request_duration_seconds_bucket", **labels, le="0.05") == 3
+    assert _sample(body, "http_request_duration_seconds_bucket", **labels, le="5") == 3
+    assert abs(_sample(body, "http_request_duration_seconds_sum", **labels) - 7.063) < 1e-6
+    # In-flight gauges from dead workers are dropped instead of summed.
+    assert 'http_requests_in_flight{method="POST"}' not in body
@@ -0,0 +1,66 @@
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlmodel import Session
+
+from app.cli import main as cli_main
+from app.models import Customer, CustomerBalance, Transaction
+from app.services.ledger import check_balances, rebuild_balances
+
+
+@pytest.fixture
+def client(make_client) -> TestClient:
+    def seed(session: Session) -> None:
+        for index in range(3):
+            session.add(
+                Customer(name=f"Ledger {index}", plan_name="Home", monthly_rate=30, due_day=1, email=f"l{index}@example.com")
+            )
+
+    return make_client(seed)
+
+
+def _balance(client: TestClient, customer_id: int) -> dict:
+    response = client.get(f"/api/customers/{customer_id}/balance")
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_ledger_follows_invoice_and_payment_writes(client):
+    assert _balance(client, 1)["balance"] == 0
+
+    first = client.post("/api/invoices", json={"customer_id": 1, "billing_month": "2026-01", "amount": 30}).json()
+    client.post("/api/invoices", json={"customer_id": 1, "billing_month": "2026-02", "amount": 30})
+    client.post("/api/invoices", json={"customer_id": 2, "billing_month": "2026-01", "amount": 80})
+    assert _balance(client, 1)["outstanding"] == 60
+
+    client.patch(f"/api/invoices/{first['id']}", json={"status": "paid"})
+    with Session(client.app.state.engine) as session:
+        session.add(Transaction(customer_id=1, amount=30, method="mpesa", reference="TX1"))
+        session.add(Transaction(customer_id=2, amount=5, method="mpesa", reference="TX2", status="failed"))
+        session.commit()
+
+    balance = _balance(client, 1)
+    assert (balance["invoiced"], balance["outstanding"], balance["paid"], balance["balance"]) == (60, 30, 30, 30)
+    assert _balance(client, 2)["balance"] == 80
+    assert client.get("/api/metrics").json()["unpaid"] == 110
+    assert check_balances(client.app.state.engine) == []
+
+    debtors = client.get("/api/reports/top-debtors", params={"limit": 5}).json()
+    assert [row["customer_id"] for row in debtors] == [2, 1]
+    assert client.get("/api/customers/99/balance").status_code == 404
+
+
+def test_checker_reports_drift_and_rebuild_repairs_it(client):
+    engine = client.app.state.engine
+    client.post("/api/invoices", json={"customer_id": 3, "billing_month": "2026-01", "amount": 45})
+    with engine.begin() as conn:
+        conn.execute(update(CustomerBalance).where(CustomerBalance.customer_id == 3).values(balance=1))
+
+    mismatches = check_balances(engine)
+    assert [(row["customer_id"], row["balance"], row["ledger_balance"]) for row in mismatches] == [(3, 45, 1)]
+    assert cli_main(["--database-url", str(engine.url), "ledger-check"]) == 1
+
+    assert rebuild_balances(engine) == 3
+    assert check_balances(engine) == []
+    assert cli_main(["--database-url", str(engine.url), "ledger-check"]) == 0
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import socket
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlmodel import Session, select
+
+from app.config import Settings
+from app.database import create_db_engine, init_db
+from app.models import MonitorNode, OutboxMessage
+from app.services.monitoring import MonitorService
+from app.services.outbox import DeliveryOutcome, HttpGatewaySender, OutboxDispatcher, SmtpSender, TokenBucket, enqueue
+
+
+class SmtpSink:
+    """Just enough of an SMTP server to accept mail and bounce one address."""
+
+    def __init__(self):
+        self.messages: list[bytes] = []
+        self.connections = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        writer.write(b"220 sink ESMTP\r\n")
+        in_data, data = False, []
+        while line := await reader.readline():
+            if in_data:
+                if line == b".\r\n":
+                    self.messages.append(b"".join(data))
+                    in_data, data = False, []
+                    writer.write(b"250 queued\r\n")
+                else:
+                    data.append(line)
+                continue
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                writer.write(b"250 sink\r\n")
+            elif command == b"DATA":
+                in_data = True
+                writer.write(b"354 go ahead\r\n")
+            elif command == b"RCPT" and b"bounce@" in line:
+                writer.write(b"550 no such user\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 ok\r\n")
+            await writer.drain()
+        writer.close()
+
+
+class HttpSink:
+    """Keep-alive HTTP endpoint that fails the first request for "+flaky"
+    and rejects "+invalid" outright."""
+
+    def __init__(self):
+        self.payloads: list[dict] = []
+        self.connections = 0
+        self._flaky_failed = False
+
+    def _status(self, payload: dict) -> int:
+        if payload["to"] == "+invalid":
+            return 400
+        if payload["to"] == "+flaky" and not self._flaky_failed:
+            self._flaky_failed = True
+            return 503
+        self.payloads.append(payload)
+        return 200
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            status = self._status(json.loads(await reader.readexactly(length)))
+            writer.write(f"HTTP/1.1 {status} Status\r\nContent-Length: 0\r\n\r\n".encode())
+            await writer.drain()
+        writer.close()
+
+
+def _engine(tmp_path: Path):
+    engine = create_db_engine(Settings(database_url=f"sqlite:///{tmp_path / 'outbox.db'}"))
+    init_db(engine)
+    return engine
+
+
+def _enqueue(engine, messages: list[tuple[str, str]]) -> None:
+    with Session(engine) as session:
+        for channel, recipient in messages:
+            enqueue(session, channel, recipient, f"Hello {recipient}", subject="Reminder")
+        session.commit()
+
+
+def _statuses(engine) -> dict[str, tuple[str, int]]:
+    with Session(engine) as session:
+        return {
+            message.recipient: (message.status, message.attempts)
+            for message in session.exec(select(OutboxMessage)).all()
+        }
+
+
+def test_email_batches_are_delivered_over_pooled_smtp_connections(tmp_path: Path):
+    engine = _engine(tmp_path)
+    _enqueue(engine, [("email", f"user{index}@example.com") for index in range(30)] + [("email", "bounce@example.com")])
+    sink = SmtpSink()
+
+    async def scenario():
+        server = await asyncio.start_server(sink.handle, "127.0.0.1", 0)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            sender = SmtpSender("127.0.0.1", port, pool_size=3)
+            dispatcher = OutboxDispatcher(engine, [sender], batch_size=100, concurrency=10)
+            delivered = await dispatcher.run_once()
+            await dispatcher.aclose()
+            return delivered
+
+    assert asyncio.run(scenario()) == 31
+    statuses = _statuses(engine)
+    assert statuses.pop("bounce@example.com") == ("failed", 1)
+    assert set(statuses.values()) == {("sent", 1)}
+    assert len(sink.messages) == 30
+    assert sink.connections <= 3
+    assert b"Subject: Reminder" in sink.messages[0]
+
+
+def test_gateway_failures_are_retried_with_backoff_or_failed(tmp_path: Path):
+    engine = _engine(tmp_path)
+    _enqueue(engine, [("sms", "+254700000001"), ("sms", "+flaky"), ("voice", "+invalid"), ("email", "skip@example.com")])
+    sink = HttpSink()
+
+    async def scenario():
+        server = await asyncio.start_server(sink.handle, "127.0.0.1", 0)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            dispatcher = OutboxDispatcher(engine, [HttpGatewaySender(f"http://127.0.0.1:{port}/send")])
+            first = await dispatcher.run_once()
+            nothing_due = await dispatcher.run_once()
+            statuses = _statuses(engine)
+
+            with Session(engine) as session:
+                retry = session.exec(select(OutboxMessage).where(OutboxMessage.recipient == "+flaky")).one()
+                assert retry.next_attempt_at > datetime.utcnow() and retry.last_error == "HTTP 503"
+            _, retried = dispatcher.claim(now=datetime.utcnow() + timedelta(minutes=5))
+            await dispatcher.aclose()
+            return first, nothing_due, statuses, retried
+
+    first, nothing_due, statuses, retried = asyncio.run(scenario())
+    assert (first, nothing_due) == (3, 0)
+    assert statuses == {
+        "+254700000001": ("sent", 1),
+        "+flaky": ("pending", 1),
+        "+invalid": ("failed", 1),
+        # No email sender is configured here, so email stays queued.
+        "skip@example.com": ("pending", 0),
+    }
+    assert [message.recipient for message in retried] == ["+flaky"]
+    assert sink.connections <= 3
+
+
+def test_claims_are_exclusive_until_the_lease_expires(tmp_path: Path):
+    engine = _engine(tmp_path)
+    _enqueue(engine, [("sms", f"+2547{index:08d}") for index in range(10)])
+    senders = [HttpGatewaySender("http://127.0.0.1:9/unused")]
+    first = OutboxDispatcher(engine, senders, batch_size=6, lease_seconds=60)
+    second = OutboxDispatcher(engine, senders, batch_size=6, lease_seconds=60)
+
+    now = datetime.utcnow()
+    token_a, batch_a = first.claim(now)
+    claimed_a = {message.id for message in batch_a}
+    claimed_b = {message.id for message in second.claim(now)[1]}
+    assert len(claimed_a) == 6 and len(claimed_b) == 4 and not claimed_a & claimed_b
+    assert second.claim(now)[1] == []
+
+    # A worker that died mid-batch leaves "sending" rows behind; they become
+    # claimable again once the lease runs out.
+    token_c, batch_c = second.claim(now + timedelta(seconds=61))
+    assert {message.id for message in batch_c} == claimed_a
+
+    # The first worker finishing late must not overwrite the re-claimed rows.
+    first.record(token_a, [DeliveryOutcome(message_id, 1) for message_id in claimed_a])
+    with Session(engine) as session:
+        rows = session.exec(select(OutboxMessage).where(OutboxMessage.id.in_(claimed_a))).all()
+        assert {(row.status, row.claimed_by) for row in rows} == {("sending", token_c)}
+    second.record(token_c, [DeliveryOutcome(message_id, 1) for message_id in claimed_a])
+    with Session(engine) as session:
+        rows = session.exec(select(OutboxMessage).where(OutboxMessage.id.in_(claimed_a))).all()
+        assert {(row.status, row.claimed_by) for row in rows} == {("sent", None)}
+    asyncio.run(senders[0].aclose())
+
+
+def test_rate_limited_channels_claim_what_fits_in_the_lease(tmp_path: Path):
+    engine = _engine(tmp_path)
+    _enqueue(engine, [("sms", f"+2547{index:08d}") for index in range(10)] + [("voice", "+254711111111")])
+    senders = [HttpGatewaySender("http://127.0.0.1:9/unused")]
+    # 0.02 SMS a second for half of a 300 s lease is three messages.
+    dispatcher = OutboxDispatcher(engine, senders, batch_size=200, rate_per_second={"sms": 0.02}, lease_seconds=300)
+    _, claimed = dispatcher.claim()
+    assert sorted(message.channel for message in claimed) == ["sms", "sms", "sms", "voice"]
+    asyncio.run(senders[0].aclose())
+
+
+def test_token_bucket_spaces_out_sends():
+    async def scenario():
+        bucket = TokenBucket(rate=100, burst=1)
+        started = time.perf_counter()
+        for _ in range(21):
+            await bucket.acquire()
+        return time.perf_counter() - started
+
+    assert asyncio.run(scenario()) >= 0.19
+
+
+def test_critical_monitor_alerts_are_paged_through_the_outbox(tmp_path: Path):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        closed_port = sock.getsockname()[1]
+
+    engine = _engine(tmp_path)
+    with Session(engine) as session:
+        session.add(MonitorNode(name="Edge", region="Lab", expected_latency_ms=5, host="127.0.0.1", probe_port=closed_port))
+        session.commit()
+
+    monitor = MonitorService(engine, alert_recipients=[("email", "noc@example.com"), ("sms", "+254700000000")])
+    assert monitor.run_cycle()["alerts_created"] == 1
+    with Session(engine) as session:
+        pages = session.exec(select(OutboxMessage).order_by(OutboxMessage.channel)).all()
+    assert [(page.channel, page.recipient, page.status) for page in pages] == [
+        ("email", "noc@example.com", "pending"),
+        ("sms", "+254700000000", "pending"),
+    ]
+    assert pages[0].subject == "[CRITICAL] Edge"
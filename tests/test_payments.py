@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.models import Customer, PaymentInbox, PaymentSuspense, Transaction
+from app.services.payments import PaymentBatcher, PaymentNotice, SignatureError, verify_hmac, verify_stripe
+
+
+def _seed(session: Session) -> None:
+    session.add(Customer(name="Paybill Customer", plan_name="Home", monthly_rate=30, due_day=1, email="pay@example.com"))
+
+
+@pytest.fixture
+def client(make_client) -> TestClient:
+    return make_client(
+        _seed,
+        mpesa_callback_token="paybill-token",
+        stripe_webhook_secret="whsec_test",
+        custom_webhook_secret="custom-secret",
+    )
+
+
+def _mpesa(txn_id: str, account: str = "NN-1", amount: str = "30.00") -> dict:
+    return {"TransID": txn_id, "TransAmount": amount, "BillRefNumber": account, "MSISDN": "254700000000"}
+
+
+def _flush(client: TestClient) -> int:
+    batcher = client.app.state.payment_batcher
+    return batcher.write_batch(batcher.drain_nowait())
+
+
+def _stored(client: TestClient) -> list[tuple[str, str, float]]:
+    with Session(client.app.state.engine) as session:
+        rows = session.exec(select(Transaction).order_by(Transaction.id)).all()
+    return [(row.provider, row.provider_txn_id, row.amount) for row in rows]
+
+
+def test_stripe_and_hmac_signatures_are_checked():
+    body = b'{"id": "evt_1"}'
+    now = time.time()
+    signature = hmac.new(b"whsec_test", f"{int(now)}.".encode() + body, hashlib.sha256).hexdigest()
+    verify_stripe(body, f"t={int(now)},v1=deadbeef,v1={signature}", "whsec_test", now=now)
+
+    with pytest.raises(SignatureError):
+        verify_stripe(body, f"t={int(now)},v1={signature}", "whsec_other", now=now)
+    with pytest.raises(SignatureError):
+        verify_stripe(body, f"t={int(now)},v1={signature}", "whsec_test", now=now + 600)
+
+    verify_hmac(body, hmac.new(b"k", body, hashlib.sha256).hexdigest(), "k")
+    with pytest.raises(SignatureError):
+        verify_hmac(body + b" ", hmac.new(b"k", body, hashlib.sha256).hexdigest(), "k")
+
+
+def test_callbacks_are_acknowledged_then_written_once(client):
+    url = "/payments/mpesa/callback?token=paybill-token"
+
+    first = client.post(url, json=_mpesa("QK1"))
+    assert first.json() == {"ResultCode": 0, "ResultDesc": "Accepted"}
+    client.post(url, json=_mpesa("QK1"))  # gateway retry, caught in memory
+    client.post(url, json=_mpesa("QK2", amount="15"))
+    client.post(url, json=_mpesa("QK3", account="99999"))  # no such customer
+    assert client.post("/payments/mpesa/callback?token=wrong", json=_mpesa("QK4")).status_code == 401
+    assert client.post("/payments/kopokopo/callback", json={}).status_code == 503
+    assert client.post("/payments/paypal/callback", json={}).status_code == 404
+
+    assert client.app.state.payment_batcher.queue.qsize() == 3
+    assert _flush(client) == 2
+    assert _stored(client) == [("mpesa", "QK1", 30.0), ("mpesa", "QK2", 15.0)]
+    assert client.get("/payments/queue").json() == {"queued": 0, "written": 2, "unmatched": 1}
+    suspense = client.get("/api/payments/suspense").json()
+    assert [(row["provider_txn_id"], row["customer_ref"], row["amount"], row["reason"]) for row in suspense] == [
+        ("QK3", "99999", 30.0, "unmatched")
+    ]
+
+    # A replay the in-memory filter no longer remembers is still stopped by
+    # the unique index.
+    batcher = client.app.state.payment_batcher
+    batcher.submit(PaymentNotice("mpesa", "QK1", "1", 30.0, "mpesa"))
+    assert _flush(client) == 0
+    assert len(_stored(client)) == 2
+    assert client.get("/api/customers/1/balance").json()["paid"] == 45.0
+
+
+def test_signed_custom_and_stripe_callbacks(client):
+    custom = json.dumps({"transaction_id": "C-1", "customer_id": 1, "amount": 12.5}).encode()
+    signature = hmac.new(b"custom-secret", custom, hashlib.sha256).hexdigest()
+    assert client.post("/payments/custom/callback", content=custom, headers={"X-Signature": signature}).json() == {
+        "received": True
+    }
+
+    event = {"type": "payment_intent.succeeded", "data": {"object": {"id": "pi_1", "amount_received": 4500,
+                                                                     "metadata": {"customer_id": "1"}}}}
+    body = json.dumps(event).encode()
+    stamp = int(time.time())
+    signature = hmac.new(b"whsec_test", f"{stamp}.".encode() + body, hashlib.sha256).hexdigest()
+    headers = {"Stripe-Signature": f"t={stamp},v1={signature}"}
+    assert client.post("/payments/stripe/callback", content=body, headers=headers).status_code == 200
+
+    refund = json.dumps({"type": "charge.refunded", "data": {"object": {"id": "ch_1"}}}).encode()
+    signature = hmac.new(b"whsec_test", f"{stamp}.".encode() + refund, hashlib.sha256).hexdigest()
+    headers = {"Stripe-Signature": f"t={stamp},v1={signature}"}
+    ignored = client.post("/payments/stripe/callback", content=refund, headers=headers)
+    assert ignored.json() == {"received": True, "ignored": True}
+
+    _flush(client)
+    assert _stored(client) == [("custom", "C-1", 12.5), ("stripe", "pi_1", 45.0)]
+
+
+def test_consumer_groups_a_burst_into_few_inserts(client):
+    engine = client.app.state.engine
+    batcher = PaymentBatcher(engine, batch_size=500, linger_seconds=0.05)
+    batches = []
+    write_batch = batcher.write_batch
+    batcher.write_batch = lambda notices: batches.append(len(notices)) or write_batch(notices)
+
+    async def scenario():
+        stop = asyncio.Event()
+        consumer = asyncio.create_task(batcher.run_forever(stop))
+        for index in range(1200):
+            assert batcher.submit(PaymentNotice("mpesa", f"B{index}", "1", 1.0, "mpesa"))
+        await asyncio.sleep(0)
+        stop.set()
+        await consumer
+
+    asyncio.run(scenario())
+    assert sum(batches) == 1200 and len(batches) == 3
+    assert len(_stored(client)) == 1200
+
+
+def test_invalid_callbacks_are_refused_and_bad_rows_dead_lettered(client):
+    url = "/payments/mpesa/callback?token=paybill-token"
+    for payload in (_mpesa("QN1", amount="NaN"), _mpesa("QN2", amount="-5"), _mpesa("Q" * 121)):
+        assert client.post(url, json=payload).status_code == 400
+    assert client.app.state.payment_batcher.queue.qsize() == 0
+
+    # A row the database refuses no longer fails the rest of its batch.
+    batcher = client.app.state.payment_batcher
+    for notice in (
+        PaymentNotice("mpesa", "QG1", "1", 10.0, "mpesa"),
+        PaymentNotice("mpesa", "QBAD", "1", float("nan"), "mpesa"),
+        PaymentNotice("mpesa", "QG2", "1", 5.0, "mpesa"),
+    ):
+        batcher.submit(notice)
+    assert _flush(client) == 2
+    assert _stored(client) == [("mpesa", "QG1", 10.0), ("mpesa", "QG2", 5.0)]
+    assert client.get("/api/customers/1/balance").json()["paid"] == 15.0
+    with Session(client.app.state.engine) as session:
+        suspended = session.exec(select(PaymentSuspense)).all()
+    assert [(row.provider_txn_id, row.reason, row.customer_ref) for row in suspended] == [("QBAD", "rejected", "1")]
+
+
+def test_acknowledged_callbacks_survive_a_lost_worker(client):
+    url = "/payments/mpesa/callback?token=paybill-token"
+    for txn_id in ("QC1", "QC2"):
+        assert client.post(url, json=_mpesa(txn_id)).json() == {"ResultCode": 0, "ResultDesc": "Accepted"}
+    batcher = client.app.state.payment_batcher
+
+    # Writes fail during shutdown: the batch stays in the inbox.
+    def failing(notices):
+        raise RuntimeError("database is gone")
+
+    batcher.write_batch = failing
+
+    async def shutdown():
+        stop = asyncio.Event()
+        stop.set()
+        await batcher.run_forever(stop, retry_seconds=0)
+
+    asyncio.run(shutdown())
+    assert batcher.queue.empty() and _stored(client) == []
+
+    # The worker is gone; another one picks its callbacks up from the inbox.
+    survivor = PaymentBatcher(client.app.state.engine)
+    assert survivor.write_batch(survivor.stale_notices(older_than=0)) == 2
+    assert _stored(client) == [("mpesa", "QC1", 30.0), ("mpesa", "QC2", 30.0)]
+    with Session(client.app.state.engine) as session:
+        assert session.exec(select(PaymentInbox)).all() == []
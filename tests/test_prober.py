@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from app.services.prober import Prober, ProbeTarget
+
+
+async def _start_http_listener(status: int = 204):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(f"HTTP/1.1 {status} Status\r\nContent-Length: 0\r\n\r\n".encode())
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0, backlog=4096)
+
+
+async def _start_silent_listener():
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await asyncio.sleep(5)
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def _port(server) -> int:
+    return server.sockets[0].getsockname()[1]
+
+
+def _closed_port() -> int:
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_prober_measures_tcp_and_http_and_reports_failures():
+    async def scenario():
+        healthy = await _start_http_listener()
+        broken = await _start_http_listener(status=503)
+        silent = await _start_silent_listener()
+        async with healthy, broken, silent:
+            prober = Prober(concurrency=10, timeout=0.5)
+            return await prober.run(
+                [
+                    ProbeTarget(1, "127.0.0.1", "tcp", _port(healthy)),
+                    ProbeTarget(2, "127.0.0.1", "http", _port(healthy), "/health"),
+                    ProbeTarget(3, "127.0.0.1", "http", _port(broken)),
+                    ProbeTarget(4, "127.0.0.1", "http", _port(silent)),
+                    ProbeTarget(5, "127.0.0.1", "tcp", _closed_port()),
+                ]
+            )
+
+    results = {result.node_id: result for result in asyncio.run(scenario())}
+    assert results[1].ok and results[1].latency_ms is not None
+    assert results[2].ok
+    assert results[3].error == "ValueError"
+    assert results[4].error == "timeout"
+    assert results[5].error == "ConnectionRefusedError"
+
+
+def test_prober_runs_thousands_of_probes_concurrently():
+    async def scenario():
+        server = await _start_http_listener()
+        async with server:
+            targets = [ProbeTarget(node_id, "127.0.0.1", "tcp", _port(server)) for node_id in range(5000)]
+            started = time.perf_counter()
+            results = await Prober(concurrency=500, timeout=2.0).run(targets)
+            return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(scenario())
+    assert len(results) == 5000
+    assert all(result.ok for result in results)
+    assert elapsed < 15
@@ -0,0 +1,49 @@
+import logging
+
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models import Customer
+from app.services.profiling import install_query_profiler, profile_queries, statement_shape
+
+
+def test_statement_shapes_ignore_parameter_lists_and_whitespace():
+    assert statement_shape("SELECT id FROM customer\n WHERE id IN (?, ?, ?)") == "SELECT id FROM customer WHERE id IN (?)"
+    assert statement_shape("SELECT id FROM customer WHERE id IN (%s)") == "SELECT id FROM customer WHERE id IN (?)"
+
+
+def test_repeated_lookups_are_flagged_as_n_plus_one():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    install_query_profiler(engine)
+    with Session(engine) as session:
+        session.add_all(
+            Customer(name=f"Customer {index}", plan_name="Home", monthly_rate=10, due_day=1, email=f"c{index}@example.com")
+            for index in range(6)
+        )
+        session.commit()
+
+    with Session(engine) as session, profile_queries() as profile:
+        customer_ids = session.exec(select(Customer.id)).all()
+        for customer_id in customer_ids:
+            session.exec(select(Customer).where(Customer.id == customer_id)).one()
+
+    assert profile.queries == 7
+    assert profile.seconds > 0
+    [(shape, count)] = profile.suspected_n_plus_one.items()
+    assert count == 6 and shape.startswith("SELECT customer.id, customer.name")
+    assert 'n-plus-one;desc="1 suspected"' in profile.server_timing()
+
+    # Nothing is recorded outside a profiled context.
+    with Session(engine) as session:
+        session.exec(select(Customer)).all()
+    assert profile.queries == 7
+
+
+def test_debug_header_attaches_server_timing(client, caplog):
+
+    assert "server-timing" not in client.get("/api/customers").headers
+    with caplog.at_level(logging.INFO, logger="app.services.profiling"):
+        response = client.get("/api/customers", headers={"X-Debug-Queries": "1"})
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert "1 queries, 0 repeated" in response.headers["server-timing"]
+    assert "GET /api/customers: 1 queries" in caplog.text
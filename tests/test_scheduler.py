@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import Settings
+from app.main import create_app
+from app.services.scheduler import MonitorScheduler, Shard, claim_shard
+
+
+def test_overlapping_requests_are_coalesced_into_one_follow_up_cycle():
+    release = threading.Event()
+    calls = []
+
+    def cycle():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            release.wait(2)
+        return len(calls)
+
+    scheduler = MonitorScheduler(cycle, interval=60)
+    first = threading.Thread(target=scheduler.run_once)
+    first.start()
+    while not scheduler.snapshot()["running"]:
+        time.sleep(0.001)
+
+    assert [scheduler.run_once() for _ in range(3)] == [None, None, None]
+    release.set()
+    first.join(2)
+
+    stats = scheduler.snapshot()
+    assert len(calls) == 2
+    assert stats["cycles"] == 2 and stats["coalesced"] == 3 and not stats["running"]
+
+
+def test_skip_policy_drops_requests_while_busy():
+    release = threading.Event()
+    scheduler = MonitorScheduler(lambda: release.wait(2), interval=60, overlap="skip")
+    worker = threading.Thread(target=scheduler.run_once)
+    worker.start()
+    while not scheduler.snapshot()["running"]:
+        time.sleep(0.001)
+
+    assert scheduler.run_once() is None
+    release.set()
+    worker.join(2)
+    assert scheduler.snapshot()["cycles"] == 1
+    assert scheduler.snapshot()["skipped"] == 1
+
+
+def test_background_loop_records_overruns_and_survives_failures():
+    calls = []
+
+    def cycle():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.08)
+        if len(calls) == 2:
+            raise RuntimeError("database is locked")
+
+    scheduler = MonitorScheduler(cycle, interval=0.05).start()
+    deadline = time.monotonic() + 2
+    while len(calls) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    scheduler.stop(1)
+
+    stats = scheduler.snapshot()
+    assert stats["cycles"] >= 4
+    assert stats["overruns"] >= 1 and stats["missed_ticks"] >= 1
+    assert stats["failures"] == 1
+    assert stats["max_duration_ms"] >= 80
+
+
+def test_shards_partition_node_ids():
+    shards = [Shard(index, 3) for index in range(3)]
+    owners = [[shard.index for shard in shards if shard.owns(node_id)] for node_id in range(30)]
+    assert all(len(owner) == 1 for owner in owners)
+    with pytest.raises(ValueError):
+        Shard(3, 3)
+
+
+def test_workers_without_a_shard_refuse_manual_cycles(tmp_path):
+    lock_dir = str(tmp_path / "locks")
+    held = claim_shard(1, lock_dir=lock_dir)  # another worker owns the only shard
+    assert held is not None
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'test.db'}", environment="test", monitor_lock_dir=lock_dir)
+    try:
+        with TestClient(create_app(settings)) as client:
+            assert client.post("/api/monitor/run").status_code == 409
+            assert client.get("/api/monitor/scheduler").json()["shard"] is None
+            raw = client.get("/api/monitor/nodes/1/latency", params={"resolution": "raw"})
+            assert raw.status_code == 409
+            assert client.get("/api/monitor/nodes/1/latency", params={"resolution": "1m"}).status_code == 200
+    finally:
+        if held[1] is not None:
+            held[1].close()
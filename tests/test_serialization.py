@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.models import Customer, Invoice, MonitoringEvent
+from app.schemas import CustomerOut, InvoiceOut, MonitoringEventOut
+from app.services import serialization
+
+
+@pytest.fixture
+def client(make_client) -> TestClient:
+    client = make_client()
+    for name, rate in (("Zoë Ltd", 30), ("Whole Rate", 80.5)):
+        client.post(
+            "/api/customers", json={"name": name, "plan_name": "Home", "monthly_rate": rate, "due_day": 1, "email": "z@x.io"}
+        )
+    invoice = client.post("/api/invoices", json={"customer_id": 1, "billing_month": "2026-01", "amount": 30}).json()
+    client.patch(f"/api/invoices/{invoice['id']}", json={"status": "paid"})
+    client.post("/api/invoices", json={"customer_id": 2, "billing_month": "2026-01", "amount": 80.5})
+    client.post("/api/events", json={"service_name": "core", "severity": "critical", "message": "link down"})
+    return client
+
+
+def test_fast_lists_match_the_response_models(client):
+    with Session(client.app.state.engine) as session:
+        for path, model, schema in (
+            ("/api/customers", Customer, CustomerOut),
+            ("/api/invoices", Invoice, InvoiceOut),
+            ("/api/events", MonitoringEvent, MonitoringEventOut),
+        ):
+            rows = session.exec(select(model).order_by(model.created_at.desc())).all()
+            expected = [schema.model_validate(row, from_attributes=True).model_dump(mode="json") for row in rows]
+            assert client.get(path).json() == expected, path
+
+    unpaid = client.get("/api/invoices", params={"status": "unpaid"}).json()
+    assert [row["customer_id"] for row in unpaid] == [2]
+    delta = client.get("/api/events", params={"since": 0})
+    assert delta.headers["X-Change-Version"] and len(delta.json()) == 1
+
+
+def test_stdlib_fallback_writes_the_same_bytes(monkeypatch):
+    content = [{"name": "Zoë", "rate": 30.0, "at": datetime(2026, 1, 2, 3, 4, 5, 600), "paid_at": None, "ok": True}]
+    fast = serialization.dumps(content)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert serialization.dumps(content) == fast
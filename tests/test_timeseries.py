@@ -0,0 +1,85 @@
+from array import array
+
+from sqlmodel import Session, SQLModel, create_engine, func, select
+
+from app.models import LatencySegment
+from app.services import timeseries
+from app.services.timeseries import HOUR, MINUTE, LatencySeries, NodeRing
+
+
+def _session() -> Session:
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    return Session(engine)
+
+
+def _segment_count(session: Session) -> int:
+    return session.exec(select(func.count()).select_from(LatencySegment)).one()
+
+
+def test_node_ring_keeps_only_the_latest_samples():
+    ring = NodeRing(capacity=3)
+    for second in range(5):
+        ring.append(1000.0 + second, 10.0 + second)
+
+    assert ring.samples() == [(1002.0, 12.0), (1003.0, 13.0), (1004.0, 14.0)]
+    assert ring.samples(since=1004.0) == [(1004.0, 14.0)]
+
+
+def test_segments_round_trip_packed_columns():
+    node_ids = array("I", [1, 2, 1])
+    timestamps = array("d", [1000.25, 1000.5, 1030.0])
+    values = array("f", [12.5, 80.0, 13.25])
+
+    start, end, payload = timeseries.encode_segment(node_ids, timestamps, values)
+    decoded = list(timeseries.decode_segment(start, 3, payload))
+
+    assert (start, end) == (1000.25, 1030.0)
+    assert decoded == [(1, 1000.25, 12.5), (2, 1000.5, 80.0), (1, 1030.0, 13.25)]
+
+
+def test_flush_writes_one_segment_and_downsample_rolls_closed_buckets():
+    session = _session()
+    series = LatencySeries()
+    base = 10 * HOUR
+    for second in range(0, 2 * MINUTE, 6):
+        series.record(7, base + second, float(second))
+    series.record(8, base + 5, 40.0)
+
+    assert series.flush(session) == 21
+    assert series.pending == 0
+    assert _segment_count(session) == 1
+
+    # Only the first minute is closed; the second is still filling up.
+    assert timeseries.downsample(session, base + MINUTE + 30) == 2
+    points = timeseries.query_range(session, 7, base, base + HOUR, MINUTE)
+    assert points == [{"t": base, "count": 10, "min": 0.0, "avg": 27.0, "max": 54.0, "p95": 54.0}]
+
+    assert timeseries.downsample(session, base + HOUR) == 3
+    minute_points = timeseries.query_range(session, 7, base, base + HOUR, MINUTE)
+    assert [point["t"] for point in minute_points] == [base, base + MINUTE]
+    assert minute_points[1]["min"] == 60.0
+
+    # The hour is merged from its two minutes; p95 comes from their p95s.
+    hourly = timeseries.query_range(session, 7, base, base + HOUR, HOUR)
+    assert hourly == [{"t": base, "count": 20, "min": 0.0, "avg": 57.0, "max": 114.0, "p95": 114.0}]
+
+    # Nothing new has closed, so a repeated pass writes nothing.
+    assert timeseries.downsample(session, base + HOUR + 10) == 0
+
+
+def test_query_range_picks_resolution_and_prune_applies_retention():
+    session = _session()
+    series = LatencySeries()
+    series.record(1, 0.0, 5.0)
+    series.flush(session)
+    timeseries.downsample(session, HOUR)
+
+    assert timeseries.pick_resolution(0, 6 * HOUR) == MINUTE
+    assert timeseries.pick_resolution(0, 7 * 24 * HOUR) == HOUR
+    assert len(timeseries.query_range(session, 1, 0, 7 * 24 * HOUR)) == 1
+
+    timeseries.prune(session, 40 * 24 * HOUR)
+    assert _segment_count(session) == 0
+    assert timeseries.query_range(session, 1, 0, HOUR, MINUTE) == []
+    assert len(timeseries.query_range(session, 1, 0, HOUR, HOUR)) == 1